@@ -0,0 +1,113 @@
+"""Per-process admission control: caps on concurrent work with bounded wait queues"""
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Callable, Deque, Dict, Optional
+
+
+class Saturated(Exception):
+    """Raised when a limit is at capacity and its wait queue is full or the wait timed out"""
+
+    def __init__(self, limit: str):
+        super().__init__(f"{limit} is at capacity")
+        self.limit = limit
+
+
+class Limit:
+    """At most `capacity` units of work in flight, with up to `queue` callers waiting for a slot.
+
+    With `reject=False` callers always wait (backpressure only) and `queue`
+    only sets the point at which the limit reports itself saturated.
+    """
+
+    def __init__(self, name: str, capacity: int, queue: int = 0, timeout: Optional[float] = None,
+                 reject: bool = True, on_reject: Optional[Callable[[str], None]] = None):
+        self.name = name
+        self.capacity = capacity
+        self.queue = queue
+        self.timeout = timeout
+        self.reject = reject
+        self.on_reject = on_reject
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    @property
+    def saturated(self) -> bool:
+        return self.in_flight >= self.capacity and self.waiting >= self.queue
+
+    def _rejected(self) -> Saturated:
+        if self.on_reject:
+            self.on_reject(self.name)
+        return Saturated(self.name)
+
+    def take(self):
+        """Count work that was already committed to, even past capacity"""
+        self.in_flight += 1
+
+    async def acquire(self):
+        if self.in_flight < self.capacity and not self._waiters:
+            self.in_flight += 1
+            return
+        if self.reject and self.waiting >= self.queue:
+            raise self._rejected()
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        try:
+            # release() hands its slot straight to the waiter, so in_flight is already counted
+            await asyncio.wait_for(future, self.timeout if self.reject else None)
+        except asyncio.TimeoutError:
+            raise self._rejected()
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Handed a slot just as we were cancelled; pass it on
+                self.release()
+            raise
+        finally:
+            if future in self._waiters:
+                self._waiters.remove(future)
+
+    def release(self):
+        while self._waiters:
+            future = self._waiters.popleft()
+            if not future.done():
+                future.set_result(None)
+                return
+        self.in_flight -= 1
+
+    @asynccontextmanager
+    async def slot(self):
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def snapshot(self) -> Dict[str, object]:
+        return {
+            "in_flight": self.in_flight,
+            "capacity": self.capacity,
+            "waiting": self.waiting,
+            "queue": self.queue,
+            "saturated": self.saturated
+        }
+
+
+class AdmissionController:
+    """The limits one process enforces, and whether it can take more work"""
+
+    def __init__(self, *limits: Limit):
+        self.limits: Dict[str, Limit] = {limit.name: limit for limit in limits}
+
+    def __getitem__(self, name: str) -> Limit:
+        return self.limits[name]
+
+    @property
+    def ready(self) -> bool:
+        return not any(limit.saturated for limit in self.limits.values())
+
+    def snapshot(self) -> Dict[str, object]:
+        return {"ready": self.ready, "limits": {name: limit.snapshot() for name, limit in self.limits.items()}}
@@ -0,0 +1,236 @@
+"""Balance analytics computed by Mongo aggregation pipelines.
+
+Finished matches and kills are rolled up into small per-day collections with
+`$merge`. A watermark records how far the rollups are complete; each refresh
+recomputes only the days between the watermark and now and replaces their
+rows, so redoing a refresh never counts anything twice. `/api/analytics` then
+summarises the rollups, which stay tiny no matter how many matches have been
+played.
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+MATCH_ROLLUP = "analytics_matches"
+WEAPON_ROLLUP = "analytics_weapons"
+# Counted per (day, era, mode) in the match rollup
+MATCH_SUMS = ["matches", "decisive", "favoured", "favourite_wins", "duration_seconds", "players", "kills"]
+EPOCH = datetime(1970, 1, 1)
+
+
+def _replace_into(collection: str) -> dict:
+    """$merge stage replacing the rollup rows of the recomputed days"""
+    return {"$merge": {"into": collection, "on": "_id", "whenMatched": "replace", "whenNotMatched": "insert"}}
+
+
+def day_start(moment: datetime) -> datetime:
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _day(field: str) -> dict:
+    return {"$dateToString": {"format": "%Y-%m-%d", "date": field}}
+
+
+def match_rollup_pipeline(start: datetime, until: datetime) -> List[dict]:
+    """Roll match_results that ended in [start, until] into per-day, era and mode counters.
+
+    `start` is midnight, so every day in the window is counted in full.
+    """
+    winner_rating = {"$let": {
+        "vars": {"winner": {"$arrayElemAt": [
+            {"$filter": {"input": "$players", "cond": {"$eq": ["$$this.player_id", "$winner"]}}}, 0
+        ]}},
+        "in": "$$winner.rating_before"
+    }}
+    # Decided matches where going in one player was rated above the lowest-rated one
+    favoured = {"$and": [
+        {"$ne": ["$winner", None]},
+        {"$gt": [{"$max": "$players.rating_before"}, {"$min": "$players.rating_before"}]}
+    ]}
+    return [
+        {"$match": {"ended_at": {"$gte": start, "$lte": until}}},
+        {"$project": {
+            "day": _day("$ended_at"),
+            "era": 1,
+            "mode": 1,
+            "duration_seconds": 1,
+            "player_count": 1,
+            "decisive": {"$cond": [{"$ne": ["$winner", None]}, 1, 0]},
+            "kills": {"$sum": "$players.kills"},
+            "favoured": {"$cond": [favoured, 1, 0]},
+            # The best-rated player going in won: how much skill, rather than luck, decides an era
+            "favourite_won": {"$cond": [
+                {"$and": [favoured, {"$gte": [winner_rating, {"$max": "$players.rating_before"}]}]},
+                1, 0
+            ]}
+        }},
+        {"$group": {
+            "_id": {"day": "$day", "era": "$era", "mode": "$mode"},
+            "matches": {"$sum": 1},
+            "decisive": {"$sum": "$decisive"},
+            "favoured": {"$sum": "$favoured"},
+            "favourite_wins": {"$sum": "$favourite_won"},
+            "duration_seconds": {"$sum": "$duration_seconds"},
+            "players": {"$sum": "$player_count"},
+            "kills": {"$sum": "$kills"}
+        }},
+        _replace_into(MATCH_ROLLUP)
+    ]
+
+
+def weapon_rollup_pipeline(start: datetime, until: datetime) -> List[dict]:
+    """Roll kills made in [start, until] into per-day, era and weapon counters"""
+    return [
+        {"$match": {
+            "action_type": "kill",
+            "timestamp": {"$gte": start, "$lte": until},
+            "weapon": {"$exists": True, "$ne": None}
+        }},
+        {"$lookup": {"from": "games", "localField": "game_id", "foreignField": "id", "as": "game"}},
+        {"$group": {
+            "_id": {"day": _day("$timestamp"), "era": {"$arrayElemAt": ["$game.era", 0]}, "weapon": "$weapon"},
+            "kills": {"$sum": 1}
+        }},
+        _replace_into(WEAPON_ROLLUP)
+    ]
+
+
+# Rollup collection -> (source collection, pipeline recomputing the days in [start, until])
+ROLLUPS = {
+    MATCH_ROLLUP: ("match_results", match_rollup_pipeline),
+    WEAPON_ROLLUP: ("game_actions", weapon_rollup_pipeline)
+}
+
+
+def _ratio(numerator: str, denominator: str) -> dict:
+    return {"$cond": [
+        {"$gt": [denominator, 0]},
+        {"$round": [{"$divide": [numerator, denominator]}, 3]},
+        None
+    ]}
+
+
+def match_summary_pipeline(by: str, since_day: Optional[str] = None) -> List[dict]:
+    """Win rates, match length and kills per era or mode, from the match rollup"""
+    pipeline: List[dict] = []
+    if since_day:
+        pipeline.append({"$match": {"_id.day": {"$gte": since_day}}})
+    pipeline += [
+        {"$group": {"_id": f"$_id.{by}", **{field: {"$sum": f"${field}"} for field in MATCH_SUMS}}},
+        {"$project": {
+            "_id": 0,
+            by: "$_id",
+            "matches": 1,
+            "kills": 1,
+            "decisive_rate": _ratio("$decisive", "$matches"),
+            "favourite_win_rate": _ratio("$favourite_wins", "$favoured"),
+            "avg_match_seconds": _ratio("$duration_seconds", "$matches"),
+            "avg_players": _ratio("$players", "$matches"),
+            "kills_per_match": _ratio("$kills", "$matches")
+        }},
+        {"$sort": {"matches": -1}}
+    ]
+    return pipeline
+
+
+def weapon_summary_pipeline(since_day: Optional[str] = None, limit: int = 50) -> List[dict]:
+    pipeline: List[dict] = []
+    if since_day:
+        pipeline.append({"$match": {"_id.day": {"$gte": since_day}}})
+    pipeline += [
+        {"$group": {"_id": {"era": "$_id.era", "weapon": "$_id.weapon"}, "kills": {"$sum": "$kills"}}},
+        {"$sort": {"kills": -1}},
+        {"$limit": limit},
+        {"$project": {"_id": 0, "era": "$_id.era", "weapon": "$_id.weapon", "kills": 1}}
+    ]
+    return pipeline
+
+
+class Analytics:
+    """Keeps the rollups current and caches their summaries.
+
+    One process at a time refreshes a rollup, holding a lock on its state
+    document that expires after `lock_seconds` in case that process dies.
+    The watermark only advances once the aggregate has succeeded, and a
+    failed or abandoned refresh is simply redone, since recomputing a day
+    replaces its rows. Matches younger than `settle_seconds` are left for the
+    next pass so results still being written are not skipped.
+    """
+
+    def __init__(self, db, refresh_seconds: float = 300, settle_seconds: float = 60, lock_seconds: float = 600):
+        self.db = db
+        self.refresh_seconds = refresh_seconds
+        self.settle_seconds = settle_seconds
+        self.lock_seconds = lock_seconds
+        self.cache: Dict[Optional[int], Tuple[float, dict]] = {}
+        self._lock = asyncio.Lock()
+
+    async def refresh_rollup(self, rollup: str) -> bool:
+        """Recompute the days that changed since the rollup's watermark; False if another process holds it"""
+        source, pipeline = ROLLUPS[rollup]
+        now = datetime.utcnow()
+        # Mongo stores milliseconds; keep what we write comparable with what it reads back
+        now = now.replace(microsecond=now.microsecond // 1000 * 1000)
+        locked_until = now + timedelta(seconds=self.lock_seconds)
+        try:
+            state = await self.db.analytics_state.find_one_and_update(
+                {"_id": rollup, "$or": [{"locked_until": None}, {"locked_until": {"$lt": now}}]},
+                {"$set": {"locked_until": locked_until}},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            # Locked by another process
+            return False
+        since = (state or {}).get("watermark", EPOCH)
+        until = now - timedelta(seconds=self.settle_seconds)
+        mine = {"_id": rollup, "locked_until": locked_until}
+        if until <= since:
+            await self.db.analytics_state.update_one(mine, {"$set": {"locked_until": None}})
+            return False
+        try:
+            await self.db[source].aggregate(pipeline(day_start(since), until)).to_list(None)
+        except Exception:
+            # The watermark hasn't moved, so the next refresh redoes these days
+            await self.db.analytics_state.update_one(mine, {"$set": {"locked_until": None}})
+            raise
+        await self.db.analytics_state.update_one(
+            mine, {"$set": {"watermark": until, "refreshed_at": now, "locked_until": None}}
+        )
+        self.cache.clear()
+        return True
+
+    async def summary(self, days: Optional[int] = None) -> Dict[str, Any]:
+        cached = self.cache.get(days)
+        if cached and time.monotonic() - cached[0] < self.refresh_seconds:
+            return cached[1]
+        async with self._lock:
+            cached = self.cache.get(days)
+            if cached and time.monotonic() - cached[0] < self.refresh_seconds:
+                return cached[1]
+            since_day = (datetime.utcnow() - timedelta(days=days)).strftime("%Y-%m-%d") if days else None
+            state = await self.db.analytics_state.find_one({"_id": MATCH_ROLLUP}) or {}
+            result = {
+                "days": days,
+                "through": state.get("watermark"),
+                "eras": await self.db[MATCH_ROLLUP].aggregate(match_summary_pipeline("era", since_day)).to_list(None),
+                "modes": await self.db[MATCH_ROLLUP].aggregate(match_summary_pipeline("mode", since_day)).to_list(None),
+                "weapons": await self.db[WEAPON_ROLLUP].aggregate(weapon_summary_pipeline(since_day)).to_list(None)
+            }
+            self.cache[days] = (time.monotonic(), result)
+            return result
+
+    async def run(self):
+        """Refresh the rollups forever"""
+        while True:
+            for rollup in ROLLUPS:
+                try:
+                    await self.refresh_rollup(rollup)
+                except Exception as e:
+                    logger.error(f"Error refreshing {rollup}: {e}")
+            await asyncio.sleep(self.refresh_seconds)
@@ -0,0 +1,57 @@
+"""Dedicated Discord bot / game engine worker.
+
+Run one of these next to any number of stateless API workers:
+
+    python bot_worker.py
+    SERVICE_ROLE=api uvicorn server:app --workers 4
+
+The worker serves its own operational endpoints (/api/metrics) on BOT_WORKER_PORT.
+"""
+import asyncio
+import os
+import signal
+
+import uvicorn
+from fastapi import FastAPI
+
+os.environ.setdefault('SERVICE_ROLE', 'bot')
+
+import server  # noqa: E402
+
+BOT_WORKER_PORT = int(os.environ.get('BOT_WORKER_PORT', '8002'))
+
+
+def build_ops_server() -> uvicorn.Server:
+    ops_app = FastAPI()
+    ops_app.include_router(server.ops_router)
+    ops_server = uvicorn.Server(uvicorn.Config(ops_app, host='0.0.0.0', port=BOT_WORKER_PORT, log_level='warning'))
+    # The worker handles SIGINT/SIGTERM itself
+    ops_server.install_signal_handlers = lambda: None
+    return ops_server
+
+
+async def main():
+    if server.SERVICE_ROLE != 'bot':
+        raise SystemExit(f"bot_worker.py must run with SERVICE_ROLE=bot, not {server.SERVICE_ROLE}")
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    server.spawn_background(server.ensure_indexes())
+    server.spawn_background(server.event_channel.run())
+    server.spawn_background(server.guild_settings.watch())
+    server.spawn_background(server.season_manager.run())
+    server.start_bot_services()
+    if BOT_WORKER_PORT:
+        ops_server = build_ops_server()
+        server.spawn_background(ops_server.serve())
+    server.logger.info(f"Bot worker {server.PROCESS_ID} started")
+
+    await stop.wait()
+    await server.shutdown_db_client()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
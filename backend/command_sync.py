@@ -0,0 +1,51 @@
+"""Slash-command sync that only talks to Discord when the command tree changed"""
+import hashlib
+import json
+import logging
+from datetime import datetime
+from typing import Optional
+
+import discord
+from discord import app_commands
+
+logger = logging.getLogger(__name__)
+
+
+def command_tree_hash(tree: app_commands.CommandTree, guild: Optional[discord.abc.Snowflake] = None) -> str:
+    """Hash of the command payloads a sync would upload"""
+    payload = sorted(
+        (command.to_dict(tree) for command in tree.get_commands(guild=guild)),
+        key=lambda command: (command.get("type", 1), command["name"])
+    )
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+async def sync_command_tree(tree: app_commands.CommandTree, collection, application_id: int,
+                            dev_guild_id: Optional[int] = None) -> bool:
+    """Sync the command tree if it differs from the last sync; returns whether Discord was called.
+
+    The hash of the last synced tree is kept in `collection` (keyed by
+    application and scope), so reconnects and restarts with unchanged commands
+    skip the rate-limited sync entirely. With `dev_guild_id` the global
+    commands are copied to that guild and synced there, where changes show up
+    immediately.
+    """
+    guild = discord.Object(id=dev_guild_id) if dev_guild_id else None
+    if guild:
+        tree.copy_global_to(guild=guild)
+    key = f"command_tree:{application_id}:{dev_guild_id or 'global'}"
+    signature = command_tree_hash(tree, guild)
+
+    synced = await collection.find_one({"_id": key})
+    if synced and synced.get("hash") == signature:
+        logger.info(f"Command tree unchanged ({signature[:12]}), skipping sync")
+        return False
+
+    commands = await tree.sync(guild=guild)
+    await collection.update_one(
+        {"_id": key},
+        {"$set": {"hash": signature, "synced_at": datetime.utcnow(), "commands": len(commands)}},
+        upsert=True
+    )
+    logger.info(f"Synced {len(commands)} commands ({signature[:12]}) to {'guild ' + str(dev_guild_id) if guild else 'all guilds'}")
+    return True
@@ -0,0 +1,271 @@
+"""In-memory state of a running match, persisted once when the match ends"""
+import random
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from pymongo import UpdateOne
+
+from loot import Armory, WeaponTable
+from ratings import rating_update
+
+# Damage credited for an elimination recorded without its damage (kills from before loot)
+KILL_DAMAGE = 100
+# Leaders kept up to date for live status
+TOP_KILLERS = 5
+# Recent games whose results each player has been credited with, so a retried write skips them
+RECORDED_GAMES = 20
+
+
+class PlayerResult:
+    __slots__ = ("player_id", "discord_id", "username", "seat", "kills", "damage_dealt", "placement",
+                 "eliminated_at", "killed_by")
+
+    def __init__(self, player_id: str, discord_id: Optional[str] = None, username: Optional[str] = None,
+                 seat: int = 0):
+        self.player_id = player_id
+        self.seat = seat
+        self.discord_id = discord_id
+        self.username = username
+        self.kills = 0
+        self.damage_dealt = 0
+        self.placement: Optional[int] = None
+        self.eliminated_at: Optional[datetime] = None
+        self.killed_by: Optional[str] = None
+
+    def as_player(self) -> dict:
+        return {"id": self.player_id, "discord_id": self.discord_id, "username": self.username}
+
+
+class MatchState:
+    """Placement, survival time, kills and damage of every participant of one match.
+
+    Kills update this state in memory; `player_updates` and `result_document`
+    turn it into one bulk write and one match results document at the end, so
+    nothing has to be aggregated back out of game_actions afterwards. The
+    players still standing are kept in a list with swap-removal, so picking
+    encounters and recording eliminations cost the same in a 10,000-player
+    lobby as in a 10-player one. Weapons and health are in `armory`, indexed
+    by each player's seat. The top killers are maintained on every kill, so
+    `snapshot` is cheap enough to take every tick.
+    """
+
+    def __init__(self, game_id: str, started_at: datetime, players: Iterable[dict],
+                 weapons: Optional[WeaponTable] = None):
+        self.game_id = game_id
+        self.armory = Armory(weapons or WeaponTable(()))
+        self._seats: List[str] = []
+        self.started_at = started_at
+        self.ended_at: Optional[datetime] = None
+        self.winner: Optional[str] = None
+        self.players: Dict[str, PlayerResult] = {}
+        self._alive: List[str] = []
+        self._alive_index: Dict[str, int] = {}
+        self._leaders: List[PlayerResult] = []
+        for player in players:
+            self.add_player(player)
+
+    @classmethod
+    def replay(cls, game_id: str, started_at: datetime, players: Iterable[dict], actions: Iterable[dict],
+               weapons: Optional[WeaponTable] = None) -> "MatchState":
+        """Rebuild the state from a match's recorded kill and loot actions, e.g. after taking over its lease"""
+        state = cls(game_id, started_at, players, weapons)
+        for action in actions:
+            if action.get("action_type") == "loot":
+                state.record_loot(action["player_id"], action.get("weapon"))
+            else:
+                state.record_kill(action["player_id"], action["target_player_id"], damage=action.get("damage", KILL_DAMAGE),
+                                  damage_taken=action.get("damage_taken", 0), at=action.get("timestamp"))
+        return state
+
+    @property
+    def alive(self) -> int:
+        return len(self._alive)
+
+    def add_player(self, player: dict) -> PlayerResult:
+        result = self.players.get(player["id"])
+        if result is None:
+            seat = self.armory.seat()
+            result = self.players[player["id"]] = PlayerResult(player["id"], player.get("discord_id"), player.get("username"), seat)
+            self._seats.append(result.player_id)
+            self._alive_index[result.player_id] = len(self._alive)
+            self._alive.append(result.player_id)
+        return result
+
+    def _eliminate(self, player_id: str):
+        # Move the last alive player into the freed slot
+        index = self._alive_index.pop(player_id)
+        last = self._alive.pop()
+        if last != player_id:
+            self._alive[index] = last
+            self._alive_index[last] = index
+
+    def _result(self, player_id: str) -> PlayerResult:
+        # Not in the lobby list we started from; track it anyway rather than lose the kill
+        return self.players.get(player_id) or self.add_player({"id": player_id})
+
+    def pick_encounters(self, count: int = 1, rng: random.Random = random) -> List[Tuple[PlayerResult, PlayerResult]]:
+        """Up to `count` disjoint random pairs of alive players"""
+        count = min(count, len(self._alive) // 2)
+        if count <= 0:
+            return []
+        picked = rng.sample(self._alive, count * 2)
+        return [(self.players[picked[i]], self.players[picked[i + 1]]) for i in range(0, len(picked), 2)]
+
+    def weapon(self, player_id: str) -> str:
+        return self.armory.weapon(self.players[player_id].seat)
+
+    def fight(self, attacker_id: str, defender_id: str, rng: random.Random = random) -> Tuple[str, str, str, int, int]:
+        """Decide an encounter from both players' weapons and health without recording it.
+
+        Returns (winner, loser, winning weapon, finishing damage, damage the
+        loser dealt); pass the damage figures on to `record_kill`.
+        """
+        winner, loser, weapon, damage, damage_taken = self.armory.fight(
+            self.players[attacker_id].seat, self.players[defender_id].seat, rng
+        )
+        return self._seats[winner], self._seats[loser], self.armory.table.names[weapon], damage, damage_taken
+
+    def scavenge(self, count: int, rng: random.Random = random) -> List[Tuple[str, str]]:
+        """Up to `count` random alive players find a drop; returns (player, weapon) pairs to record"""
+        found = []
+        for player_id in rng.sample(self._alive, min(count, len(self._alive))):
+            weapon = self.armory.table.names[self.armory.table.roll(rng)]
+            self.record_loot(player_id, weapon)
+            found.append((player_id, weapon))
+        return found
+
+    def record_loot(self, player_id: str, weapon: Optional[str]):
+        weapon_id = self.armory.table.ids.get(weapon)
+        if weapon_id is not None:
+            self.armory.scavenge(self._result(player_id).seat, weapon_id)
+
+    def record_kill(self, killer_id: str, victim_id: str, damage: int = KILL_DAMAGE, damage_taken: int = 0,
+                    at: Optional[datetime] = None):
+        killer = self._result(killer_id)
+        victim = self._result(victim_id)
+        if victim.placement is not None:
+            return
+        killer.kills += 1
+        killer.damage_dealt += damage
+        victim.damage_dealt += damage_taken
+        self.armory.apply(killer.seat, victim.seat, damage_taken)
+        self._rank(killer)
+        # Eliminated with n players alive means finishing n-th
+        victim.placement = self.alive
+        victim.eliminated_at = at or datetime.utcnow()
+        victim.killed_by = killer_id
+        self._eliminate(victim_id)
+
+    def _rank(self, killer: PlayerResult):
+        # Kill counts only go up, so a player can only enter or climb the leaders
+        leaders = self._leaders
+        if killer not in leaders:
+            if len(leaders) >= TOP_KILLERS and killer.kills <= leaders[-1].kills:
+                return
+            leaders.append(killer)
+        leaders.sort(key=lambda result: result.kills, reverse=True)
+        del leaders[TOP_KILLERS:]
+
+    def top_killers(self) -> List[dict]:
+        return [
+            {"player_id": result.player_id, "username": result.username, "kills": result.kills,
+             "weapon": self.armory.weapon(result.seat), "alive": result.placement is None}
+            for result in self._leaders
+        ]
+
+    def snapshot(self) -> dict:
+        """Match progress for status queries, built from memory only"""
+        return {
+            "game_id": self.game_id,
+            "alive": self.alive,
+            "players": len(self.players),
+            "eliminated": len(self.players) - self.alive,
+            "top_killers": self.top_killers(),
+            "winner": self.winner,
+            "started_at": self.started_at,
+            "ended_at": self.ended_at
+        }
+
+    def finish(self, winner_id: Optional[str], at: Optional[datetime] = None):
+        """Close the match; everyone still standing shares the best remaining placement"""
+        self.ended_at = at or datetime.utcnow()
+        self.winner = winner_id
+        for result in self.players.values():
+            if result.placement is None:
+                result.placement = 1
+
+    def placements(self) -> Dict[str, int]:
+        return {player_id: result.placement or 1 for player_id, result in self.players.items()}
+
+    def survival_seconds(self, result: PlayerResult) -> float:
+        until = result.eliminated_at or self.ended_at or datetime.utcnow()
+        return round(max((until - self.started_at).total_seconds(), 0.0), 3)
+
+    def player_updates(self, ratings: Dict[str, Tuple[float, float]]) -> List[UpdateOne]:
+        """One update per participant applying their stats, rating and post-match reset, at most once per game"""
+        requests = []
+        for player_id, result in self.players.items():
+            update = {
+                "$inc": {
+                    "stats.games_played": 1,
+                    "stats.kills": result.kills,
+                    "stats.deaths": 1 if result.eliminated_at else 0,
+                    "stats.wins": 1 if player_id == self.winner else 0,
+                    "stats.damage_dealt": result.damage_dealt
+                },
+                "$push": {"recorded_games": {"$each": [self.game_id], "$slice": -RECORDED_GAMES}}
+            }
+            if player_id in ratings:
+                for operator, fields in rating_update(ratings[player_id][1], self.ended_at).items():
+                    update.setdefault(operator, {}).update(fields)
+            if result.eliminated_at is None:
+                # Eliminated players were released at their elimination and may have joined another game since
+                update.setdefault("$set", {}).update({"current_game_id": None, "is_alive": True})
+            requests.append(UpdateOne({"id": player_id, "recorded_games": {"$ne": self.game_id}}, update))
+        return requests
+
+    def result_document(self, game_data: dict, ratings: Dict[str, Tuple[float, float]]) -> dict:
+        players = []
+        for player_id, result in sorted(self.players.items(), key=lambda item: item[1].placement or 1):
+            rating_before, rating_after = ratings.get(player_id, (None, None))
+            players.append({
+                "player_id": player_id,
+                "discord_id": result.discord_id,
+                "username": result.username,
+                "placement": result.placement,
+                "kills": result.kills,
+                "damage_dealt": result.damage_dealt,
+                "survival_seconds": self.survival_seconds(result),
+                "killed_by": result.killed_by,
+                "rating_before": rating_before,
+                "rating_after": rating_after
+            })
+        return {
+            "game_id": self.game_id,
+            "guild_id": game_data.get("guild_id"),
+            "channel_id": game_data.get("channel_id"),
+            "mode": game_data.get("mode"),
+            "era": game_data.get("era"),
+            "started_at": self.started_at,
+            "ended_at": self.ended_at,
+            "duration_seconds": round((self.ended_at - self.started_at).total_seconds(), 3),
+            "winner": self.winner,
+            "player_count": len(players),
+            "players": players
+        }
+
+    def history_rows(self, game_data: dict) -> List[dict]:
+        """Compact per-player rows for the player_matches index"""
+        return [
+            {
+                "player_id": player_id,
+                "game_id": self.game_id,
+                "ended_at": self.ended_at,
+                "placement": result.placement,
+                "kills": result.kills,
+                "player_count": len(self.players),
+                "mode": game_data.get("mode"),
+                "era": game_data.get("era")
+            }
+            for player_id, result in self.players.items()
+        ]
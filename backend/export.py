@@ -0,0 +1,116 @@
+"""Constant-memory NDJSON and CSV exports of the game collections"""
+import csv
+import io
+import json
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+BATCH_SIZE = 1000
+
+# Columns written to CSV; nested fields use dotted paths. NDJSON exports whole documents.
+EXPORT_COLUMNS: Dict[str, List[str]] = {
+    "games": [
+        "_id", "id", "guild_id", "channel_id", "mode", "era", "status", "max_players", "current_players",
+        "alive_players", "start_time", "end_time", "winner", "shard_id", "created_at"
+    ],
+    "players": [
+        "_id", "id", "discord_id", "username", "rating", "stats.kills", "stats.deaths", "stats.wins",
+        "stats.games_played", "stats.damage_dealt", "current_game_id"
+    ],
+    "game_actions": [
+        "_id", "id", "game_id", "guild_id", "player_id", "action_type", "target_player_id", "weapon", "damage",
+        "damage_taken", "description", "timestamp"
+    ]
+}
+# Collections that carry a guild_id to filter on
+GUILD_SCOPED = {"games", "game_actions"}
+FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+class ExportError(ValueError):
+    pass
+
+
+def export_query(collection: str, since: Optional[datetime] = None, until: Optional[datetime] = None,
+                 guild_id: Optional[str] = None, after: Optional[str] = None) -> Dict[str, Any]:
+    """Mongo filter for one export page.
+
+    Documents are walked in `_id` order. ObjectIds start with their creation
+    time, so the time range becomes an `_id` range on the default index, and
+    `after` (the last `_id` a previous export wrote) resumes right behind it.
+    """
+    if collection not in EXPORT_COLUMNS:
+        raise ExportError(f"Unknown collection: {collection}")
+    id_range: Dict[str, ObjectId] = {}
+    if since:
+        id_range["$gte"] = ObjectId.from_datetime(since)
+    if until:
+        id_range["$lt"] = ObjectId.from_datetime(until)
+    if after:
+        try:
+            after_id = ObjectId(after)
+        except (InvalidId, TypeError):
+            raise ExportError("Invalid resume cursor")
+        if "$gte" not in id_range or after_id >= id_range["$gte"]:
+            id_range.pop("$gte", None)
+            id_range["$gt"] = after_id
+    query: Dict[str, Any] = {}
+    if id_range:
+        query["_id"] = id_range
+    if guild_id:
+        if collection not in GUILD_SCOPED:
+            raise ExportError(f"{collection} cannot be filtered by guild")
+        query["guild_id"] = guild_id
+    return query
+
+
+def _plain(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _column(document: dict, path: str):
+    value: Any = document
+    for part in path.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    if isinstance(value, (ObjectId, datetime)):
+        return _plain(value)
+    return value
+
+
+async def stream_export(db, collection: str, format: str = "ndjson", batch_size: int = BATCH_SIZE,
+                        **filters) -> AsyncIterator[str]:
+    """Yield the export one cursor batch at a time"""
+    if format not in FORMATS:
+        raise ExportError(f"Unknown format: {format}")
+    query = export_query(collection, **filters)
+    cursor = db[collection].find(query).sort("_id", 1).batch_size(batch_size)
+    columns = EXPORT_COLUMNS[collection]
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # A resumed CSV export is appended to the earlier file, which already has the header
+    if format == "csv" and not filters.get("after"):
+        writer.writerow(columns)
+    rows = 0
+    async for document in cursor:
+        if format == "csv":
+            writer.writerow([_column(document, column) for column in columns])
+        else:
+            buffer.write(json.dumps(document, default=_plain))
+            buffer.write("\n")
+        rows += 1
+        if rows % batch_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
@@ -0,0 +1,65 @@
+"""Export games, players or game actions straight from Mongo.
+
+    python export_cli.py games --format csv --since 2024-01-01 --output games.csv
+    python export_cli.py game_actions --guild-id 1234 --after 65a1f0c2e4b0a1b2c3d4e5f6 >> actions.ndjson
+
+Pass the `_id` of the last exported row as --after to resume an interrupted export.
+"""
+import asyncio
+import os
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+import typer
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from export import BATCH_SIZE, EXPORT_COLUMNS, FORMATS, ExportError, export_query, stream_export
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+app = typer.Typer(add_completion=False)
+
+
+async def run_export(collection: str, format: str, output, batch_size: int, **filters):
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    try:
+        db = client[os.environ['DB_NAME']]
+        async for chunk in stream_export(db, collection, format, batch_size, **filters):
+            output.write(chunk)
+    finally:
+        client.close()
+
+
+@app.command()
+def main(
+    collection: str = typer.Argument(..., help=f"One of: {', '.join(EXPORT_COLUMNS)}"),
+    format: str = typer.Option("ndjson", "--format", "-f", help=f"One of: {', '.join(FORMATS)}"),
+    since: Optional[datetime] = typer.Option(None, help="Only documents created at or after this time (UTC)"),
+    until: Optional[datetime] = typer.Option(None, help="Only documents created before this time (UTC)"),
+    guild_id: Optional[str] = typer.Option(None, help="Only this guild's games or actions"),
+    after: Optional[str] = typer.Option(None, help="Resume after this _id"),
+    batch_size: int = typer.Option(BATCH_SIZE, help="Documents fetched per cursor batch"),
+    output: Optional[Path] = typer.Option(None, "--output", "-o", help="Write here instead of stdout")
+):
+    filters = {"since": since, "until": until, "guild_id": guild_id, "after": after}
+    try:
+        export_query(collection, **filters)
+        if format not in FORMATS:
+            raise ExportError(f"Unknown format: {format}")
+    except ExportError as e:
+        raise typer.BadParameter(str(e))
+
+    if output is None:
+        asyncio.run(run_export(collection, format, sys.stdout, batch_size, **filters))
+        return
+    # Append when resuming so the earlier rows are kept
+    with open(output, "a" if after else "w", newline="") as handle:
+        asyncio.run(run_export(collection, format, handle, batch_size, **filters))
+
+
+if __name__ == "__main__":
+    app()
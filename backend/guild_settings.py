@@ -0,0 +1,121 @@
+"""Per-guild settings stored in Mongo and cached in-process until they change"""
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+from pymongo import ReturnDocument
+from pymongo.errors import OperationFailure
+
+from ipc import CHANGE_STREAM_UNSUPPORTED
+
+logger = logging.getLogger(__name__)
+
+
+class GuildSettingsCache:
+    """Settings for each guild, overlaid on the defaults.
+
+    Reads are served from memory. While `watch` runs, a change to any guild's
+    document (from any process) drops that guild's cached copy, through a
+    change stream when the deployment supports one and by polling
+    `updated_at` every `poll_seconds` otherwise. `ttl_seconds` only bounds
+    how stale a copy can get if watching stops working.
+    """
+
+    def __init__(self, collection, defaults: Dict[str, Any], ttl_seconds: float = 600, poll_seconds: float = 5):
+        self.collection = collection
+        self.defaults = defaults
+        self.ttl_seconds = ttl_seconds
+        self.poll_seconds = poll_seconds
+        self._cache: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+
+    async def ensure_indexes(self):
+        await self.collection.create_index("guild_id", unique=True)
+        await self.collection.create_index("updated_at")
+
+    def _merge(self, document: Optional[dict]) -> Dict[str, Any]:
+        settings = dict(self.defaults)
+        if document:
+            settings.update({key: value for key, value in document.get("settings", {}).items() if key in self.defaults})
+        return settings
+
+    async def get(self, guild_id: str) -> Dict[str, Any]:
+        cached = self._cache.get(guild_id)
+        if cached and time.monotonic() - cached[0] < self.ttl_seconds:
+            return cached[1]
+        document = await self.collection.find_one({"guild_id": guild_id}, {"settings": 1})
+        settings = self._merge(document)
+        self._cache[guild_id] = (time.monotonic(), settings)
+        return settings
+
+    async def update(self, guild_id: str, changes: Dict[str, Any]) -> Dict[str, Any]:
+        unknown = set(changes) - set(self.defaults)
+        if unknown:
+            raise ValueError(f"Unknown settings: {', '.join(sorted(unknown))}")
+        if not changes:
+            return await self.get(guild_id)
+        document = await self.collection.find_one_and_update(
+            {"guild_id": guild_id},
+            {
+                "$set": {f"settings.{key}": value for key, value in changes.items()},
+                "$currentDate": {"updated_at": True}
+            },
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        settings = self._merge(document)
+        self._cache[guild_id] = (time.monotonic(), settings)
+        return settings
+
+    def invalidate(self, guild_id: Optional[str] = None):
+        if guild_id is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(guild_id, None)
+
+    async def watch(self):
+        """Drop cached settings as they change, forever, reconnecting on transient errors"""
+        use_change_stream = True
+        while True:
+            try:
+                if use_change_stream:
+                    await self._watch_change_stream()
+                else:
+                    await self._poll()
+            except OperationFailure as e:
+                if use_change_stream and e.code in CHANGE_STREAM_UNSUPPORTED:
+                    logger.info("Change streams unavailable, polling guild settings instead")
+                    use_change_stream = False
+                    continue
+                logger.error(f"Guild settings watch error: {e}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Guild settings watch error: {e}")
+            # Changes may have been missed while disconnected
+            self.invalidate()
+            await asyncio.sleep(1)
+
+    async def _watch_change_stream(self):
+        async with self.collection.watch(full_document="updateLookup") as stream:
+            async for change in stream:
+                document = change.get("fullDocument")
+                if document:
+                    self.invalidate(document["guild_id"])
+                else:
+                    # Deletes carry no document to tell which guild it was
+                    self.invalidate()
+
+    async def _poll(self):
+        # updated_at is set by the server, so compare against its clock rather than ours
+        newest = await self.collection.find_one({}, {"updated_at": 1}, sort=[("updated_at", -1)])
+        since = (newest or {}).get("updated_at") or datetime(1970, 1, 1)
+        while True:
+            await asyncio.sleep(self.poll_seconds)
+            changed = await self.collection.find(
+                {"updated_at": {"$gt": since}}, {"guild_id": 1, "updated_at": 1}
+            ).to_list(None)
+            for document in changed:
+                self.invalidate(document["guild_id"])
+                since = max(since, document["updated_at"])
@@ -0,0 +1,109 @@
+"""Cross-process event channel between the API workers and the bot worker"""
+import asyncio
+import logging
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List
+
+from pymongo import CursorType
+from pymongo.errors import CollectionInvalid, OperationFailure
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[Dict[str, Any]], Awaitable[None]]
+
+# Change streams need a replica set; a standalone mongod answers with one of these
+CHANGE_STREAM_UNSUPPORTED = {40573, 40324}
+
+
+class EventChannel:
+    """Publish/subscribe channel backed by a capped Mongo collection.
+
+    Events are delivered through a change stream when the deployment supports
+    it and through a tailable cursor on the capped collection otherwise, so the
+    same code works against a standalone mongod and a replica set.
+    """
+
+    def __init__(self, db, origin: str, name: str = "process_events", size_bytes: int = 16 * 1024 * 1024):
+        self.db = db
+        self.origin = origin
+        self.name = name
+        self.size_bytes = size_bytes
+        self._handlers: Dict[str, List[Handler]] = defaultdict(list)
+        self._ready = False
+
+    @property
+    def collection(self):
+        return self.db[self.name]
+
+    async def setup(self):
+        """Create the capped collection backing the channel if needed"""
+        if self._ready:
+            return
+        try:
+            await self.db.create_collection(self.name, capped=True, size=self.size_bytes)
+        except (CollectionInvalid, OperationFailure):
+            pass  # Already exists
+        self._ready = True
+
+    def subscribe(self, kind: str, handler: Handler):
+        """Register a coroutine called with the payload of every `kind` event"""
+        self._handlers[kind].append(handler)
+
+    async def publish(self, kind: str, payload: Dict[str, Any]):
+        """Broadcast an event to every subscribed process"""
+        await self.setup()
+        await self.collection.insert_one({
+            "kind": kind,
+            "origin": self.origin,
+            "payload": payload,
+            "created_at": datetime.utcnow()
+        })
+
+    async def _dispatch(self, event: Dict[str, Any]):
+        for handler in self._handlers.get(event.get("kind"), ()):
+            try:
+                await handler(event.get("payload") or {})
+            except Exception as e:
+                logger.error(f"Error handling {event.get('kind')} event: {e}")
+
+    async def run(self):
+        """Consume events forever, reconnecting on transient errors"""
+        await self.setup()
+        use_change_stream = True
+        while True:
+            try:
+                if use_change_stream:
+                    await self._run_change_stream()
+                else:
+                    await self._run_tailable_cursor()
+            except OperationFailure as e:
+                if use_change_stream and e.code in CHANGE_STREAM_UNSUPPORTED:
+                    logger.info("Change streams unavailable, falling back to tailable cursor")
+                    use_change_stream = False
+                    continue
+                logger.error(f"Event channel error: {e}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Event channel error: {e}")
+            await asyncio.sleep(1)
+
+    async def _run_change_stream(self):
+        pipeline = [{"$match": {"operationType": "insert"}}]
+        async with self.collection.watch(pipeline) as stream:
+            async for change in stream:
+                await self._dispatch(change["fullDocument"])
+
+    async def _run_tailable_cursor(self):
+        # Start from the newest event so a restart doesn't replay old history
+        newest = await self.collection.find_one(sort=[("$natural", -1)])
+        last_id = newest["_id"] if newest else None
+        while True:
+            query = {"_id": {"$gt": last_id}} if last_id else {}
+            cursor = self.collection.find(query, cursor_type=CursorType.TAILABLE_AWAIT)
+            while cursor.alive:
+                async for event in cursor:
+                    last_id = event["_id"]
+                    await self._dispatch(event)
+            await asyncio.sleep(0.5)
@@ -0,0 +1,190 @@
+"""Mongo-backed ownership leases for active games"""
+import asyncio
+import logging
+import random
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional
+
+from pymongo import ReturnDocument
+
+logger = logging.getLogger(__name__)
+
+
+class GameLeaseManager:
+    """Makes sure every active game is simulated by exactly one worker.
+
+    A worker owns a game while `games.lease.owner` holds its ID and
+    `games.lease.expires_at` is in the future. Leases are renewed in one batched
+    update per heartbeat; when a worker dies its leases expire and the
+    remaining workers take the games over with an atomic find-and-modify.
+
+    A game is leased by the same update that starts it (`start`), so it is
+    never active without an owner; only games from before leases existed, or
+    whose lease was released, are picked up lease-less, once they are older
+    than a lease TTL.
+
+    Every acquisition bumps `games.lease_epoch`. A tick can outlast the lease
+    (encounter waits, image queues, Discord backoff), so writes that change a
+    game's outcome filter on `fence(game_id)` and are dropped if another
+    worker has taken the game over since.
+    """
+
+    def __init__(self, collection, owner_id: str, ttl_seconds: int = 30, heartbeat_seconds: int = 10,
+                 claim_batch: int = 5, foreign_grace_seconds: int = 60):
+        if heartbeat_seconds * 2 > ttl_seconds:
+            raise ValueError("Lease heartbeat must be at most half the lease TTL")
+        self.collection = collection
+        self.owner_id = owner_id
+        self.ttl = timedelta(seconds=ttl_seconds)
+        self.heartbeat_seconds = heartbeat_seconds
+        self.claim_batch = claim_batch
+        # Games on shards served by other workers are only taken over after this extra delay,
+        # giving the shard's own worker the first chance to pick them up again
+        self.foreign_grace = timedelta(seconds=foreign_grace_seconds)
+        # Game ID -> when our lease expires, as far as we know
+        self.owned: Dict[str, datetime] = {}
+        # Game ID -> lease epoch we acquired it at
+        self.epochs: Dict[str, int] = {}
+
+    async def ensure_indexes(self):
+        await self.collection.create_index([("status", 1), ("lease.expires_at", 1)])
+
+    def owns(self, game_id: str) -> bool:
+        """Whether this worker still holds a live lease on a game"""
+        expires_at = self.owned.get(game_id)
+        return expires_at is not None and expires_at > datetime.utcnow()
+
+    def fence(self, game_id: str) -> dict:
+        """Filter matching the game only while our lease on it is the current one"""
+        return {"id": game_id, "lease.owner": self.owner_id, "lease_epoch": self.epochs.get(game_id)}
+
+    def lost(self, game_id: str):
+        """Forget a lease a fenced write found taken over"""
+        self.owned.pop(game_id, None)
+        self.epochs.pop(game_id, None)
+
+    def _leased(self, game: Optional[dict], expires_at: datetime) -> bool:
+        if not game:
+            return False
+        self.owned[game["id"]] = expires_at
+        self.epochs[game["id"]] = game["lease_epoch"]
+        return True
+
+    async def start(self, game_id: str, changes: dict) -> bool:
+        """Move a waiting game to active with `changes` and take its lease in the same update"""
+        now = datetime.utcnow()
+        expires_at = now + self.ttl
+        game = await self.collection.find_one_and_update(
+            {"id": game_id, "status": "waiting"},
+            {
+                "$set": {**changes, "status": "active",
+                         "lease": {"owner": self.owner_id, "heartbeat_at": now, "expires_at": expires_at}},
+                "$inc": {"lease_epoch": 1}
+            },
+            projection={"id": 1, "lease_epoch": 1},
+            return_document=ReturnDocument.AFTER
+        )
+        return self._leased(game, expires_at)
+
+    def _claimable(self, now: datetime, grace: timedelta) -> List[dict]:
+        return [
+            {"lease.expires_at": {"$lt": now - grace}},
+            # Lease-less active games predate leasing at start; leave fresh ones to whoever is starting them
+            {"lease": None, "start_time": {"$not": {"$gte": now - self.ttl - grace}}}
+        ]
+
+    async def acquire(self, game_id: str, grace: timedelta = timedelta(0)) -> bool:
+        """Take the lease on an active game if it is free, expired or already ours"""
+        now = datetime.utcnow()
+        expires_at = now + self.ttl
+        game = await self.collection.find_one_and_update(
+            {
+                "id": game_id,
+                "status": "active",
+                "$or": [{"lease.owner": self.owner_id}] + self._claimable(now, grace)
+            },
+            {
+                "$set": {"lease": {"owner": self.owner_id, "heartbeat_at": now, "expires_at": expires_at}},
+                "$inc": {"lease_epoch": 1}
+            },
+            projection={"id": 1, "lease_epoch": 1},
+            return_document=ReturnDocument.AFTER
+        )
+        return self._leased(game, expires_at)
+
+    async def release(self, game_id: str):
+        """Give up a lease, e.g. once the game has finished"""
+        self.lost(game_id)
+        await self.collection.update_one(
+            {"id": game_id, "lease.owner": self.owner_id},
+            {"$unset": {"lease": ""}}
+        )
+
+    async def renew_all(self) -> List[str]:
+        """Extend every lease we hold; returns the games whose lease was lost"""
+        if not self.owned:
+            return []
+        now = datetime.utcnow()
+        expires_at = now + self.ttl
+        game_ids = list(self.owned)
+        await self.collection.update_many(
+            {"id": {"$in": game_ids}, "lease.owner": self.owner_id, "status": "active"},
+            {"$set": {"lease.heartbeat_at": now, "lease.expires_at": expires_at}}
+        )
+        still_owned = {
+            game["id"] async for game in self.collection.find(
+                {"id": {"$in": game_ids}, "lease.owner": self.owner_id, "status": "active"},
+                {"id": 1}
+            )
+        }
+        lost = []
+        for game_id in game_ids:
+            if game_id in still_owned:
+                self.owned[game_id] = expires_at
+            else:
+                self.lost(game_id)
+                lost.append(game_id)
+        return lost
+
+    async def claim_orphans(self, shard_ids: Iterable[int]) -> List[dict]:
+        """Take over active games whose owner stopped renewing its lease"""
+        now = datetime.utcnow()
+        shard_ids = list(shard_ids)
+        orphan_filter = {
+            "status": "active",
+            "id": {"$nin": list(self.owned)},
+            "$or": self._claimable(now, timedelta(0))
+        }
+        candidates = await self.collection.find(orphan_filter, {"id": 1, "shard_id": 1}).to_list(self.claim_batch * 4)
+        # Prefer games on our own shards, and shuffle so concurrent workers spread the load
+        random.shuffle(candidates)
+        candidates.sort(key=lambda game: game.get("shard_id", 0) not in shard_ids)
+
+        claimed = []
+        for game in candidates:
+            if len(claimed) >= self.claim_batch:
+                break
+            grace = timedelta(0) if game.get("shard_id", 0) in shard_ids else self.foreign_grace
+            if await self.acquire(game["id"], grace=grace):
+                claimed.append(game)
+        return claimed
+
+    async def run(self, shard_ids: Callable[[], Iterable[int]], on_claimed: Callable[[dict], None],
+                  on_lost: Callable[[str], None], can_claim: Optional[Callable[[], bool]] = None):
+        """Heartbeat loop: renew our leases and pick up orphaned games while `can_claim` allows"""
+        while True:
+            try:
+                for game_id in await self.renew_all():
+                    logger.warning(f"Lost lease on game {game_id}")
+                    on_lost(game_id)
+                # At capacity, orphans are left to workers with room
+                if can_claim is None or can_claim():
+                    for game in await self.claim_orphans(shard_ids()):
+                        logger.info(f"Took over game {game['id']}")
+                        on_claimed(game)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error maintaining game leases: {e}")
+            # Jitter so workers that started together don't race for the same orphans
+            await asyncio.sleep(self.heartbeat_seconds * random.uniform(0.8, 1.0))
@@ -0,0 +1,54 @@
+"""Latest per-tick snapshot of every running match, for status queries that never touch Mongo"""
+import json
+import time
+from typing import Any, Dict, Optional, Tuple
+
+
+class LiveBoard:
+    """Snapshots by game (and the game running in each channel), with their JSON pre-rendered.
+
+    The engine replaces a game's snapshot once per tick, so any number of
+    status queries in between cost a dict lookup. Finished games stay for
+    `ttl_seconds` so the final standings can still be looked up.
+    """
+
+    def __init__(self, ttl_seconds: float = 300):
+        self.ttl_seconds = ttl_seconds
+        self._snapshots: Dict[str, Tuple[Dict[str, Any], bytes, float]] = {}
+        self._channels: Dict[str, str] = {}
+        self._next_prune = 0.0
+
+    def __len__(self) -> int:
+        return len(self._snapshots)
+
+    def publish(self, snapshot: Dict[str, Any]):
+        now = time.monotonic()
+        game_id = snapshot["game_id"]
+        self._snapshots[game_id] = (snapshot, json.dumps(snapshot, default=str).encode(), now)
+        if snapshot.get("channel_id"):
+            self._channels[snapshot["channel_id"]] = game_id
+        if now >= self._next_prune:
+            self.prune(now)
+
+    def get(self, game_id: str) -> Optional[Dict[str, Any]]:
+        entry = self._snapshots.get(game_id)
+        return entry[0] if entry else None
+
+    def body(self, game_id: str) -> Optional[bytes]:
+        entry = self._snapshots.get(game_id)
+        return entry[1] if entry else None
+
+    def in_channel(self, channel_id: str) -> Optional[Dict[str, Any]]:
+        game_id = self._channels.get(channel_id)
+        return self.get(game_id) if game_id else None
+
+    def prune(self, now: Optional[float] = None):
+        """Drop snapshots of finished games, and of games that stopped ticking, after the TTL"""
+        now = time.monotonic() if now is None else now
+        for game_id, (snapshot, _, updated) in list(self._snapshots.items()):
+            if now - updated < self.ttl_seconds:
+                continue
+            del self._snapshots[game_id]
+            if self._channels.get(snapshot.get("channel_id")) == game_id:
+                del self._channels[snapshot["channel_id"]]
+        self._next_prune = now + min(self.ttl_seconds, 60)
@@ -0,0 +1,106 @@
+"""Lobby membership kept outside the game document, and debounced lobby message edits"""
+import asyncio
+import logging
+from datetime import datetime
+from typing import AsyncIterator, Awaitable, Callable, Dict, Iterable, List
+
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+
+class LobbyMembers:
+    """One `{game_id, player_id}` row per player in a game.
+
+    Joining is a single insert, however big the lobby, and nothing reads the
+    whole roster except game start and match-state loading, which stream it
+    in batches. Starting a game marks the rows present at that moment with
+    `in_match`; a join that lost the race to the start removes its row unless
+    it was marked, so the marked rows are exactly the players in the match.
+    """
+
+    def __init__(self, collection, batch_size: int = 1000):
+        self.collection = collection
+        self.batch_size = batch_size
+
+    async def ensure_indexes(self):
+        await self.collection.create_index([("game_id", 1), ("player_id", 1)], unique=True)
+
+    async def join(self, game_id: str, player_id: str) -> bool:
+        """Add a player to a lobby; False if they were already in it"""
+        try:
+            await self.collection.insert_one({"game_id": game_id, "player_id": player_id, "joined_at": datetime.utcnow()})
+        except DuplicateKeyError:
+            return False
+        return True
+
+    async def withdraw(self, game_id: str, player_id: str) -> bool:
+        """Undo a join the lobby couldn't take; False if the game already started with the player in it"""
+        result = await self.collection.delete_one({"game_id": game_id, "player_id": player_id, "in_match": {"$ne": True}})
+        return result.deleted_count == 1
+
+    async def add_many(self, game_id: str, player_ids: Iterable[str]):
+        """Seat a whole roster at once, e.g. a matchmade game"""
+        now = datetime.utcnow()
+        rows = [{"game_id": game_id, "player_id": player_id, "joined_at": now, "in_match": True} for player_id in player_ids]
+        if rows:
+            await self.collection.insert_many(rows, ordered=False)
+
+    async def lock(self, game_id: str):
+        """Freeze the roster of a game that just started"""
+        await self.collection.update_many({"game_id": game_id, "in_match": {"$ne": True}}, {"$set": {"in_match": True}})
+
+    async def batches(self, game: dict, batch_size: int = None) -> AsyncIterator[List[str]]:
+        """Player IDs of a started game, streamed in batches"""
+        batch_size = batch_size or self.batch_size
+        if game.get("players"):
+            # Games created before membership moved out of the game document
+            for start in range(0, len(game["players"]), batch_size):
+                yield game["players"][start:start + batch_size]
+            return
+        batch = []
+        cursor = self.collection.find({"game_id": game["id"], "in_match": True}, {"player_id": 1, "_id": 0}).batch_size(batch_size)
+        async for row in cursor:
+            batch.append(row["player_id"])
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    async def remove_game(self, game_id: str):
+        """Drop a game's roster once its match results hold the participants"""
+        await self.collection.delete_many({"game_id": game_id})
+
+
+class Debouncer:
+    """Runs at most one pending call per key, `delay` seconds after the first request.
+
+    A lobby filling up with a thousand players triggers a thousand joins but
+    only one message edit per `delay`, which reads the latest state anyway.
+    """
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self._pending: Dict[str, asyncio.Task] = {}
+
+    def schedule(self, key: str, call: Callable[[], Awaitable[None]]):
+        if key in self._pending:
+            return
+        self._pending[key] = asyncio.create_task(self._run(key, call))
+
+    async def _run(self, key: str, call: Callable[[], Awaitable[None]]):
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            # Requests arriving while the call runs schedule a fresh one
+            self._pending.pop(key, None)
+        try:
+            await call()
+        except Exception as e:
+            logger.error(f"Error in debounced call for {key}: {e}")
+
+    def cancel(self, key: str):
+        task = self._pending.pop(key, None)
+        if task:
+            task.cancel()
@@ -0,0 +1,128 @@
+"""Era weapon tables, per-match inventories and weighted combat.
+
+A match's inventories and health live in flat arrays indexed by each player's
+seat, preallocated as players are seated, so looting and combat in the tick
+loop only overwrite numbers in place.
+"""
+import random
+from array import array
+from bisect import bisect
+from itertools import accumulate
+from typing import Dict, Sequence, Tuple
+
+# Damage per hit, chance to hit, and how often it drops relative to the rest of its era
+WEAPON_STATS: Dict[str, Tuple[int, float, int]] = {
+    "fists": (10, 0.9, 0),
+    "sword": (35, 0.8, 30),
+    "bow": (30, 0.7, 30),
+    "crossbow": (45, 0.65, 20),
+    "mace": (40, 0.75, 20),
+    "assault rifle": (40, 0.75, 30),
+    "sniper rifle": (80, 0.5, 10),
+    "pistol": (25, 0.8, 45),
+    "grenade": (60, 0.55, 15),
+    "laser rifle": (45, 0.8, 30),
+    "plasma cannon": (75, 0.55, 10),
+    "energy sword": (55, 0.75, 20),
+    "drone": (35, 0.85, 25),
+    "revolver": (30, 0.75, 40),
+    "rifle": (45, 0.7, 30),
+    "shotgun": (60, 0.6, 20),
+    "dynamite": (70, 0.5, 10),
+    "machete": (35, 0.85, 35),
+    "molotov": (50, 0.6, 15)
+}
+UNARMED = 0
+INVENTORY_SLOTS = 3
+MAX_HEALTH = 100
+# Health restored by whatever supplies turn up alongside a weapon
+LOOT_HEAL = 25
+# Whoever spots the other first hits harder; with equal loadouts they win 60% of the time
+ATTACKER_EDGE = 1.5
+
+
+class WeaponTable:
+    """One era's weapons as parallel arrays; weapon 0 is bare hands"""
+
+    def __init__(self, weapons: Sequence[str]):
+        self.names = ["fists", *weapons]
+        self.ids = {name: weapon_id for weapon_id, name in enumerate(self.names)}
+        stats = [WEAPON_STATS.get(name, (30, 0.7, 20)) for name in self.names]
+        self.damage = array("H", [damage for damage, _, _ in stats])
+        self.accuracy = array("d", [accuracy for _, accuracy, _ in stats])
+        self.power = array("d", [damage * accuracy for damage, accuracy, _ in stats])
+        # Cumulative drop weights of weapons 1..n for weighted rolls
+        self._drops = array("d", accumulate(weight for _, _, weight in stats[1:]))
+
+    def roll(self, rng: random.Random = random) -> int:
+        """A random drop, weighted by rarity"""
+        if not self._drops:
+            return UNARMED
+        return 1 + min(bisect(self._drops, rng.random() * self._drops[-1]), len(self._drops) - 1)
+
+
+class Armory:
+    """Inventories and health for every seat of one match"""
+
+    def __init__(self, table: WeaponTable):
+        self.table = table
+        self.slots = array("B")
+        self.best = array("B")
+        self.health = array("h")
+
+    def seat(self) -> int:
+        """Seat a new, unarmed player at full health"""
+        seat = len(self.best)
+        self.slots.extend((UNARMED,) * INVENTORY_SLOTS)
+        self.best.append(UNARMED)
+        self.health.append(MAX_HEALTH)
+        return seat
+
+    def weapon(self, seat: int) -> str:
+        return self.table.names[self.best[seat]]
+
+    def pick_up(self, seat: int, weapon: int):
+        """Take a weapon into an empty slot, or in place of the weakest one it beats"""
+        power, slots, base = self.table.power, self.slots, seat * INVENTORY_SLOTS
+        weakest = base
+        for slot in range(base, base + INVENTORY_SLOTS):
+            if power[slots[slot]] < power[slots[weakest]]:
+                weakest = slot
+        if power[weapon] <= power[slots[weakest]]:
+            return
+        slots[weakest] = weapon
+        if power[weapon] > power[self.best[seat]]:
+            self.best[seat] = weapon
+
+    def scavenge(self, seat: int, weapon: int):
+        self.pick_up(seat, weapon)
+        self.health[seat] = min(MAX_HEALTH, self.health[seat] + LOOT_HEAL)
+
+    def _strength(self, seat: int) -> float:
+        # Wounded players fight at down to half strength
+        return self.table.power[self.best[seat]] * (0.5 + self.health[seat] / (2 * MAX_HEALTH))
+
+    def fight(self, attacker: int, defender: int, rng: random.Random = random) -> Tuple[int, int, int, int, int]:
+        """Decide an exchange without changing anything.
+
+        Returns (winner seat, loser seat, winning weapon, damage of the
+        finishing blow, damage the loser landed first). The loser's hit never
+        takes the winner below 1 health.
+        """
+        attack = ATTACKER_EDGE * self._strength(attacker)
+        defence = self._strength(defender)
+        if rng.random() * (attack + defence) < attack:
+            winner, loser = attacker, defender
+        else:
+            winner, loser = defender, attacker
+        counter = 0
+        loser_weapon = self.best[loser]
+        if rng.random() < self.table.accuracy[loser_weapon]:
+            counter = min(self.table.damage[loser_weapon], self.health[winner] - 1)
+        return winner, loser, self.best[winner], self.health[loser], counter
+
+    def apply(self, winner: int, loser: int, counter: int):
+        """Settle a decided exchange: the winner takes the hit and the loser's best weapon"""
+        self.health[winner] = max(1, self.health[winner] - counter)
+        self.health[loser] = 0
+        self.pick_up(winner, self.best[loser])
@@ -0,0 +1,136 @@
+"""Matchmaking queues that pool waiting players into full matches"""
+import asyncio
+import heapq
+import logging
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# (guild_id, channel_id or None when pooling across channels, mode, era, rating band or None)
+BucketKey = Tuple[str, Optional[str], str, str, Optional[int]]
+
+
+class QueueEntry:
+    __slots__ = ("discord_id", "username", "avatar_url", "channel_id", "joined_at")
+
+    def __init__(self, discord_id: str, username: str, avatar_url: Optional[str], channel_id: str):
+        self.discord_id = discord_id
+        self.username = username
+        self.avatar_url = avatar_url
+        self.channel_id = channel_id
+        self.joined_at = time.monotonic()
+
+
+class Matchmaker:
+    """Per-bucket FIFO queues keyed by guild (and optionally channel), mode, era and rating band.
+
+    Joining and leaving are O(1): each bucket is an insertion-ordered dict and a
+    player index maps every queued player to their bucket. A match forms as soon
+    as a bucket reaches capacity, or once its oldest player has waited
+    `max_wait_seconds` and at least `min_players` are queued; deadlines sit in
+    a heap so the sweeper only looks at buckets that are actually due.
+    """
+
+    def __init__(self, capacity_for: Callable[[str], int],
+                 on_match: Callable[[BucketKey, List[QueueEntry]], Awaitable[None]],
+                 min_players: int = 2, max_wait_seconds: float = 120, cross_channel: bool = True):
+        self.capacity_for = capacity_for
+        self.on_match = on_match
+        self.min_players = min_players
+        self.max_wait_seconds = max_wait_seconds
+        self.cross_channel = cross_channel
+        self.buckets: Dict[BucketKey, "OrderedDict[str, QueueEntry]"] = {}
+        self.player_buckets: Dict[str, BucketKey] = {}
+        self._deadlines: List[Tuple[float, BucketKey]] = []
+
+    def bucket_key(self, guild_id: str, channel_id: str, mode: str, era: str, band: Optional[int] = None) -> BucketKey:
+        return (guild_id, None if self.cross_channel else channel_id, mode, era, band)
+
+    def queued_bucket(self, discord_id: str) -> Optional[BucketKey]:
+        return self.player_buckets.get(discord_id)
+
+    def queue_size(self, key: BucketKey) -> int:
+        bucket = self.buckets.get(key)
+        return len(bucket) if bucket else 0
+
+    def join(self, key: BucketKey, entry: QueueEntry) -> Optional[List[QueueEntry]]:
+        """Queue a player; returns the formed match if this join filled the bucket"""
+        if entry.discord_id in self.player_buckets:
+            raise ValueError("Player is already queued")
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = OrderedDict()
+        if not bucket:
+            heapq.heappush(self._deadlines, (entry.joined_at + self.max_wait_seconds, key))
+        bucket[entry.discord_id] = entry
+        self.player_buckets[entry.discord_id] = key
+
+        capacity = self.capacity_for(key[2])
+        if len(bucket) >= capacity:
+            return self._take(key, capacity)
+        # The oldest player already waited long enough and this join made the match viable
+        if len(bucket) >= self.min_players:
+            oldest = next(iter(bucket.values()))
+            if oldest.joined_at + self.max_wait_seconds <= entry.joined_at:
+                return self._take(key, capacity)
+        return None
+
+    def leave(self, discord_id: str) -> bool:
+        key = self.player_buckets.pop(discord_id, None)
+        if key is None:
+            return False
+        bucket = self.buckets[key]
+        del bucket[discord_id]
+        if not bucket:
+            del self.buckets[key]
+        return True
+
+    def _take(self, key: BucketKey, count: int) -> List[QueueEntry]:
+        bucket = self.buckets[key]
+        entries = [bucket.popitem(last=False)[1] for _ in range(min(count, len(bucket)))]
+        for entry in entries:
+            del self.player_buckets[entry.discord_id]
+        if bucket:
+            # The next-oldest player now sets the bucket's deadline
+            oldest = next(iter(bucket.values()))
+            heapq.heappush(self._deadlines, (oldest.joined_at + self.max_wait_seconds, key))
+        else:
+            del self.buckets[key]
+        return entries
+
+    def due_matches(self, now: Optional[float] = None) -> List[Tuple[BucketKey, List[QueueEntry]]]:
+        """Form matches for every bucket whose wait deadline has passed"""
+        now = time.monotonic() if now is None else now
+        matches = []
+        while self._deadlines and self._deadlines[0][0] <= now:
+            _, key = heapq.heappop(self._deadlines)
+            bucket = self.buckets.get(key)
+            if not bucket:
+                continue
+            oldest = next(iter(bucket.values()))
+            deadline = oldest.joined_at + self.max_wait_seconds
+            if deadline > now:
+                # Stale entry; the oldest player left and a later deadline applies
+                heapq.heappush(self._deadlines, (deadline, key))
+                continue
+            if len(bucket) >= self.min_players:
+                matches.append((key, self._take(key, self.capacity_for(key[2]))))
+            else:
+                # Not enough players yet; check again when the next one would time out
+                heapq.heappush(self._deadlines, (now + self.max_wait_seconds, key))
+        return matches
+
+    async def run(self, interval: float = 1.0, can_match: Optional[Callable[[], bool]] = None):
+        """Sweep wait deadlines forever; due buckets stay queued while `can_match` says no"""
+        while True:
+            if can_match is not None and not can_match():
+                await asyncio.sleep(interval)
+                continue
+            for key, entries in self.due_matches():
+                try:
+                    await self.on_match(key, entries)
+                except Exception as e:
+                    logger.error(f"Error launching matchmade game for {key}: {e}")
+            await asyncio.sleep(interval)
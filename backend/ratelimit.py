@@ -0,0 +1,96 @@
+"""Token-bucket rate limiting, optionally shared between processes through Mongo"""
+import math
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+from pymongo import ReturnDocument
+
+
+class TokenBucket:
+    """`burst` tokens refilled at `rate` per second, per key, in this process"""
+
+    def __init__(self, rate: float, burst: int, max_keys: int = 100_000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+
+    def take(self, key: str, now: Optional[float] = None) -> float:
+        """Take a token; returns 0 if allowed, otherwise seconds until one is available"""
+        now = time.monotonic() if now is None else now
+        tokens, updated = self._buckets.get(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        if tokens < 1:
+            self._buckets[key] = (tokens, now)
+            return (1 - tokens) / self.rate
+        self._buckets[key] = (tokens - 1, now)
+        if len(self._buckets) > self.max_keys:
+            self._prune(now)
+        return 0.0
+
+    def refund(self, key: str):
+        """Give back a token taken for a request that was turned away after all"""
+        if key in self._buckets:
+            tokens, updated = self._buckets[key]
+            self._buckets[key] = (min(self.burst, tokens + 1), updated)
+
+    def _prune(self, now: float):
+        # A bucket that has refilled completely is the same as no bucket
+        full_after = self.burst / self.rate
+        for key in [key for key, (_, updated) in self._buckets.items() if now - updated >= full_after]:
+            del self._buckets[key]
+        if len(self._buckets) > self.max_keys:
+            # Still too many active callers; forget the least recently seen tenth
+            by_age = sorted(self._buckets, key=lambda key: self._buckets[key][1])
+            for key in by_age[:len(by_age) // 10]:
+                del self._buckets[key]
+
+
+class RateLimiter:
+    """A named limit checked locally first, then against shared counters if configured.
+
+    The local bucket turns away most abuse without a database round trip. With
+    a `shared` collection every allowed hit is also counted in a fixed window
+    of burst / rate seconds, so several processes together stay near the
+    same limit; TTL on `expires_at` removes old windows.
+    """
+
+    def __init__(self, name: str, rate: float, burst: int, shared=None):
+        self.name = name
+        self.local = TokenBucket(rate, burst)
+        self.shared = shared
+        self.window = max(1, math.ceil(burst / rate))
+
+    async def hit(self, key: str) -> float:
+        """Count one request for `key`; returns 0 if allowed, otherwise seconds to wait"""
+        key = f"{self.name}:{key}"
+        retry_after = self.local.take(key)
+        if retry_after or self.shared is None:
+            return retry_after
+        now = time.time()
+        window_start = int(now // self.window * self.window)
+        counter = await self.shared.find_one_and_update(
+            {"_id": f"{key}:{window_start}"},
+            {
+                "$inc": {"count": 1},
+                "$setOnInsert": {"expires_at": datetime.utcfromtimestamp(window_start) + timedelta(seconds=self.window * 2)}
+            },
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        if counter["count"] > self.local.burst:
+            return window_start + self.window - now
+        return 0.0
+
+    async def refund(self, key: str):
+        """Uncount an allowed hit for `key` whose request was turned away after all"""
+        key = f"{self.name}:{key}"
+        self.local.refund(key)
+        if self.shared is not None:
+            window_start = int(time.time() // self.window * self.window)
+            await self.shared.update_one({"_id": f"{key}:{window_start}", "count": {"$gt": 0}}, {"$inc": {"count": -1}})
+
+
+async def ensure_indexes(collection):
+    await collection.create_index("expires_at", expireAfterSeconds=0)
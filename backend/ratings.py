@@ -0,0 +1,77 @@
+"""Multiplayer Elo ratings updated from a match's placement order"""
+import calendar
+from datetime import datetime
+from typing import TYPE_CHECKING, Dict, List, Sequence, Tuple
+
+if TYPE_CHECKING:
+    import numpy as np
+
+DEFAULT_RATING = 1000.0
+K_FACTOR = 32.0
+# Rating history entries kept per player, as [unix time, rating] pairs
+HISTORY_LENGTH = 50
+# Above this many participants expected scores come from a rating histogram
+# instead of the full pairwise matrix, keeping big lobbies O(n * bins)
+PAIRWISE_LIMIT = 512
+HISTOGRAM_BINS = 256
+
+
+def expected_scores(ratings: "np.ndarray") -> "np.ndarray":
+    """Sum over opponents of each player's Elo win probability"""
+    import numpy as np  # Deferred: only needed once a match ends
+
+    n = len(ratings)
+    if n <= PAIRWISE_LIMIT:
+        # expected[i, j]: chance that i finishes ahead of j
+        expected = 1.0 / (1.0 + np.power(10.0, (ratings[None, :] - ratings[:, None]) / 400.0))
+        return expected.sum(axis=1) - 0.5  # Drop the i-vs-i term
+    counts, edges = np.histogram(ratings, bins=HISTOGRAM_BINS)
+    centers = (edges[:-1] + edges[1:]) / 2
+    expected = 1.0 / (1.0 + np.power(10.0, (centers[None, :] - ratings[:, None]) / 400.0))
+    return expected @ counts - 0.5
+
+
+def rating_deltas(ratings: Sequence[float], placements: Sequence[int], k: float = K_FACTOR) -> "np.ndarray":
+    """Rating change for every participant of one match.
+
+    Each player is scored against every opponent as in pairwise Elo (1 for
+    finishing ahead, 0.5 for a tie, 0 for finishing behind), and the total is
+    scaled by k / (n - 1) so a match moves a rating about as much as one duel.
+    """
+    import numpy as np
+
+    ratings = np.asarray(ratings, dtype=np.float64)
+    placements = np.asarray(placements, dtype=np.int64)
+    n = len(ratings)
+    if n < 2:
+        return np.zeros(n)
+
+    # Actual score from placements alone: opponents placed behind, plus half of the ties
+    order = np.sort(placements)
+    ahead_of = n - np.searchsorted(order, placements, side="right")
+    tied = np.searchsorted(order, placements, side="right") - np.searchsorted(order, placements, side="left") - 1
+    actual = ahead_of + 0.5 * tied
+
+    return k * (actual - expected_scores(ratings)) / (n - 1)
+
+
+def rating_changes(players: List[dict], placements: Dict[str, int]) -> Dict[str, Tuple[float, float]]:
+    """(rating before, rating after) for every participant of one match"""
+    participants = [player for player in players if player["id"] in placements]
+    if len(participants) < 2:
+        return {}
+    ratings = [player.get("rating", DEFAULT_RATING) for player in participants]
+    deltas = rating_deltas(ratings, [placements[player["id"]] for player in participants])
+    return {
+        player["id"]: (rating, round(rating + float(delta), 2))
+        for player, rating, delta in zip(participants, ratings, deltas)
+    }
+
+
+def rating_update(new_rating: float, now: datetime) -> dict:
+    """Update operators setting a player's rating and appending it to their history"""
+    # `now` is naive UTC; datetime.timestamp() would read it as local time
+    return {
+        "$set": {"rating": new_rating},
+        "$push": {"rating_history": {"$each": [[calendar.timegm(now.utctimetuple()), round(new_rating)]], "$slice": -HISTORY_LENGTH}}
+    }
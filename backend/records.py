@@ -0,0 +1,71 @@
+"""Slotted records for documents written on every join, kill and loot.
+
+These replace Pydantic models on the hot path: nothing here is user input, so
+validation would only cost time, and `to_document` builds the Mongo document
+directly instead of going through `.dict()`. Pydantic stays at the API
+boundary for request bodies.
+"""
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+
+def new_id() -> str:
+    return str(uuid.uuid4())
+
+
+@dataclass(slots=True)
+class Player:
+    discord_id: str
+    username: str
+    avatar_url: Optional[str] = None
+    id: str = field(default_factory=new_id)
+    current_game_id: Optional[str] = None
+    is_alive: bool = True
+    team_id: Optional[str] = None
+
+    def to_document(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "discord_id": self.discord_id,
+            "username": self.username,
+            "avatar_url": self.avatar_url,
+            "stats": {"kills": 0, "deaths": 0, "wins": 0, "games_played": 0, "damage_dealt": 0},
+            "current_game_id": self.current_game_id,
+            "is_alive": self.is_alive,
+            "team_id": self.team_id,
+            "position": {"x": 0, "y": 0}
+        }
+
+
+@dataclass(slots=True)
+class GameAction:
+    game_id: str
+    player_id: str
+    action_type: str  # "kill", "revive", "move", "loot"
+    description: str
+    guild_id: Optional[str] = None  # Copied from the game so exports can filter actions by guild
+    target_player_id: Optional[str] = None
+    weapon: Optional[str] = None  # Weapon that made the kill, or the one looted
+    damage: Optional[int] = None  # Finishing damage of a kill
+    damage_taken: Optional[int] = None  # Damage the victim landed on the killer first
+    timestamp: datetime = field(default_factory=datetime.utcnow)
+    expires_at: Optional[datetime] = None  # TTL; set by the archiver once the match is archived
+    id: str = field(default_factory=new_id)
+
+    def to_document(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "game_id": self.game_id,
+            "guild_id": self.guild_id,
+            "player_id": self.player_id,
+            "action_type": self.action_type,
+            "target_player_id": self.target_player_id,
+            "weapon": self.weapon,
+            "damage": self.damage,
+            "damage_taken": self.damage_taken,
+            "description": self.description,
+            "timestamp": self.timestamp,
+            "expires_at": self.expires_at
+        }
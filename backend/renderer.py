@@ -0,0 +1,170 @@
+"""Procedural era-themed banners rendered locally with Pillow.
+
+Rendering runs in a process pool so it never blocks the event loop, and every
+PNG is cached under the hash of the scene it was drawn from: the same scene is
+only ever rendered once.
+"""
+import asyncio
+import hashlib
+import io
+import json
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from bson import Binary
+
+WIDTH, HEIGHT = 800, 420
+# (top, bottom, accent) colours per era
+ERA_PALETTES = {
+    "medieval": ((58, 36, 22), (150, 110, 60), (230, 200, 120)),
+    "modern": ((20, 32, 44), (70, 96, 84), (255, 140, 40)),
+    "futuristic": ((10, 6, 40), (40, 20, 110), (0, 240, 255)),
+    "wild_west": ((120, 50, 20), (230, 160, 80), (255, 235, 180)),
+    "zombie": ((16, 24, 12), (60, 80, 40), (170, 255, 60))
+}
+MAX_LINES = 8
+
+
+def scene_hash(scene: Dict[str, Any]) -> str:
+    return hashlib.sha256(json.dumps(scene, sort_keys=True, default=str).encode()).hexdigest()[:32]
+
+
+def _font(size: int):
+    from PIL import ImageFont
+
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:  # Pillow < 10.1 only has the fixed-size bitmap font
+        return ImageFont.load_default()
+
+
+def render_png(scene: Dict[str, Any]) -> bytes:
+    """Draw one banner; runs in a worker process.
+
+    `scene` holds the era key, a title, an optional subtitle, up to
+    MAX_LINES lines (player names, kill counts) and an optional zone fraction
+    (1.0 is the full map).
+    """
+    from PIL import Image, ImageDraw
+
+    top, bottom, accent = ERA_PALETTES.get(scene.get("era"), ERA_PALETTES["modern"])
+    mask = Image.linear_gradient("L").resize((WIDTH, HEIGHT))
+    image = Image.composite(Image.new("RGB", (WIDTH, HEIGHT), bottom), Image.new("RGB", (WIDTH, HEIGHT), top), mask)
+    draw = ImageDraw.Draw(image)
+
+    zone = scene.get("zone")
+    if zone is not None:
+        # Safe zone drawn on the right, shrinking with the match
+        cx, cy, full = WIDTH - 150, HEIGHT // 2, 130
+        radius = max(6, int(full * max(0.0, min(1.0, zone))))
+        draw.ellipse((cx - full, cy - full, cx + full, cy + full), outline=(0, 0, 0), width=2)
+        draw.ellipse((cx - radius, cy - radius, cx + radius, cy + radius), outline=accent, width=4)
+
+    draw.text((32, 28), scene.get("title", ""), fill=accent, font=_font(40))
+    y = 84
+    if scene.get("subtitle"):
+        draw.text((32, y), scene["subtitle"], fill=(255, 255, 255), font=_font(24))
+        y += 44
+    line_font = _font(20)
+    for line in scene.get("lines", [])[:MAX_LINES]:
+        draw.text((40, y), line, fill=(235, 235, 235), font=line_font)
+        y += 30
+    if scene.get("era_name"):
+        draw.text((32, HEIGHT - 40), scene["era_name"], fill=accent, font=_font(18))
+
+    output = io.BytesIO()
+    # Fast compression: banners are cached, render latency matters more than bytes
+    image.save(output, format="PNG", compress_level=1)
+    return output.getvalue()
+
+
+class ImageRenderer:
+    """Renders scenes in a process pool and caches the PNGs by scene hash.
+
+    PNGs are kept in a bounded in-memory LRU and in the `collection` (expired
+    by a TTL index), so whichever process serves `/api/images/<hash>.png` can
+    find an image another process rendered.
+    """
+
+    def __init__(self, collection, workers: int = 2, cache_size: int = 256, ttl_days: float = 7):
+        self.collection = collection
+        self.workers = workers
+        self.cache_size = cache_size
+        self.ttl_days = ttl_days
+        self.cache: "OrderedDict[str, bytes]" = OrderedDict()
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pending: Dict[str, asyncio.Future] = {}
+
+    async def ensure_indexes(self):
+        await self.collection.create_index("created_at", expireAfterSeconds=int(self.ttl_days * 86400))
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # Workers are spawned fresh rather than forked from the threaded event loop process
+            self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    def _remember(self, key: str, png: bytes):
+        self.cache[key] = png
+        self.cache.move_to_end(key)
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+    async def render(self, scene: Dict[str, Any]) -> str:
+        """Render a scene unless it is already cached; returns its hash"""
+        key = scene_hash(scene)
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            return key
+        # Concurrent requests for the same scene share one render
+        pending = self._pending.get(key)
+        if pending is not None:
+            await asyncio.shield(pending)
+            return key
+        future = asyncio.get_running_loop().create_future()
+        self._pending[key] = future
+        try:
+            png = await asyncio.get_running_loop().run_in_executor(self.pool, render_png, scene)
+            self._remember(key, png)
+            await self.collection.update_one(
+                {"_id": key},
+                {"$setOnInsert": {"png": Binary(png), "created_at": datetime.utcnow()}},
+                upsert=True
+            )
+            future.set_result(key)
+        except Exception as e:
+            future.set_exception(e)
+            # Nobody else may be awaiting it; don't leave the exception unretrieved
+            future.exception()
+            raise
+        finally:
+            if not future.done():
+                # Cancelled mid-render; release anyone waiting on it
+                future.cancel()
+            del self._pending[key]
+        return key
+
+    async def get(self, key: str) -> Optional[bytes]:
+        png = self.cache.get(key)
+        if png is not None:
+            return png
+        document = await self.collection.find_one({"_id": key})
+        if not document:
+            return None
+        png = bytes(document["png"])
+        self._remember(key, png)
+        return png
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+def scene_lines(players: List[dict], limit: int = MAX_LINES) -> List[str]:
+    """'name - N kills' lines for a scene"""
+    return [f"{player['username']} - {player.get('kills', 0)} kills" for player in players[:limit]]
@@ -0,0 +1,173 @@
+"""Retention for finished games: archive each match, then let TTL indexes expire the raw rows"""
+import asyncio
+import gzip
+import json
+import logging
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Awaitable, Callable, List, Optional
+
+from guild_settings import GuildSettingsCache
+from lobbies import LobbyMembers
+
+try:
+    import zstandard
+except ImportError:  # Archive files fall back to gzip
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+
+def expiry(start: datetime, days: Optional[float]) -> Optional[datetime]:
+    """When a row created at `start` expires; None keeps it forever"""
+    if not days:
+        return None
+    return start + timedelta(days=days)
+
+
+def compact_timeline(game: dict, actions: List[dict]) -> List[list]:
+    """A match's actions as [seconds into the match, type, player, target] rows"""
+    started = game.get("start_time") or game.get("created_at")
+    timeline = []
+    for action in actions:
+        offset = (action["timestamp"] - started).total_seconds() if started else None
+        timeline.append([
+            round(offset, 3) if offset is not None else None,
+            action["action_type"],
+            action["player_id"],
+            action.get("target_player_id")
+        ])
+    return timeline
+
+
+def _plain(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+class Archiver:
+    """Archives finished games and schedules their raw rows for expiry.
+
+    Each finished game gets its action log folded into its match_results
+    document as a compact timeline (and, with `archive_dir`, written to a
+    compressed NDJSON file) and its game_players roster is dropped. Its
+    game_actions rows and game document then get an `expires_at` from the
+    guild's retention settings, which the TTL indexes act on.
+
+    A game still flagged `results_pending`, because the process that ended it
+    failed to write its results, has them recorded through `record_results`
+    first; if that fails too the game is left for a later pass.
+
+    Every process runs an archiver, so each game is claimed before it is
+    archived by setting `archive_locked_until` on it. A game whose archiver
+    failed or died becomes claimable again once that lock runs out.
+    """
+
+    def __init__(self, db, settings: GuildSettingsCache, lobbies: LobbyMembers, archive_after: timedelta = timedelta(minutes=10),
+                 archive_dir: Optional[str] = None, batch_size: int = 50, interval_seconds: float = 60,
+                 lock_seconds: float = 300, record_results: Optional[Callable[[dict], Awaitable[None]]] = None):
+        self.db = db
+        self.settings = settings
+        self.lobbies = lobbies
+        self.archive_after = archive_after
+        self.archive_dir = Path(archive_dir) if archive_dir else None
+        self.batch_size = batch_size
+        self.interval_seconds = interval_seconds
+        self.lock_seconds = lock_seconds
+        self.record_results = record_results
+
+    async def ensure_indexes(self):
+        await self.db.games.create_index("expires_at", expireAfterSeconds=0)
+        await self.db.game_actions.create_index("expires_at", expireAfterSeconds=0)
+        await self.db.games.create_index([("status", 1), ("archived_at", 1), ("end_time", 1)])
+
+    def _write_file(self, game: dict, actions: List[dict]) -> Path:
+        day = (game.get("end_time") or datetime.utcnow()).strftime("%Y-%m-%d")
+        directory = self.archive_dir / str(game.get("guild_id")) / day
+        directory.mkdir(parents=True, exist_ok=True)
+        lines = [json.dumps({"game": game}, default=_plain)]
+        lines += [json.dumps({"action": action}, default=_plain) for action in actions]
+        data = ("\n".join(lines) + "\n").encode()
+        if zstandard is not None:
+            path = directory / f"{game['id']}.ndjson.zst"
+            path.write_bytes(zstandard.ZstdCompressor(level=10).compress(data))
+        else:
+            path = directory / f"{game['id']}.ndjson.gz"
+            path.write_bytes(gzip.compress(data))
+        return path
+
+    async def archive_game(self, game: dict):
+        """Fold a finished game's actions into its results and schedule its raw rows for expiry"""
+        if game.get("results_pending") and self.record_results:
+            await self.record_results(game)
+        settings = await self.settings.get(game["guild_id"])
+        actions = await self.db.game_actions.find({"game_id": game["id"]}, {"_id": 0}).sort("timestamp", 1).to_list(None)
+        if self.archive_dir:
+            await asyncio.to_thread(self._write_file, {k: v for k, v in game.items() if k != "_id"}, actions)
+
+        ended = game.get("end_time") or datetime.utcnow()
+        await self.db.match_results.update_one(
+            {"game_id": game["id"]},
+            {
+                "$set": {"timeline": compact_timeline(game, actions)},
+                "$setOnInsert": {
+                    "guild_id": game["guild_id"],
+                    "mode": game.get("mode"),
+                    "era": game.get("era"),
+                    "started_at": game.get("start_time"),
+                    "ended_at": ended,
+                    "winner": game.get("winner")
+                }
+            },
+            upsert=True
+        )
+        # Participants are in the results now; the lobby roster is no longer needed
+        await self.lobbies.remove_game(game["id"])
+        actions_expire = expiry(ended, settings["action_retention_days"])
+        if actions_expire:
+            await self.db.game_actions.update_many({"game_id": game["id"]}, {"$set": {"expires_at": actions_expire}})
+        await self.db.games.update_one(
+            {"id": game["id"]},
+            {"$set": {"archived_at": datetime.utcnow(), "expires_at": expiry(ended, settings["game_retention_days"])}}
+        )
+
+    async def claim(self) -> Optional[dict]:
+        """Lock the next game due for archiving for this process, if any"""
+        now = datetime.utcnow()
+        return await self.db.games.find_one_and_update(
+            {
+                "status": "finished",
+                "archived_at": None,
+                "end_time": {"$lt": now - self.archive_after},
+                "$or": [{"archive_locked_until": None}, {"archive_locked_until": {"$lt": now}}]
+            },
+            {"$set": {"archive_locked_until": now + timedelta(seconds=self.lock_seconds)}},
+            sort=[("end_time", 1)]
+        )
+
+    async def archive_due(self) -> int:
+        """Archive up to one batch of games that finished long enough ago; returns how many succeeded"""
+        archived = 0
+        for _ in range(self.batch_size):
+            game = await self.claim()
+            if not game:
+                break
+            try:
+                await self.archive_game(game)
+                archived += 1
+            except Exception as e:
+                # Left locked, so it is retried once the lock runs out rather than straight away
+                logger.error(f"Error archiving game {game['id']}: {e}")
+        return archived
+
+    async def run(self):
+        """Archive finished games forever"""
+        while True:
+            try:
+                # Drain the backlog before sleeping
+                while await self.archive_due() == self.batch_size:
+                    pass
+            except Exception as e:
+                logger.error(f"Error archiving games: {e}")
+            await asyncio.sleep(self.interval_seconds)
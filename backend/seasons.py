@@ -0,0 +1,199 @@
+"""Competitive seasons: every player's stats archived and reset in chunks at each rollover"""
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from pymongo import ReplaceOne, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+STAT_FIELDS = ["kills", "deaths", "wins", "games_played", "damage_dealt"]
+
+
+class SeasonError(RuntimeError):
+    pass
+
+
+class SeasonManager:
+    """Seasons in `seasons`, and one archived row per player and season in `season_stats`.
+
+    A rollover walks `players` in `_id` order, `batch_size` at a time, up to
+    the newest player when it started; players who sign up during the
+    rollover start out in the new season and are left alone. Each
+    chunk is copied into the archive with one bulk write and reset with
+    another. The reset `$inc`s each counter down by the value just archived
+    rather than setting it to zero, so stats that live games record in the
+    meantime carry over into the new season instead of being lost, and it
+    stamps the player with the new season so no player is ever reset twice.
+
+    Progress is saved on the closing season after every chunk along with a
+    heartbeat; if the process running a rollover dies, `resume` lets another
+    one pick it up where it stopped once the heartbeat is `stale_after` old.
+    """
+
+    def __init__(self, db, owner_id: str, batch_size: int = 1000, pause_seconds: float = 0.05,
+                 stale_after: timedelta = timedelta(minutes=2)):
+        self.seasons = db.seasons
+        self.archive = db.season_stats
+        self.players = db.players
+        self.owner_id = owner_id
+        self.batch_size = batch_size
+        # Breathing room between chunks for the writes of live games
+        self.pause_seconds = pause_seconds
+        self.stale_after = stale_after
+
+    async def ensure_indexes(self):
+        await self.seasons.create_index("number", unique=True)
+        await self.seasons.create_index("status")
+        await self.archive.create_index([("season", 1), ("player_id", 1)], unique=True)
+        await self.archive.create_index([("season", 1), ("stats.wins", -1), ("stats.kills", -1)])
+
+    async def current(self) -> dict:
+        """The latest season, opening season 1 on first use"""
+        season = await self.seasons.find_one({}, {"_id": 0}, sort=[("number", -1)])
+        if season:
+            return season
+        season = {"number": 1, "status": "active", "started_at": datetime.utcnow(), "ended_at": None}
+        try:
+            await self.seasons.insert_one(dict(season))
+        except DuplicateKeyError:
+            return await self.seasons.find_one({"number": 1}, {"_id": 0})
+        return season
+
+    async def history(self) -> List[dict]:
+        return await self.seasons.find({}, {"_id": 0, "rollover.owner": 0, "rollover.last_id": 0, "rollover.max_id": 0}).sort("number", -1).to_list(None)
+
+    async def in_progress(self) -> Optional[dict]:
+        """The season being rolled over, with its progress, if any"""
+        return await self.seasons.find_one({"status": "closing"}, {"_id": 0, "rollover.last_id": 0, "rollover.max_id": 0})
+
+    async def start_rollover(self) -> Optional[dict]:
+        """Close the active season; None if a rollover is already underway"""
+        await self.current()
+        now = datetime.utcnow()
+        newest = await self.players.find_one({}, {"_id": 1}, sort=[("_id", -1)])
+        rollover = {
+            "owner": self.owner_id,
+            "started_at": now,
+            "heartbeat_at": now,
+            "finished_at": None,
+            "last_id": None,
+            "max_id": newest["_id"] if newest else None,
+            "processed": 0,
+            "total": await self.players.estimated_document_count()
+        }
+        result = await self.seasons.update_one(
+            {"status": "active"},
+            {"$set": {"status": "closing", "ended_at": now, "rollover": rollover}}
+        )
+        if result.modified_count == 0:
+            if await self.seasons.find_one({"status": "closing"}, {"number": 1}):
+                return None
+            # e.g. the last rollover archived its season but died before opening the next
+            raise SeasonError("There is no active season to close")
+        return await self.seasons.find_one({"status": "closing"}, {"_id": 0})
+
+    async def resume(self) -> Optional[dict]:
+        """Take over a rollover whose process stopped reporting progress"""
+        now = datetime.utcnow()
+        result = await self.seasons.update_one(
+            {"status": "closing", "rollover.heartbeat_at": {"$lte": now - self.stale_after}},
+            {"$set": {"rollover.owner": self.owner_id, "rollover.heartbeat_at": now}}
+        )
+        if result.modified_count == 0:
+            return None
+        season = await self.seasons.find_one({"status": "closing"}, {"_id": 0})
+        if season:
+            logger.info(f"Resuming rollover of season {season['number']} after {season['rollover']['processed']} players")
+        return season
+
+    async def rollover_chunk(self, season: dict) -> bool:
+        """Archive and reset the next chunk of players; False once all are done or another process took over"""
+        number, progress = season["number"], season["rollover"]
+        query = {"season": {"$ne": number + 1}}
+        id_range = {}
+        if progress["last_id"] is not None:
+            id_range["$gt"] = progress["last_id"]
+        if "max_id" in progress:
+            if progress["max_id"] is None:
+                return False  # There were no players to roll over
+            id_range["$lte"] = progress["max_id"]
+        if id_range:
+            query["_id"] = id_range
+        players = await self.players.find(
+            query, {"id": 1, "discord_id": 1, "username": 1, "rating": 1, "stats": 1}
+        ).sort("_id", 1).limit(self.batch_size).to_list(self.batch_size)
+        if not players:
+            return False
+
+        now = datetime.utcnow()
+        archived, resets = [], []
+        for player in players:
+            stats = {field: (player.get("stats") or {}).get(field, 0) for field in STAT_FIELDS}
+            archived.append(ReplaceOne({"season": number, "player_id": player["id"]}, {
+                "season": number,
+                "player_id": player["id"],
+                "discord_id": player.get("discord_id"),
+                "username": player.get("username"),
+                "rating": player.get("rating"),
+                "stats": stats,
+                "archived_at": now
+            }, upsert=True))
+            update = {"$set": {"season": number + 1}}
+            decrements = {f"stats.{field}": -value for field, value in stats.items() if value}
+            if decrements:
+                update["$inc"] = decrements
+            resets.append(UpdateOne({"_id": player["_id"], "season": {"$ne": number + 1}}, update))
+        # Archive first: a crash in between leaves players archived but not reset, and they are redone
+        await self.archive.bulk_write(archived, ordered=False)
+        await self.players.bulk_write(resets, ordered=False)
+
+        progress["last_id"] = players[-1]["_id"]
+        progress["processed"] += len(players)
+        result = await self.seasons.update_one(
+            {"number": number, "status": "closing", "rollover.owner": self.owner_id},
+            {"$set": {"rollover.last_id": progress["last_id"], "rollover.heartbeat_at": now},
+             "$inc": {"rollover.processed": len(players)}}
+        )
+        return result.modified_count == 1
+
+    async def run_rollover(self, season: dict) -> Optional[dict]:
+        """Work through a closing season's players, then open the next season; returns it"""
+        while await self.rollover_chunk(season):
+            await asyncio.sleep(self.pause_seconds)
+        return await self.finish(season)
+
+    async def finish(self, season: dict) -> Optional[dict]:
+        result = await self.seasons.update_one(
+            {"number": season["number"], "status": "closing", "rollover.owner": self.owner_id},
+            {"$set": {"status": "archived", "rollover.finished_at": datetime.utcnow()}}
+        )
+        if result.modified_count == 0:
+            return None
+        following = {"number": season["number"] + 1, "status": "active", "started_at": datetime.utcnow(), "ended_at": None}
+        try:
+            await self.seasons.insert_one(dict(following))
+        except DuplicateKeyError:
+            pass
+        logger.info(f"Season {season['number']} archived; season {following['number']} has begun")
+        return following
+
+    async def run(self, interval_seconds: float = 60):
+        """Periodically pick up rollovers left behind by a dead process"""
+        while True:
+            try:
+                season = await self.resume()
+                if season:
+                    await self.run_rollover(season)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Season rollover error: {e}")
+            await asyncio.sleep(interval_seconds)
+
+    async def leaderboard(self, number: int, limit: int = 10) -> List[dict]:
+        return await self.archive.find(
+            {"season": number}, {"_id": 0, "season": 0}
+        ).sort([("stats.wins", -1), ("stats.kills", -1)]).limit(limit).to_list(limit)
@@ -1,4 +1,5 @@
-from fastapi import FastAPI, APIRouter, HTTPException, BackgroundTasks
+from fastapi import FastAPI, APIRouter, HTTPException, BackgroundTasks, Response, Depends, Header, Request
+from fastapi.responses import JSONResponse, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
@@ -6,15 +7,42 @@ import os
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple, Literal
 import uuid
 from datetime import datetime, timedelta
 import random
 import asyncio
+import heapq
 import discord
+from discord import app_commands
 from discord.ext import commands
-import fal_client
 import json
+import socket
+import time
+import math
+from ipc import EventChannel
+from sharding import ShardStats, parse_shard_count, parse_shard_ids, shard_for_guild
+from leases import GameLeaseManager
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, registry as metrics_registry
+from tracing import SamplingProfiler, Tracer
+from matchmaking import Matchmaker, QueueEntry
+from pymongo import ReturnDocument, UpdateOne
+from ratings import DEFAULT_RATING, rating_changes
+from engine import KILL_DAMAGE, MatchState
+from loot import WeaponTable
+from records import GameAction, Player
+from lobbies import Debouncer, LobbyMembers
+from tournaments import DEFAULT_MATCH_SIZE, TournamentManager
+from live import LiveBoard
+from analytics import Analytics
+from seasons import SeasonError, SeasonManager
+from guild_settings import GuildSettingsCache
+from retention import Archiver
+from command_sync import sync_command_tree
+from renderer import ImageRenderer, scene_lines
+from admission import AdmissionController, Limit
+from ratelimit import RateLimiter, ensure_indexes as ensure_rate_limit_indexes
+from export import FORMATS as EXPORT_FORMATS, ExportError, export_query, stream_export
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -24,12 +52,54 @@ mongo_url = os.environ['MONGO_URL']
 client = AsyncIOMotorClient(mongo_url)
 db = client[os.environ['DB_NAME']]
 
+# Process roles: "all" runs the API and the bot in one process (single uvicorn worker only),
+# "api" runs stateless HTTP workers and "bot" is the dedicated bot / game engine worker
+SERVICE_ROLE = os.environ.get('SERVICE_ROLE', 'all')
+PROCESS_ID = f"{socket.gethostname()}:{os.getpid()}"
+WORKER_STATUS_INTERVAL = int(os.environ.get('WORKER_STATUS_INTERVAL', '15'))
+
+# Channel between the API workers and the bot worker
+event_channel = EventChannel(db, origin=PROCESS_ID)
+
+# Ownership leases so that each active game is ticked by a single bot worker
+lease_manager = GameLeaseManager(
+    db.games,
+    owner_id=PROCESS_ID,
+    ttl_seconds=int(os.environ.get('GAME_LEASE_TTL', '30')),
+    heartbeat_seconds=int(os.environ.get('GAME_LEASE_HEARTBEAT', '10'))
+)
+
+# Per-guild settings; the environment sets the defaults, and operators can override them per guild
+# without a restart. Retention is in days, null keeps rows forever.
+GUILD_SETTING_DEFAULTS = {
+    "action_retention_days": float(os.environ.get('RETENTION_ACTION_DAYS', '7')) or None,
+    "game_retention_days": float(os.environ.get('RETENTION_GAME_DAYS', '30')) or None,
+    # "fal" generates images with FAL and renders locally when it fails; "local" renders first; "none" skips images
+    "image_source": os.environ.get('IMAGE_SOURCE', 'fal'),
+    # Players a /start_game lobby waits for before the match begins
+    "min_players": int(os.environ.get('DEFAULT_MIN_PLAYERS', '10')),
+    # Seconds between ticks, [min, max]
+    "tick_interval": [int(bound) for bound in os.environ.get('GAME_TICK_INTERVAL', '10-30').split('-', 1)],
+    # How long players get to answer an encounter
+    "encounter_response_seconds": float(os.environ.get('ENCOUNTER_RESPONSE_SECONDS', '10')),
+    # Post a tick's eliminations as one message without images instead of one message and image each
+    "kill_digest": os.environ.get('KILL_DIGEST', '').lower() in ('1', 'true', 'yes')
+}
+guild_settings = GuildSettingsCache(
+    db.guild_settings,
+    GUILD_SETTING_DEFAULTS,
+    poll_seconds=float(os.environ.get('GUILD_SETTINGS_POLL_SECONDS', '5'))
+)
+
 # Create the main app without a prefix
 app = FastAPI()
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
 
+# Operational endpoints, also served by the standalone bot worker
+ops_router = APIRouter(prefix="/api")
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -41,26 +111,127 @@ logger = logging.getLogger(__name__)
 intents = discord.Intents.default()
 intents.message_content = False  # Don't need message content for slash commands
 intents.guilds = True
-bot = commands.Bot(command_prefix='!', intents=intents)
 
-# Game Models
-class Player(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    discord_id: str
-    username: str
-    avatar_url: Optional[str] = None
-    stats: Dict[str, int] = Field(default_factory=lambda: {
-        "kills": 0,
-        "deaths": 0,
-        "wins": 0,
-        "games_played": 0,
-        "damage_dealt": 0
-    })
-    current_game_id: Optional[str] = None
-    is_alive: bool = True
-    team_id: Optional[str] = None
-    position: Dict[str, int] = Field(default_factory=lambda: {"x": 0, "y": 0})
+# Gateway sharding: leave both unset for a single connection, set DISCORD_SHARD_COUNT=auto
+# to let Discord pick, or give each process its own DISCORD_SHARD_IDS range (e.g. "0-3")
+# out of a fixed DISCORD_SHARD_COUNT to spread guilds across processes
+SHARD_COUNT = parse_shard_count(os.environ.get('DISCORD_SHARD_COUNT'))
+SHARD_IDS = parse_shard_ids(os.environ.get('DISCORD_SHARD_IDS'))
+SHARDED = bool(os.environ.get('DISCORD_SHARD_COUNT') or SHARD_IDS)
+if SHARD_IDS and not SHARD_COUNT:
+    raise RuntimeError("DISCORD_SHARD_IDS requires an explicit DISCORD_SHARD_COUNT")
+
+if SHARDED:
+    bot = commands.AutoShardedBot(command_prefix='!', intents=intents, shard_count=SHARD_COUNT, shard_ids=SHARD_IDS)
+else:
+    bot = commands.Bot(command_prefix='!', intents=intents)
+
+shard_stats = ShardStats()
+
+# Sync slash commands to this guild only, for development; changes show up there instantly
+DISCORD_DEV_GUILD_ID = int(os.environ['DISCORD_DEV_GUILD_ID']) if os.environ.get('DISCORD_DEV_GUILD_ID') else None
+commands_synced = False
+
+# Metrics
+GAME_TICK_SECONDS = metrics_registry.histogram("cutroyale_game_tick_seconds", "Time spent in one game loop tick, excluding the wait before the next tick")
+ENCOUNTER_SECONDS = metrics_registry.histogram("cutroyale_encounter_seconds", "Duration of simulate_encounter, including the response window")
+KILL_SECONDS = metrics_registry.histogram("cutroyale_handle_kill_seconds", "Duration of handle_kill")
+IMAGE_SECONDS = metrics_registry.histogram("cutroyale_image_generation_seconds", "Image generation latency", ["source"])
+IMAGE_REQUESTS = metrics_registry.counter("cutroyale_image_requests_total", "Image generation requests by outcome", ["outcome"])
+DB_SECONDS = metrics_registry.histogram("cutroyale_db_operation_seconds", "Mongo call latency by call site", ["site"])
+DISCORD_SECONDS = metrics_registry.histogram("cutroyale_discord_request_seconds", "Discord send/edit latency by call site", ["site"])
+KILLS_TOTAL = metrics_registry.counter("cutroyale_kills_total", "Eliminations processed")
+GAMES_FINISHED = metrics_registry.counter("cutroyale_games_finished_total", "Games that reached end_game")
+
+# Per-game tick tracing and the sampling profiler are off unless switched on
+tracer = Tracer(enabled=os.environ.get('GAME_TRACING', '').lower() in ('1', 'true', 'yes'))
+profiler = SamplingProfiler()
+
+# Admission control: per-process caps so a burst of new work can't degrade running matches
+ADMISSION_IN_FLIGHT = metrics_registry.gauge("cutroyale_admission_in_flight", "Work in flight per admission limit", ["limit"])
+ADMISSION_WAITING = metrics_registry.gauge("cutroyale_admission_waiting", "Callers waiting for a slot per admission limit", ["limit"])
+ADMISSION_REJECTED = metrics_registry.counter("cutroyale_admission_rejected_total", "Work turned away by an admission limit", ["limit"])
+
+def record_rejection(limit: str):
+    ADMISSION_REJECTED.inc(limit=limit)
+
+admission = AdmissionController(
+    # Game loops; new lobbies, queue joins and lease takeovers stop at the cap
+    Limit("games", int(os.environ.get('MAX_ACTIVE_GAMES', '200')), on_reject=record_rejection),
+    # FAL requests; callers past the queue fall back to local banners or get a 503
+    Limit("images", int(os.environ.get('MAX_IMAGE_JOBS', '16')), queue=int(os.environ.get('IMAGE_QUEUE_SIZE', '64')),
+          timeout=float(os.environ.get('IMAGE_QUEUE_TIMEOUT', '30')), on_reject=record_rejection),
+    # Outstanding Discord requests; excess sends wait rather than fail
+    Limit("discord", int(os.environ.get('MAX_DISCORD_SENDS', '50')), queue=int(os.environ.get('DISCORD_QUEUE_SIZE', '500')),
+          reject=False)
+)
+
+# Rate limits per Discord user or guild and per client IP. Set RATE_LIMIT_SHARED=1 to also
+# count hits in Mongo so that all processes together enforce the limit.
+RATE_LIMITING = os.environ.get('RATE_LIMITING', '1').lower() not in ('0', 'false', 'no')
+rate_limit_store = db.rate_limits if os.environ.get('RATE_LIMIT_SHARED', '').lower() in ('1', 'true', 'yes') else None
+RATE_LIMITS = {
+    limiter.name: limiter for limiter in (
+        RateLimiter("start_game", rate=1 / 30, burst=2, shared=rate_limit_store),
+        RateLimiter("start_game_guild", rate=1 / 10, burst=10, shared=rate_limit_store),
+        RateLimiter("game_stats", rate=1 / 5, burst=5, shared=rate_limit_store),
+        RateLimiter("leaderboard", rate=1 / 5, burst=5, shared=rate_limit_store),
+        # Served from memory, so only limited locally
+        RateLimiter("game_status", rate=1 / 2, burst=5),
+        RateLimiter("queue", rate=1 / 10, burst=5, shared=rate_limit_store),
+        RateLimiter("api", rate=10, burst=50, shared=rate_limit_store),
+        # Live game polls, also served from memory; a shared count would add a Mongo write to every poll
+        RateLimiter("live", rate=10, burst=50),
+        RateLimiter("generate_image", rate=1 / 10, burst=3, shared=rate_limit_store)
+    )
+}
+RATE_LIMITED = metrics_registry.counter("cutroyale_rate_limited_total", "Requests and commands rejected by a rate limit", ["limit"])
+
+async def rate_limit(name: str, key: str) -> float:
+    """Count a hit against a limit; returns 0 if allowed, otherwise seconds until retry"""
+    if not RATE_LIMITING:
+        return 0.0
+    retry_after = await RATE_LIMITS[name].hit(key)
+    if retry_after:
+        RATE_LIMITED.inc(limit=name)
+    return retry_after
+
+async def refund_rate_limit(name: str, key: str):
+    """Give back a hit counted by rate_limit for a request another limit turned away"""
+    if RATE_LIMITING:
+        await RATE_LIMITS[name].refund(key)
 
+async def db_call(site: str, operation):
+    """Await a Mongo operation, recording its latency under `site`"""
+    start = time.perf_counter()
+    try:
+        return await operation
+    finally:
+        DB_SECONDS.observe(time.perf_counter() - start, site=site)
+
+async def discord_call(site: str, request):
+    """Await a Discord API request, recording its latency under `site`"""
+    async with admission["discord"].slot():
+        start = time.perf_counter()
+        try:
+            return await request
+        finally:
+            DISCORD_SECONDS.observe(time.perf_counter() - start, site=site)
+
+def local_shard_ids() -> List[int]:
+    """Shards whose guilds are handled by this process"""
+    if isinstance(bot, commands.AutoShardedBot):
+        return sorted(bot.shards.keys()) or list(SHARD_IDS or [])
+    return [0]
+
+def guild_shard(guild_id: str) -> int:
+    """Shard owning a guild, worked out from its ID when this process doesn't have the guild cached"""
+    guild = bot.get_guild(int(guild_id))
+    if guild:
+        return guild.shard_id
+    return shard_for_guild(guild_id, bot.shard_count or SHARD_COUNT)
+
+# Game Models (Player and GameAction, built on every join and action, are slotted records in records.py)
 class Team(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     name: str
@@ -75,9 +246,9 @@ class Game(BaseModel):
     mode: str  # "solo", "duo", "trio", "squad", "quintuor"
     era: str
     status: str = "waiting"  # "waiting", "starting", "active", "finished"
-    players: List[str] = Field(default_factory=list)  # Player IDs
-    teams: List[str] = Field(default_factory=list)  # Team IDs
+    teams: List[str] = Field(default_factory=list)  # Team IDs; players are in the game_players collection
     max_players: int = 100
+    min_players: int = 10  # The lobby starts once this many have joined
     current_players: int = 0
     alive_players: int = 0
     zone_radius: int = 100
@@ -85,17 +256,11 @@ class Game(BaseModel):
     start_time: Optional[datetime] = None
     end_time: Optional[datetime] = None
     winner: Optional[str] = None  # Player ID or Team ID
+    shard_id: int = 0  # Gateway shard owning the guild; only that shard's process runs the game
+    tournament_id: Optional[str] = None  # Set on bracket matches of a tournament
+    tournament_round: Optional[int] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
-class GameAction(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    game_id: str
-    player_id: str
-    action_type: str  # "kill", "revive", "move", "loot"
-    target_player_id: Optional[str] = None
-    description: str
-    timestamp: datetime = Field(default_factory=datetime.utcnow)
-
 class ImageGenRequest(BaseModel):
     prompt: str
     game_context: Optional[str] = None
@@ -134,6 +299,9 @@ ERAS = {
     }
 }
 
+# Weapon stats and drop weights per era, shared by every match in that era
+WEAPON_TABLES = {era: WeaponTable(info["weapons"]) for era, info in ERAS.items()}
+
 GAME_MODES = {
     "solo": {"name": "Solo", "team_size": 1, "max_teams": 100},
     "duo": {"name": "Duos", "team_size": 2, "max_teams": 50},
@@ -142,6 +310,26 @@ GAME_MODES = {
     "quintuor": {"name": "Quintuor", "team_size": 5, "max_teams": 20}
 }
 
+# Big lobbies run one encounter per this many players alive each tick, up to MAX_ENCOUNTERS_PER_TICK
+PLAYERS_PER_ENCOUNTER = int(os.environ.get('PLAYERS_PER_ENCOUNTER', '100'))
+MAX_ENCOUNTERS_PER_TICK = int(os.environ.get('MAX_ENCOUNTERS_PER_TICK', '10'))
+
+# Custom lobbies (/start_game size:N) may go past the mode's player cap up to this
+MAX_LOBBY_PLAYERS = int(os.environ.get('MAX_LOBBY_PLAYERS', '10000'))
+lobby_members = LobbyMembers(db.game_players)
+# Lobby embeds are edited at most once per LOBBY_EDIT_DELAY seconds however fast players join
+lobby_edits = Debouncer(float(os.environ.get('LOBBY_EDIT_DELAY', '2')))
+
+# Archives finished games, after which TTL indexes expire their raw rows
+archiver = Archiver(
+    db,
+    guild_settings,
+    lobby_members,
+    archive_after=timedelta(minutes=float(os.environ.get('ARCHIVE_AFTER_MINUTES', '10'))),
+    archive_dir=os.environ.get('ARCHIVE_DIR'),
+    record_results=lambda game: retry_match_results(game)
+)
+
 # Funny kill messages
 KILL_MESSAGES = [
     "{killer} sent {victim} to the shadow realm! 💀",
@@ -161,179 +349,669 @@ KILL_MESSAGES = [
     "{killer} made {victim} take a permanent nap! 😴"
 ]
 
+# Game logic helpers kept free of I/O so they can be benchmarked in isolation
+def build_lobby_embed(game: dict) -> discord.Embed:
+    embed = discord.Embed(
+        title="🎮 Cut Royale - Game Starting!",
+        description=f"**Mode:** {GAME_MODES[game['mode']]['name']}\n**Era:** {ERAS[game['era']]['name']}\n**Players:** {game['current_players']}/{game['max_players']}",
+        color=0x00ff00
+    )
+    embed.add_field(name="How to Join", value="React with 🎮 to join the battle!", inline=False)
+    embed.set_footer(text=f"Game ID: {game['id']}")
+    return embed
+
+def player_summary(stats: Dict[str, int]) -> Dict[str, float]:
+    """Derived stats shown on the stats card"""
+    kd_ratio = stats.get("kills", 0) / max(stats.get("deaths", 1), 1)
+    win_rate = (stats.get("wins", 0) / max(stats.get("games_played", 1), 1)) * 100
+    return {"kd_ratio": kd_ratio, "win_rate": win_rate}
+
+def build_stats_embed(display_name: str, stats: Dict[str, int], avatar_url: Optional[str],
+                      rating: float = DEFAULT_RATING) -> discord.Embed:
+    embed = discord.Embed(
+        title=f"📊 {display_name}'s Stats",
+        color=0x00ff00
+    )
+    embed.add_field(name="🎯 Kills", value=stats.get("kills", 0), inline=True)
+    embed.add_field(name="💀 Deaths", value=stats.get("deaths", 0), inline=True)
+    embed.add_field(name="🏆 Wins", value=stats.get("wins", 0), inline=True)
+    embed.add_field(name="🎮 Games", value=stats.get("games_played", 0), inline=True)
+    
+    summary = player_summary(stats)
+    embed.add_field(name="📈 K/D Ratio", value=f"{summary['kd_ratio']:.2f}", inline=True)
+    embed.add_field(name="🎯 Win Rate", value=f"{summary['win_rate']:.1f}%", inline=True)
+    embed.add_field(name="⭐ Rating", value=f"{rating:.0f}", inline=True)
+    
+    if avatar_url:
+        embed.set_thumbnail(url=avatar_url)
+    return embed
+
+def leaderboard_key(player: dict):
+    stats = player.get("stats", {})
+    return (stats.get("wins", 0), stats.get("kills", 0))
+
+def rank_leaderboard(players: List[dict], limit: int = 10) -> List[dict]:
+    """Top players by wins, then by kills"""
+    return heapq.nlargest(limit, players, key=leaderboard_key)
+
+def build_leaderboard_embed(ranked: List[dict], by_rating: bool = False) -> discord.Embed:
+    embed = discord.Embed(
+        title="🏆 Cut Royale Leaderboard" + (" (Rating)" if by_rating else ""),
+        color=0xffd700
+    )
+    
+    for i, player in enumerate(ranked, 1):
+        stats = player.get("stats", {})
+        value = f"🏆 {stats.get('wins', 0)} wins | 🎯 {stats.get('kills', 0)} kills"
+        if by_rating:
+            value = f"⭐ {player.get('rating', DEFAULT_RATING):.0f} | " + value
+        embed.add_field(
+            name=f"{i}. {player['username']}",
+            value=value,
+            inline=False
+        )
+    return embed
+
+def encounters_per_tick(alive: int) -> int:
+    return max(1, min(MAX_ENCOUNTERS_PER_TICK, math.ceil(alive / PLAYERS_PER_ENCOUNTER)))
+
+def pick_encounters(state: MatchState) -> List[Tuple[dict, dict]]:
+    """Random disjoint pairs of alive players who run into each other this tick"""
+    return [
+        (player1.as_player(), player2.as_player())
+        for player1, player2 in state.pick_encounters(encounters_per_tick(state.alive))
+    ]
+
+def resolve_encounter(state: Optional[MatchState], player1: dict, player2: dict) -> Tuple[dict, dict, Optional[str], int, int]:
+    """Decide an encounter from both players' loadouts; player1 spotted player2 and strikes first.
+
+    Returns (winner, loser, winning weapon, finishing damage, damage the loser dealt).
+    Without a match state there are no loadouts, and player1 wins 60% of the time.
+    """
+    if state is None:
+        if random.random() < 0.6:
+            return player1, player2, None, KILL_DAMAGE, 0
+        return player2, player1, None, KILL_DAMAGE, 0
+    winner_id, _, weapon, damage, damage_taken = state.fight(player1["id"], player2["id"])
+    if winner_id == player1["id"]:
+        return player1, player2, weapon, damage, damage_taken
+    return player2, player1, weapon, damage, damage_taken
+
+def build_kill_digest_embed(kills: List[str], players_remaining: int) -> discord.Embed:
+    embed = discord.Embed(
+        title="💀 ELIMINATIONS!",
+        # Embed descriptions are capped at 4096 characters
+        description="\n".join(kills)[:4096],
+        color=0x8b0000
+    )
+    embed.add_field(name="Players Remaining", value=f"{players_remaining}", inline=True)
+    return embed
+
+def build_live_snapshot(game_data: dict, state: MatchState, tick: int, status: str = "active") -> Dict[str, Any]:
+    """What /game_status and the live endpoint show for a game, as of this tick"""
+    snapshot = state.snapshot()
+    return {
+        **snapshot,
+        "channel_id": game_data["channel_id"],
+        "guild_id": game_data.get("guild_id"),
+        "era": game_data["era"],
+        "mode": game_data.get("mode"),
+        "status": status,
+        "tick": tick,
+        "zone": round(snapshot["alive"] / max(snapshot["players"], 1), 2),
+        "started_at": snapshot["started_at"].isoformat() if snapshot["started_at"] else None,
+        "ended_at": snapshot["ended_at"].isoformat() if snapshot["ended_at"] else None,
+        "updated_at": datetime.utcnow().isoformat()
+    }
+
+def build_live_embed(snapshot: Dict[str, Any]) -> discord.Embed:
+    finished = snapshot["status"] == "finished"
+    embed = discord.Embed(
+        title="🏁 Cut Royale - Final Standings" if finished else "📡 Cut Royale - Live",
+        description=f"**Era:** {ERAS[snapshot['era']]['name']}\n**Alive:** {snapshot['alive']}/{snapshot['players']}\n**Zone:** {snapshot['zone']:.0%} of the map",
+        color=0xffd700 if finished else 0x00bfff
+    )
+    leaders = "\n".join(
+        f"{i}. {'' if leader['alive'] else '💀 '}**{leader['username']}** - {leader['kills']} kills ({leader['weapon']})"
+        for i, leader in enumerate(snapshot["top_killers"], 1)
+    )
+    embed.add_field(name="🎯 Top Killers", value=leaders or "No eliminations yet", inline=False)
+    embed.set_footer(text=f"Game ID: {snapshot['game_id']} • Tick {snapshot['tick']}")
+    return embed
+
+def kill_message(winner: dict, loser: dict) -> str:
+    return random.choice(KILL_MESSAGES).format(
+        killer=winner["username"],
+        victim=loser["username"]
+    )
+
+def build_kill_embed(kill_msg: str, image_url: Optional[str], players_remaining: int,
+                     weapon: Optional[str] = None) -> discord.Embed:
+    embed = discord.Embed(
+        title="💀 ELIMINATION!",
+        description=kill_msg,
+        color=0x8b0000
+    )
+    
+    if image_url:
+        embed.set_image(url=image_url)
+    
+    embed.add_field(name="Players Remaining", value=f"{players_remaining}", inline=True)
+    if weapon:
+        embed.add_field(name="Weapon", value=weapon.title(), inline=True)
+    return embed
+
 # Discord Bot Events
 @bot.event
 async def on_ready():
     print(f'{bot.user} has connected to Discord!')
-    await bot.tree.sync()
+    # on_ready fires on every reconnect; the tree only needs syncing once, and only if it changed
+    global commands_synced
+    if not commands_synced:
+        try:
+            await sync_command_tree(bot.tree, db.bot_meta, bot.application_id, DISCORD_DEV_GUILD_ID)
+            commands_synced = True
+        except Exception as e:
+            logger.error(f"Error syncing commands: {e}")
+    # Take over active games left behind by a restart or a dead worker
+    global lease_task
+    if lease_task is None:
+        lease_task = spawn_background(lease_manager.run(
+            local_shard_ids, on_claimed=resume_game, on_lost=stop_game,
+            can_claim=lambda: not admission["games"].saturated
+        ))
+
+@bot.event
+async def on_interaction(interaction: discord.Interaction):
+    shard_stats.record_event(interaction.guild.shard_id if interaction.guild else 0, "interaction")
+
+def resume_game(game: dict):
+    logger.info(f"Resuming game {game['id']} (shard {game.get('shard_id', 0)})")
+    run_game(game["id"], game.get("shard_id", 0))
+
+def stop_game(game_id: str):
+    """Stop simulating a game whose lease moved to another worker"""
+    task = running_games.get(game_id)
+    if task:
+        task.cancel()
+
+def get_game_channel(channel_id: str):
+    # Games taken over from another shard's worker aren't in our cache
+    return bot.get_channel(int(channel_id)) or bot.get_partial_messageable(int(channel_id))
+
+def rate_limited(name: str, scope: str = "user", guild_limit: Optional[str] = None):
+    """Slash command check applying a rate limit per user, or per guild with scope='guild'.
+
+    With `guild_limit`, that per-guild limit is checked first and its hit is
+    given back if this limit then turns the command away, so neither limit is
+    spent by a command the other one rejects.
+    """
+    def cooldown(limit: str, retry_after: float) -> app_commands.CommandOnCooldown:
+        limiter = RATE_LIMITS[limit]
+        return app_commands.CommandOnCooldown(app_commands.Cooldown(limiter.local.burst, limiter.window), retry_after)
+
+    async def predicate(interaction: discord.Interaction) -> bool:
+        user_key = f"user:{interaction.user.id}"
+        guild_key = f"guild:{interaction.guild.id}" if interaction.guild else user_key
+        if guild_limit:
+            retry_after = await rate_limit(guild_limit, guild_key)
+            if retry_after:
+                raise cooldown(guild_limit, retry_after)
+        retry_after = await rate_limit(name, guild_key if scope == "guild" else user_key)
+        if retry_after:
+            if guild_limit:
+                await refund_rate_limit(guild_limit, guild_key)
+            raise cooldown(name, retry_after)
+        return True
+
+    return app_commands.check(predicate)
+
+@bot.tree.error
+async def on_app_command_error(interaction: discord.Interaction, error: app_commands.AppCommandError):
+    if isinstance(error, app_commands.CommandOnCooldown):
+        await interaction.response.send_message(f"⏳ Slow down! Try again in {math.ceil(error.retry_after)}s.", ephemeral=True)
+        return
+    command = interaction.command.name if interaction.command else "unknown"
+    logger.error(f"Error in /{command}: {error}")
+
+GAMES_FULL_MESSAGE = "⏳ The arena is full right now! Too many games are running; try again in a few minutes."
 
 @bot.tree.command(name="start_game", description="Start a new Cut Royale game")
-async def start_game(interaction: discord.Interaction, mode: str = "solo", era: str = "modern"):
+@rate_limited("start_game", guild_limit="start_game_guild")
+async def start_game(interaction: discord.Interaction, mode: str = "solo", era: str = "modern", size: Optional[int] = None):
     try:
         if mode not in GAME_MODES:
             await interaction.response.send_message("❌ Invalid game mode! Available modes: " + ", ".join(GAME_MODES.keys()))
             return
         
+        if size is not None and not 2 <= size <= MAX_LOBBY_PLAYERS:
+            await interaction.response.send_message(f"❌ Lobby size must be between 2 and {MAX_LOBBY_PLAYERS}!")
+            return
+        
         if era not in ERAS:
             await interaction.response.send_message("❌ Invalid era! Available eras: " + ", ".join(ERAS.keys()))
             return
+        
+        if admission["games"].saturated:
+            record_rejection("games")
+            await interaction.response.send_message(GAMES_FULL_MESSAGE, ephemeral=True)
+            return
 
         # Create new game
+        settings = await guild_settings.get(str(interaction.guild.id))
         game = Game(
             channel_id=str(interaction.channel.id),
             guild_id=str(interaction.guild.id),
             mode=mode,
             era=era,
-            max_players=GAME_MODES[mode]["max_teams"] * GAME_MODES[mode]["team_size"]
+            shard_id=interaction.guild.shard_id,
+            max_players=size or GAME_MODES[mode]["max_teams"] * GAME_MODES[mode]["team_size"],
+            # Custom lobbies start once full
+            min_players=size or settings["min_players"]
         )
         
-        await db.games.insert_one(game.dict())
+        game_data = game.dict()
+        await db_call("start_game.games.insert_one", db.games.insert_one(game_data))
         
-        embed = discord.Embed(
-            title="🎮 Cut Royale - Game Starting!",
-            description=f"**Mode:** {GAME_MODES[mode]['name']}\n**Era:** {ERAS[era]['name']}\n**Players:** 0/{game.max_players}",
-            color=0x00ff00
-        )
-        embed.add_field(name="How to Join", value="React with 🎮 to join the battle!", inline=False)
-        embed.set_footer(text=f"Game ID: {game.id}")
+        embed = build_lobby_embed(game_data)
         
         message = await interaction.response.send_message(embed=embed)
         message = await interaction.original_response()
         await message.add_reaction("🎮")
         
         # Store message ID for reactions
-        await db.games.update_one({"id": game.id}, {"$set": {"message_id": str(message.id)}})
+        await db_call("start_game.games.update_one", db.games.update_one({"id": game.id}, {"$set": {"message_id": str(message.id)}}))
         
     except Exception as e:
         logger.error(f"Error starting game: {e}")
         await interaction.response.send_message("❌ Error starting game!")
 
 @bot.tree.command(name="game_stats", description="View your game statistics")
+@rate_limited("game_stats")
 async def game_stats(interaction: discord.Interaction, user: discord.Member = None):
     target_user = user or interaction.user
     
-    player_data = await db.players.find_one({"discord_id": str(target_user.id)})
+    player_data = await db_call("game_stats.players.find_one", db.players.find_one({"discord_id": str(target_user.id)}))
     if not player_data:
         await interaction.response.send_message("❌ Player not found in database!")
         return
     
-    stats = player_data.get("stats", {})
-    embed = discord.Embed(
-        title=f"📊 {target_user.display_name}'s Stats",
-        color=0x00ff00
+    embed = build_stats_embed(
+        target_user.display_name,
+        player_data.get("stats", {}),
+        target_user.display_avatar.url,
+        player_data.get("rating", DEFAULT_RATING)
     )
-    embed.add_field(name="🎯 Kills", value=stats.get("kills", 0), inline=True)
-    embed.add_field(name="💀 Deaths", value=stats.get("deaths", 0), inline=True)
-    embed.add_field(name="🏆 Wins", value=stats.get("wins", 0), inline=True)
-    embed.add_field(name="🎮 Games", value=stats.get("games_played", 0), inline=True)
-    
-    kd_ratio = stats.get("kills", 0) / max(stats.get("deaths", 1), 1)
-    embed.add_field(name="📈 K/D Ratio", value=f"{kd_ratio:.2f}", inline=True)
-    
-    win_rate = (stats.get("wins", 0) / max(stats.get("games_played", 1), 1)) * 100
-    embed.add_field(name="🎯 Win Rate", value=f"{win_rate:.1f}%", inline=True)
-    
-    embed.set_thumbnail(url=target_user.display_avatar.url)
     
     await interaction.response.send_message(embed=embed)
 
 @bot.tree.command(name="leaderboard", description="View the top players")
-async def leaderboard(interaction: discord.Interaction):
-    players = await db.players.find().to_list(100)
-    
-    # Sort by wins, then by kills
-    sorted_players = sorted(players, key=lambda x: (x.get("stats", {}).get("wins", 0), x.get("stats", {}).get("kills", 0)), reverse=True)
+@rate_limited("leaderboard")
+async def leaderboard(interaction: discord.Interaction, sort: str = "wins"):
+    if sort == "rating":
+        # Ratings are indexed, so let Mongo pick the top ten
+        players = await db_call("leaderboard.players.find.rating", db.players.find().sort("rating", -1).limit(10).to_list(10))
+        embed = build_leaderboard_embed(players, by_rating=True)
+    else:
+        players = await db_call("leaderboard.players.find", db.players.find().to_list(100))
+        embed = build_leaderboard_embed(rank_leaderboard(players))
     
-    embed = discord.Embed(
-        title="🏆 Cut Royale Leaderboard",
-        color=0xffd700
-    )
+    await interaction.response.send_message(embed=embed)
+
+@bot.tree.command(name="game_status", description="See how a running game is going")
+@rate_limited("game_status")
+async def game_status(interaction: discord.Interaction, game_id: Optional[str] = None):
+    # Answered from the live snapshots in memory, without touching the database
+    snapshot = live_board.get(game_id) if game_id else live_board.in_channel(str(interaction.channel.id))
+    if not snapshot:
+        await interaction.response.send_message("❌ No game is running here!", ephemeral=True)
+        return
     
-    for i, player in enumerate(sorted_players[:10], 1):
-        stats = player.get("stats", {})
-        embed.add_field(
-            name=f"{i}. {player['username']}",
-            value=f"🏆 {stats.get('wins', 0)} wins | 🎯 {stats.get('kills', 0)} kills",
-            inline=False
+    await interaction.response.send_message(embed=build_live_embed(snapshot), ephemeral=True)
+
+async def ensure_player(user) -> dict:
+    """A Discord user's player document, created on first sight"""
+    player_data = await db_call("ensure_player.players.find_one", db.players.find_one({"discord_id": str(user.id)}))
+    if not player_data:
+        # Create new player
+        player = Player(
+            discord_id=str(user.id),
+            username=user.display_name,
+            avatar_url=str(user.display_avatar.url) if user.display_avatar else None
         )
-    
-    await interaction.response.send_message(embed=embed)
+        player_data = player.to_document()
+        await db_call("ensure_player.players.insert_one", db.players.insert_one(player_data))
+    return player_data
 
 @bot.event
 async def on_reaction_add(reaction, user):
     if user.bot:
         return
     
+    if reaction.message.guild:
+        shard_stats.record_event(reaction.message.guild.shard_id, "reaction")
+    
     if str(reaction.emoji) == "🎮":
         # Player wants to join game
-        game_data = await db.games.find_one({"message_id": str(reaction.message.id)})
+        game_data = await db_call("on_reaction_add.games.find_one", db.games.find_one({"message_id": str(reaction.message.id)}))
         if not game_data or game_data["status"] != "waiting":
             return
         
-        # Check if player already in game
-        player_data = await db.players.find_one({"discord_id": str(user.id)})
-        if not player_data:
-            # Create new player
-            player = Player(
-                discord_id=str(user.id),
-                username=user.display_name,
-                avatar_url=str(user.display_avatar.url) if user.display_avatar else None
-            )
-            await db.players.insert_one(player.dict())
-            player_data = player.dict()
+        player_data = await ensure_player(user)
         
         # Add player to game
-        if player_data["id"] not in game_data["players"]:
-            await db.games.update_one(
-                {"id": game_data["id"]}, 
-                {
-                    "$push": {"players": player_data["id"]},
-                    "$inc": {"current_players": 1}
-                }
-            )
-            
-            # Update game display
-            updated_game = await db.games.find_one({"id": game_data["id"]})
-            embed = discord.Embed(
-                title="🎮 Cut Royale - Game Starting!",
-                description=f"**Mode:** {GAME_MODES[updated_game['mode']]['name']}\n**Era:** {ERAS[updated_game['era']]['name']}\n**Players:** {updated_game['current_players']}/{updated_game['max_players']}",
-                color=0x00ff00
-            )
-            embed.add_field(name="How to Join", value="React with 🎮 to join the battle!", inline=False)
-            embed.set_footer(text=f"Game ID: {updated_game['id']}")
-            
-            await reaction.message.edit(embed=embed)
-            
-            # Start game if enough players
-            if updated_game["current_players"] >= 10:  # Start with minimum players for testing
-                await start_battle_royale(updated_game["id"])
+        if not await db_call("on_reaction_add.game_players.insert_one", lobby_members.join(game_data["id"], player_data["id"])):
+            return
+        before_join = await db_call("on_reaction_add.games.find_one_and_update", db.games.find_one_and_update(
+            {"id": game_data["id"], "status": "waiting", "current_players": {"$lt": game_data["max_players"]}},
+            {"$inc": {"current_players": 1}},
+            projection={"current_players": 1, "min_players": 1, "max_players": 1}
+        ))
+        if not before_join:
+            # Full, or started while we joined
+            await db_call("on_reaction_add.game_players.delete_one", lobby_members.withdraw(game_data["id"], player_data["id"]))
+            return
+        
+        # Update game display
+        async def edit_lobby():
+            latest = await db_call("on_reaction_add.games.find_one", db.games.find_one({"id": game_data["id"]}, {"_id": 0}))
+            if latest and latest["status"] == "waiting":
+                await discord_call("on_reaction_add", reaction.message.edit(embed=build_lobby_embed(latest)))
+        
+        lobby_edits.schedule(game_data["id"], edit_lobby)
+        
+        # Start game if enough players
+        if before_join["current_players"] + 1 >= min(before_join.get("min_players", GUILD_SETTING_DEFAULTS["min_players"]), before_join["max_players"]):
+            await start_battle_royale(game_data["id"])
+    
+    elif str(reaction.emoji) == "🏆":
+        # Player wants to sign up for a tournament
+        tournament = await db_call("on_reaction_add.tournaments.find_one", db.tournaments.find_one(
+            {"message_id": str(reaction.message.id), "status": "registration"}
+        ))
+        if not tournament:
+            return
+        player_data = await ensure_player(user)
+        await db_call("on_reaction_add.tournament_entries.insert_one", tournament_manager.register(tournament["id"], player_data))
+
+# Matchmaking: players queue per guild, mode and era instead of waiting on a single lobby message
+MATCHMAKING_MATCH_SIZE = int(os.environ.get('MATCHMAKING_MATCH_SIZE', '10'))
+# Width of the rating bands players are matched within; 0 ignores ratings
+MATCHMAKING_RATING_BAND = int(os.environ.get('MATCHMAKING_RATING_BAND', '0'))
+
+def matchmaking_capacity(mode: str) -> int:
+    return min(MATCHMAKING_MATCH_SIZE, GAME_MODES[mode]["max_teams"] * GAME_MODES[mode]["team_size"])
+
+async def launch_matchmade_game(key, entries: List[QueueEntry]):
+    """Create a game for a formed match and start it right away"""
+    guild_id, _, mode, era, _ = key
+    
+    # Create any players we haven't seen before in one round trip
+    requests = []
+    for entry in entries:
+        player = Player(discord_id=entry.discord_id, username=entry.username, avatar_url=entry.avatar_url).to_document()
+        del player["discord_id"]
+        requests.append(UpdateOne({"discord_id": entry.discord_id}, {"$setOnInsert": player}, upsert=True))
+    await db_call("launch_matchmade_game.players.bulk_write", db.players.bulk_write(requests, ordered=False))
+    players = await db_call("launch_matchmade_game.players.find", db.players.find(
+        {"discord_id": {"$in": [entry.discord_id for entry in entries]}},
+        {"id": 1, "discord_id": 1, "current_game_id": 1}
+    ).to_list(None))
+    # Players who got into another game while queued sit this one out
+    busy = {player["discord_id"] for player in players if player.get("current_game_id")}
+    if busy:
+        players = [player for player in players if player["discord_id"] not in busy]
+        entries = [entry for entry in entries if entry.discord_id not in busy]
+        if len(entries) < matchmaker.min_players:
+            # Too few left to play; the rest go back in the queue
+            for entry in entries:
+                if matchmaker.queued_bucket(entry.discord_id):
+                    continue
+                match = matchmaker.join(key, entry)
+                if match:
+                    await launch_matchmade_game(key, match)
+            return
+    
+    channel_id = entries[0].channel_id
+    channel = get_game_channel(channel_id)
+    game = Game(
+        channel_id=channel_id,
+        guild_id=guild_id,
+        mode=mode,
+        era=era,
+        shard_id=guild_shard(guild_id),
+        max_players=GAME_MODES[mode]["max_teams"] * GAME_MODES[mode]["team_size"],
+        current_players=len(players)
+    )
+    await db_call("launch_matchmade_game.game_players.insert_many", lobby_members.add_many(game.id, [player["id"] for player in players]))
+    await db_call("launch_matchmade_game.games.insert_one", db.games.insert_one(game.dict()))
+    
+    embed = discord.Embed(
+        title="🎯 Match Found!",
+        description=f"**Mode:** {GAME_MODES[mode]['name']}\n**Era:** {ERAS[era]['name']}\n**Players:** {len(players)}",
+        color=0x00ff00
+    )
+    embed.add_field(name="Players", value=" ".join(f"<@{entry.discord_id}>" for entry in entries)[:1024], inline=False)
+    embed.set_footer(text=f"Game ID: {game.id}")
+    await discord_call("launch_matchmade_game", channel.send(embed=embed))
+    
+    await start_battle_royale(game.id)
+
+matchmaker = Matchmaker(
+    capacity_for=matchmaking_capacity,
+    on_match=launch_matchmade_game,
+    min_players=int(os.environ.get('MATCHMAKING_MIN_PLAYERS', '2')),
+    max_wait_seconds=float(os.environ.get('MATCHMAKING_MAX_WAIT', '120')),
+    cross_channel=os.environ.get('MATCHMAKING_CROSS_CHANNEL', 'true').lower() in ('1', 'true', 'yes')
+)
+
+@bot.tree.command(name="queue", description="Join the matchmaking queue")
+@rate_limited("queue")
+async def queue(interaction: discord.Interaction, mode: str = "solo", era: str = "modern"):
+    if mode not in GAME_MODES:
+        await interaction.response.send_message("❌ Invalid game mode! Available modes: " + ", ".join(GAME_MODES.keys()))
+        return
+    
+    if era not in ERAS:
+        await interaction.response.send_message("❌ Invalid era! Available eras: " + ", ".join(ERAS.keys()))
+        return
+    
+    if admission["games"].saturated:
+        record_rejection("games")
+        await interaction.response.send_message(GAMES_FULL_MESSAGE, ephemeral=True)
+        return
+    
+    user = interaction.user
+    if matchmaker.queued_bucket(str(user.id)):
+        await interaction.response.send_message("❌ You're already in a queue! Use /leave_queue first.", ephemeral=True)
+        return
+    
+    player_data = await db_call("queue.players.find_one", db.players.find_one(
+        {"discord_id": str(user.id)}, {"rating": 1, "current_game_id": 1}
+    )) or {}
+    if player_data.get("current_game_id"):
+        await interaction.response.send_message("❌ You're already in a game! Queue again once it's over.", ephemeral=True)
+        return
+    
+    band = None
+    if MATCHMAKING_RATING_BAND:
+        band = int(player_data.get("rating", DEFAULT_RATING) // MATCHMAKING_RATING_BAND)
+    key = matchmaker.bucket_key(str(interaction.guild.id), str(interaction.channel.id), mode, era, band)
+    entry = QueueEntry(
+        discord_id=str(user.id),
+        username=user.display_name,
+        avatar_url=str(user.display_avatar.url) if user.display_avatar else None,
+        channel_id=str(interaction.channel.id)
+    )
+    match = matchmaker.join(key, entry)
+    if match is None:
+        await interaction.response.send_message(
+            f"⏳ Queued for {GAME_MODES[mode]['name']} / {ERAS[era]['name']} "
+            f"({matchmaker.queue_size(key)}/{matchmaking_capacity(mode)})",
+            ephemeral=True
+        )
+        return
+    
+    await interaction.response.send_message("🎯 Match found! Get ready...", ephemeral=True)
+    try:
+        await launch_matchmade_game(key, match)
+    except Exception as e:
+        logger.error(f"Error launching matchmade game: {e}")
+
+@bot.tree.command(name="leave_queue", description="Leave the matchmaking queue")
+async def leave_queue(interaction: discord.Interaction):
+    if matchmaker.leave(str(interaction.user.id)):
+        await interaction.response.send_message("👋 You left the queue.", ephemeral=True)
+    else:
+        await interaction.response.send_message("❌ You're not in a queue!", ephemeral=True)
+
+# Tournaments: bracket matches are ordinary games, started together each round
+async def create_tournament_match(tournament: dict, round_number: int, player_ids: List[str]) -> str:
+    game = Game(
+        channel_id=tournament["channel_id"],
+        guild_id=tournament["guild_id"],
+        mode="solo",
+        era=tournament["era"],
+        shard_id=guild_shard(tournament["guild_id"]),
+        max_players=len(player_ids),
+        min_players=len(player_ids),
+        current_players=len(player_ids),
+        tournament_id=tournament["id"],
+        tournament_round=round_number
+    )
+    await db_call("create_tournament_match.game_players.insert_many", lobby_members.add_many(game.id, player_ids))
+    await db_call("create_tournament_match.games.insert_one", db.games.insert_one(game.dict()))
+    return game.id
+
+async def announce_champion(tournament: dict):
+    channel = get_game_channel(tournament["channel_id"])
+    champion = await db_call("announce_champion.players.find_one", db.players.find_one(
+        {"id": tournament["champion"]}, {"discord_id": 1, "username": 1}
+    )) if tournament["champion"] else None
+    embed = discord.Embed(
+        title="🏆 TOURNAMENT CHAMPION!",
+        description=f"**{champion['username']}** (<@{champion['discord_id']}>) won the tournament!" if champion else "The tournament ended without a champion.",
+        color=0xffd700
+    )
+    embed.add_field(name="Entrants", value=str(tournament["entrants"]), inline=True)
+    embed.add_field(name="Rounds", value=str(tournament["round"]), inline=True)
+    embed.set_footer(text=f"Tournament ID: {tournament['id']}")
+    await discord_call("announce_champion", channel.send(embed=embed))
+
+tournament_manager = TournamentManager(
+    db,
+    create_match=create_tournament_match,
+    # Looked up on each call so the load test's instrumented version is used
+    start_match=lambda game_id: start_battle_royale(game_id),
+    on_finished=announce_champion
+)
+
+@bot.tree.command(name="tournament_create", description="Open sign-ups for a Cut Royale tournament")
+@rate_limited("start_game")
+async def tournament_create(interaction: discord.Interaction, era: str = "modern", match_size: int = DEFAULT_MATCH_SIZE):
+    if era not in ERAS:
+        await interaction.response.send_message("❌ Invalid era! Available eras: " + ", ".join(ERAS.keys()))
+        return
+    
+    if not 2 <= match_size <= MAX_LOBBY_PLAYERS:
+        await interaction.response.send_message(f"❌ Match size must be between 2 and {MAX_LOBBY_PLAYERS}!")
+        return
+    
+    tournament = await db_call("tournament_create.tournaments.insert_one", tournament_manager.create(
+        guild_id=str(interaction.guild.id),
+        channel_id=str(interaction.channel.id),
+        era=era,
+        created_by=str(interaction.user.id),
+        match_size=match_size
+    ))
+    embed = discord.Embed(
+        title="🏆 Cut Royale Tournament - Sign-ups Open!",
+        description=f"**Era:** {ERAS[era]['name']}\n**Match size:** {match_size}\n\nReact with 🏆 to enter. The winner of each match advances to the next round.",
+        color=0xffd700
+    )
+    embed.set_footer(text=f"Tournament ID: {tournament['id']} • Start it with /tournament_start")
+    await interaction.response.send_message(embed=embed)
+    message = await interaction.original_response()
+    await message.add_reaction("🏆")
+    await db_call("tournament_create.tournaments.update_one", db.tournaments.update_one(
+        {"id": tournament["id"]}, {"$set": {"message_id": str(message.id)}}
+    ))
+
+@bot.tree.command(name="tournament_start", description="Close sign-ups and start this channel's tournament")
+async def tournament_start(interaction: discord.Interaction):
+    tournament = await db_call("tournament_start.tournaments.find_one", db.tournaments.find_one({
+        "guild_id": str(interaction.guild.id),
+        "channel_id": str(interaction.channel.id),
+        "status": "registration"
+    }))
+    if not tournament:
+        await interaction.response.send_message("❌ No tournament is taking sign-ups in this channel!", ephemeral=True)
+        return
+    
+    if tournament["created_by"] != str(interaction.user.id):
+        await interaction.response.send_message("❌ Only the player who created the tournament can start it!", ephemeral=True)
+        return
+    
+    if tournament["entrants"] < 2:
+        await interaction.response.send_message("❌ A tournament needs at least 2 entrants!", ephemeral=True)
+        return
+    
+    if admission["games"].saturated:
+        record_rejection("games")
+        await interaction.response.send_message(GAMES_FULL_MESSAGE, ephemeral=True)
+        return
+    
+    matches = -(-tournament["entrants"] // tournament["match_size"])
+    await interaction.response.send_message(
+        f"⚔️ The tournament begins! {tournament['entrants']} players across {matches} matches in round 1."
+    )
+    try:
+        await tournament_manager.start(tournament["id"])
+    except Exception as e:
+        logger.error(f"Error starting tournament {tournament['id']}: {e}")
 
 async def start_battle_royale(game_id: str):
     """Start the actual battle royale game"""
-    game_data = await db.games.find_one({"id": game_id})
+    game_data = await db_call("start_battle_royale.games.find_one", db.games.find_one({"id": game_id}))
     if not game_data:
         return
     
-    # Update game status
-    await db.games.update_one(
-        {"id": game_id}, 
-        {
-            "$set": {
-                "status": "active",
-                "start_time": datetime.utcnow(),
-                "alive_players": game_data["current_players"]
-            }
-        }
-    )
+    # Only one caller gets to move the game out of "waiting", and it holds the lease from that moment on
+    if not await db_call("start_battle_royale.games.find_one_and_update", lease_manager.start(
+        game_id, {"start_time": datetime.utcnow()}
+    )):
+        return
+    lobby_edits.cancel(game_id)
     
-    channel = bot.get_channel(int(game_data["channel_id"]))
+    # Put the lobby's players into the match, a batch at a time
+    await db_call("start_battle_royale.game_players.update_many", lobby_members.lock(game_id))
+    player_count = 0
+    async for batch in lobby_members.batches(game_data):
+        await db_call("start_battle_royale.players.update_many", db.players.update_many(
+            {"id": {"$in": batch}},
+            {"$set": {"current_game_id": game_id, "is_alive": True}}
+        ))
+        player_count += len(batch)
+    # Joins racing the start were either locked in above or backed out, so the roster is final
+    game_data = await db_call("start_battle_royale.games.find_one_and_update", db.games.find_one_and_update(
+        {"id": game_id},
+        {"$set": {"current_players": player_count, "alive_players": player_count}},
+        return_document=ReturnDocument.AFTER
+    ))
+    match_states[game_id] = await load_match_state(game_data)
+    
+    channel = get_game_channel(game_data["channel_id"])
     
     # Generate game start image
     era_info = ERAS[game_data["era"]]
     prompt = f"Battle royale game starting, {era_info['environment']}, {game_data['current_players']} players, aerial view, game style, high quality"
     
     try:
-        image_url = await generate_game_image(prompt, game_data["era"])
+        image_url = await generate_game_image(prompt, game_data["era"], scene={
+            "title": "BATTLE ROYALE STARTED",
+            "subtitle": f"{game_data['current_players']} players have entered the battlefield",
+            "zone": 1.0
+        }, guild_id=game_data["guild_id"])
         
         embed = discord.Embed(
             title="⚔️ BATTLE ROYALE STARTED!",
@@ -344,10 +1022,7 @@ async def start_battle_royale(game_id: str):
         if image_url:
             embed.set_image(url=image_url)
         
-        await channel.send(embed=embed)
-        
-        # Start game loop
-        asyncio.create_task(game_loop(game_id))
+        await discord_call("start_battle_royale", channel.send(embed=embed))
         
     except Exception as e:
         logger.error(f"Error starting battle: {e}")
@@ -356,45 +1031,155 @@ async def start_battle_royale(game_id: str):
             description=f"🎮 **{game_data['current_players']} players** have entered the battlefield!\n🏛️ **Era:** {era_info['name']}",
             color=0xff6600
         )
-        await channel.send(embed=embed)
+        await discord_call("start_battle_royale", channel.send(embed=embed))
+    finally:
+        # The lease is ours, so the game loop runs here even if the announcement didn't go out
+        run_game(game_id, game_data.get("shard_id", 0))
+
+# Game loops running in this process, keyed by game ID, and the shard each belongs to
+running_games: Dict[str, asyncio.Task] = {}
+running_game_shards: Dict[str, int] = {}
+# In-memory placement, kill and damage tracking for the games running here
+match_states: Dict[str, MatchState] = {}
+# Eliminations waiting for the end of the tick, for guilds with kill_digest on
+kill_digests: Dict[str, List[str]] = {}
+# Latest snapshot of every running game, including those ticked by other bot workers
+live_board = LiveBoard(ttl_seconds=float(os.environ.get('LIVE_SNAPSHOT_TTL', '300')))
+metrics_registry.gauge("cutroyale_live_snapshots", "Games with a live snapshot in this process", callback=lambda: len(live_board))
+metrics_registry.gauge("cutroyale_active_games", "Game loops running in this process", callback=lambda: len(running_games))
+
+def run_game(game_id: str, shard_id: int = 0) -> asyncio.Task:
+    """Start the game loop for a game in this process"""
+    task = running_games.get(game_id)
+    if task and not task.done():
+        return task
+    task = asyncio.create_task(game_loop(game_id))
+    running_games[game_id] = task
+    running_game_shards[game_id] = shard_id
+    shard_stats.record_game_started(shard_id)
+    # Already committed to, so counted even past the cap
+    admission["games"].take()
+
+    def forget(_):
+        admission["games"].release()
+        running_games.pop(game_id, None)
+        running_game_shards.pop(game_id, None)
+        match_states.pop(game_id, None)
+        kill_digests.pop(game_id, None)
+
+    task.add_done_callback(forget)
+    return task
 
 async def game_loop(game_id: str):
     """Main game loop handling player interactions and events"""
-    game_data = await db.games.find_one({"id": game_id})
+    game_data = await db_call("game_loop.games.find_one", db.games.find_one({"id": game_id}))
     if not game_data:
         return
     
-    channel = bot.get_channel(int(game_data["channel_id"]))
+    channel = get_game_channel(game_data["channel_id"])
+    if game_id not in match_states:
+        match_states[game_id] = await load_match_state(game_data)
+    tick = 0
     
     while True:
-        # Check if game should end
-        game_data = await db.games.find_one({"id": game_id})
-        if game_data["alive_players"] <= 1 or game_data["status"] != "active":
-            await end_game(game_id)
-            break
+        tick_start = time.perf_counter()
         
-        # Simulate random encounters
-        alive_players = await db.players.find({"current_game_id": game_id, "is_alive": True}).to_list(100)
+        # Stop if another worker took the game over
+        if not lease_manager.owns(game_id) and not await lease_manager.acquire(game_id):
+            logger.warning(f"No longer own game {game_id}, stopping its loop")
+            break
         
-        if len(alive_players) >= 2:
-            # Random encounter between two players
-            player1, player2 = random.sample(alive_players, 2)
-            await simulate_encounter(game_id, player1, player2, channel)
+        with tracer.tick(game_id):
+            # Check if game should end
+            with tracer.span("state_read"):
+                game_data = await db_call("game_loop.games.find_one", db.games.find_one({"id": game_id}))
+            state = match_states[game_id]
+            if state.alive <= 1 or game_data["status"] != "active":
+                await end_game(game_id)
+                break
+            
+            # Simulate random encounters, picked from the in-memory match state rather than read back from Mongo
+            with tracer.span("encounter_pick"):
+                encounters = pick_encounters(state)
+                found = state.scavenge(len(encounters))
+            await record_loot(game_data, found)
+            await asyncio.gather(*(
+                simulate_encounter(game_id, player1, player2, channel)
+                for player1, player2 in encounters
+            ))
+            kills = kill_digests.pop(game_id, None)
+            if kills:
+                with tracer.span("send"):
+                    await discord_call("game_loop", channel.send(embed=build_kill_digest_embed(kills, state.alive)))
+            tick += 1
+            await publish_live(build_live_snapshot(game_data, state, tick))
         
-        await asyncio.sleep(random.randint(10, 30))  # Random interval between events
+        GAME_TICK_SECONDS.observe(time.perf_counter() - tick_start)
+        # Served from memory; a guild's new pace applies from the next tick
+        settings = await guild_settings.get(game_data["guild_id"])
+        await asyncio.sleep(random.randint(*settings["tick_interval"]))  # Random interval between events
+
+async def publish_live(snapshot: Dict[str, Any]):
+    """Make a game's latest snapshot queryable here and, with split roles, on every API worker"""
+    live_board.publish(snapshot)
+    if SERVICE_ROLE == "all":
+        return
+    try:
+        await event_channel.publish("live_snapshot", snapshot)
+    except Exception as e:
+        logger.error(f"Error publishing live snapshot for game {snapshot['game_id']}: {e}")
 
+async def record_live_snapshot(payload: Dict[str, Any]):
+    live_board.publish(payload)
+
+event_channel.subscribe("live_snapshot", record_live_snapshot)
+
+async def record_loot(game_data: dict, found: List[Tuple[str, str]]):
+    """Log this tick's weapon drops, so a process taking the game over can replay inventories"""
+    if not found:
+        return
+    now = datetime.utcnow()
+    actions = [
+        GameAction(
+            game_id=game_data["id"],
+            guild_id=game_data["guild_id"],
+            timestamp=now,
+            player_id=player_id,
+            action_type="loot",
+            weapon=weapon,
+            description=f"Found a {weapon}"
+        ).to_document()
+        for player_id, weapon in found
+    ]
+    with tracer.span("persist"):
+        await db_call("record_loot.game_actions.insert_many", db.game_actions.insert_many(actions, ordered=False))
+
+@ENCOUNTER_SECONDS.time()
 async def simulate_encounter(game_id: str, player1: dict, player2: dict, channel):
     """Simulate a player encounter with choices"""
-    game_data = await db.games.find_one({"id": game_id})
+    game_data = await db_call("simulate_encounter.games.find_one", db.games.find_one({"id": game_id}))
     era_info = ERAS[game_data["era"]]
     
     # Generate encounter image
     prompt = f"Two players fighting in {era_info['environment']}, {era_info['name']} era, battle scene, game art style"
-    image_url = await generate_game_image(prompt, game_data["era"])
+    state = match_states.get(game_id)
+    with tracer.span("image"):
+        image_url = await generate_game_image(prompt, game_data["era"], scene={
+            "title": "ENCOUNTER",
+            "subtitle": f"{player1['username']} vs {player2['username']}",
+            "lines": scene_lines([
+                {"username": player["username"], "kills": state.players[player["id"]].kills if state and player["id"] in state.players else 0}
+                for player in (player1, player2)
+            ]),
+            "zone": zone_fraction(game_data)
+        }, guild_id=game_data["guild_id"])
     
     embed = discord.Embed(
         title="⚔️ ENCOUNTER!",
-        description=f"**{player1['username']}** spots **{player2['username']}** in the distance!",
+        description=(
+            f"**{player1['username']}** ({state.weapon(player1['id'])}) spots **{player2['username']}** "
+            f"({state.weapon(player2['id'])}) in the distance!"
+        ) if state else f"**{player1['username']}** spots **{player2['username']}** in the distance!",
         color=0xff0000
     )
     
@@ -407,156 +1192,304 @@ async def simulate_encounter(game_id: str, player1: dict, player2: dict, channel
         inline=False
     )
     
-    message = await channel.send(embed=embed)
-    await message.add_reaction("1️⃣")
-    await message.add_reaction("2️⃣")
-    await message.add_reaction("3️⃣")
+    with tracer.span("send"):
+        message = await discord_call("simulate_encounter", channel.send(embed=embed))
+        await discord_call("simulate_encounter", message.add_reaction("1️⃣"))
+        await discord_call("simulate_encounter", message.add_reaction("2️⃣"))
+        await discord_call("simulate_encounter", message.add_reaction("3️⃣"))
     
     # Wait for player response (simplified for demo)
-    await asyncio.sleep(10)
+    settings = await guild_settings.get(game_data["guild_id"])
+    with tracer.span("response_wait"):
+        await asyncio.sleep(settings["encounter_response_seconds"])
     
-    # Random outcome for now
-    if random.random() < 0.6:
-        # Player 1 wins
-        winner, loser = player1, player2
-    else:
-        # Player 2 wins
-        winner, loser = player2, player1
+    # The wait may have outlasted our lease; handle_kill's fenced write catches what this misses
+    if not lease_manager.owns(game_id):
+        return
     
-    await handle_kill(game_id, winner, loser, channel)
+    winner, loser, weapon, damage, damage_taken = resolve_encounter(state, player1, player2)
+    
+    await handle_kill(game_id, winner, loser, channel, weapon, damage, damage_taken)
 
-async def handle_kill(game_id: str, winner: dict, loser: dict, channel):
+@KILL_SECONDS.time()
+async def handle_kill(game_id: str, winner: dict, loser: dict, channel, weapon: Optional[str] = None,
+                      damage: int = KILL_DAMAGE, damage_taken: int = 0):
     """Handle a player kill"""
-    # Update player stats
-    await db.players.update_one(
-        {"id": winner["id"]},
-        {"$inc": {"stats.kills": 1}}
-    )
+    # Update game alive count, only while our lease is current: a worker that lost
+    # the game mid-tick must not record kills alongside the new owner
+    with tracer.span("persist"):
+        result = await db_call("handle_kill.games.update_one", db.games.update_one(
+            lease_manager.fence(game_id),
+            {"$inc": {"alive_players": -1}}
+        ))
+    if result.matched_count == 0:
+        logger.warning(f"Lost lease on game {game_id}, dropping kill of {loser['id']}")
+        lease_manager.lost(game_id)
+        return
     
-    await db.players.update_one(
-        {"id": loser["id"]},
-        {
-            "$inc": {"stats.deaths": 1},
-            "$set": {"is_alive": False, "current_game_id": None}
-        }
-    )
+    # Stats are tracked in memory and written once the match ends
+    state = match_states.get(game_id)
+    if state:
+        state.record_kill(winner["id"], loser["id"], damage=damage, damage_taken=damage_taken)
     
-    # Update game alive count
-    await db.games.update_one(
-        {"id": game_id},
-        {"$inc": {"alive_players": -1}}
-    )
+    with tracer.span("persist"):
+        await db_call("handle_kill.players.update_one", db.players.update_one(
+            {"id": loser["id"]},
+            {"$set": {"is_alive": False, "current_game_id": None}}
+        ))
     
     # Send funny kill message
-    kill_msg = random.choice(KILL_MESSAGES).format(
-        killer=winner["username"],
-        victim=loser["username"]
-    )
+    kill_msg = kill_message(winner, loser)
     
-    # Generate kill image
-    game_data = await db.games.find_one({"id": game_id})
-    era_info = ERAS[game_data["era"]]
-    prompt = f"Victory moment, {era_info['environment']}, {era_info['name']} era, celebration, eliminated player, game art"
-    image_url = await generate_game_image(prompt, game_data["era"])
-    
-    embed = discord.Embed(
-        title="💀 ELIMINATION!",
-        description=kill_msg,
-        color=0x8b0000
-    )
-    
-    if image_url:
-        embed.set_image(url=image_url)
-    
-    embed.add_field(name="Players Remaining", value=f"{game_data['alive_players'] - 1}", inline=True)
+    with tracer.span("state_read"):
+        game_data = await db_call("handle_kill.games.find_one", db.games.find_one({"id": game_id}))
+    settings = await guild_settings.get(game_data["guild_id"])
+    if settings["kill_digest"]:
+        # The game loop posts the tick's kills together
+        kill_digests.setdefault(game_id, []).append(f"{kill_msg} ({weapon.title()})" if weapon else kill_msg)
+    else:
+        # Generate kill image
+        era_info = ERAS[game_data["era"]]
+        prompt = f"Victory moment, {era_info['environment']}, {era_info['name']} era, celebration, eliminated player, game art"
+        with tracer.span("image"):
+            image_url = await generate_game_image(prompt, game_data["era"], scene={
+                "title": "ELIMINATION",
+                "subtitle": f"{winner['username']} eliminated {loser['username']}",
+                "lines": [f"{game_data['alive_players']} players remaining"],
+                "zone": zone_fraction(game_data)
+            }, guild_id=game_data["guild_id"])
+        
+        embed = build_kill_embed(kill_msg, image_url, game_data['alive_players'], weapon)
+        
+        with tracer.span("send"):
+            await discord_call("handle_kill", channel.send(embed=embed))
     
-    await channel.send(embed=embed)
+    KILLS_TOTAL.inc()
     
     # Record action
     action = GameAction(
         game_id=game_id,
+        guild_id=game_data["guild_id"],
         player_id=winner["id"],
         action_type="kill",
         target_player_id=loser["id"],
+        weapon=weapon,
+        damage=damage,
+        damage_taken=damage_taken,
         description=kill_msg
     )
-    await db.game_actions.insert_one(action.dict())
+    with tracer.span("persist"):
+        await db_call("handle_kill.game_actions.insert_one", db.game_actions.insert_one(action.to_document()))
 
 async def end_game(game_id: str):
     """End the game and declare winner"""
-    game_data = await db.games.find_one({"id": game_id})
+    game_data = await db_call("end_game.games.find_one", db.games.find_one({"id": game_id}))
     if not game_data:
         return
     
-    channel = bot.get_channel(int(game_data["channel_id"]))
-    
-    # Find winner
-    winner_data = await db.players.find_one({"current_game_id": game_id, "is_alive": True})
+    state = match_states.pop(game_id, None) or await load_match_state(game_data)
+    survivors = [player_id for player_id, result in state.players.items() if result.placement is None]
+    winner_id = survivors[0] if len(survivors) == 1 else None
+    state.finish(winner_id)
     
-    if winner_data:
-        # Update winner stats
-        await db.players.update_one(
-            {"id": winner_data["id"]},
-            {"$inc": {"stats.wins": 1, "stats.games_played": 1}}
-        )
-        
-        # Update game
-        await db.games.update_one(
-            {"id": game_id},
-            {
-                "$set": {
-                    "status": "finished",
-                    "end_time": datetime.utcnow(),
-                    "winner": winner_data["id"]
-                }
+    # Only the caller that moves the game to "finished", while still holding its lease, records its results.
+    # The game stays flagged until they are written, so the archiver retries them if this process fails to
+    result = await db_call("end_game.games.update_one", db.games.update_one(
+        {**lease_manager.fence(game_id), "status": {"$ne": "finished"}},
+        {
+            "$set": {
+                "status": "finished",
+                "end_time": state.ended_at,
+                "winner": winner_id,
+                "results_pending": True
             }
-        )
+        }
+    ))
+    if result.modified_count == 0:
+        await lease_manager.release(game_id)
+        return
+    
+    GAMES_FINISHED.inc()
+    previous = live_board.get(game_id)
+    await publish_live(build_live_snapshot(game_data, state, previous["tick"] if previous else 0, status="finished"))
+    await persist_match_results(game_data, state)
+    if game_data.get("tournament_id"):
+        await record_tournament_match(game_data, state)
+    
+    if winner_id:
+        channel = get_game_channel(game_data["channel_id"])
         
         # Generate victory image
         era_info = ERAS[game_data["era"]]
         prompt = f"Victory royale, champion celebration, {era_info['environment']}, {era_info['name']} era, winner, confetti, trophy"
-        image_url = await generate_game_image(prompt, game_data["era"])
+        image_url = await generate_game_image(prompt, game_data["era"], scene={
+            "title": "VICTORY ROYALE",
+            "subtitle": f"{state.players[winner_id].username} is the last one standing",
+            "lines": scene_lines(state.top_killers())
+        }, guild_id=game_data["guild_id"])
         
         embed = discord.Embed(
             title="👑 VICTORY ROYALE!",
-            description=f"**{winner_data['username']}** is the last one standing!\n\n🎉 **WINNER WINNER!**",
+            description=f"**{state.players[winner_id].username}** is the last one standing!\n\n🎉 **WINNER WINNER!**",
             color=0xffd700
         )
         
         if image_url:
             embed.set_image(url=image_url)
         
-        embed.add_field(name="Final Stats", value=f"🎮 Players: {game_data['current_players']}\n⏱️ Duration: {datetime.utcnow() - game_data['start_time']}", inline=False)
+        embed.add_field(name="Final Stats", value=f"🎮 Players: {game_data['current_players']}\n⏱️ Duration: {state.ended_at - state.started_at}", inline=False)
         
-        await channel.send(embed=embed)
+        await discord_call("end_game", channel.send(embed=embed))
     
-    # Clean up players
-    await db.players.update_many(
-        {"current_game_id": game_id},
-        {"$set": {"current_game_id": None, "is_alive": True}}
+    await lease_manager.release(game_id)
+
+async def load_match_state(game_data: dict) -> MatchState:
+    """Match state for a game, replayed from its kill and loot log if the match is already underway"""
+    players = []
+    async for batch in lobby_members.batches(game_data):
+        players += await db_call("load_match_state.players.find", db.players.find(
+            {"id": {"$in": batch}},
+            {"id": 1, "discord_id": 1, "username": 1}
+        ).to_list(None))
+    actions = await db_call("load_match_state.game_actions.find", db.game_actions.find(
+        {"game_id": game_data["id"], "action_type": {"$in": ["kill", "loot"]}},
+        {"action_type": 1, "player_id": 1, "target_player_id": 1, "weapon": 1, "damage": 1, "damage_taken": 1, "timestamp": 1}
+    ).sort("timestamp", 1).to_list(None))
+    return MatchState.replay(
+        game_data["id"], game_data.get("start_time") or datetime.utcnow(), players, actions,
+        WEAPON_TABLES.get(game_data.get("era"))
     )
 
-async def generate_game_image(prompt: str, era: str) -> Optional[str]:
-    """Generate game images using FAL.ai"""
+async def persist_match_results(game_data: dict, state: MatchState):
+    """Record a finished game's results, leaving them pending for the archiver if that fails"""
+    try:
+        await write_match_results(game_data, state)
+    except Exception as e:
+        logger.error(f"Error recording results for game {game_data['id']}: {e}")
+
+async def retry_match_results(game_data: dict):
+    """Record the results of a game that finished without them, replayed from its kill and loot log"""
+    state = await load_match_state(game_data)
+    state.finish(game_data.get("winner"), at=game_data.get("end_time"))
+    player_ids = list(state.players)
+    for start in range(0, len(player_ids), lobby_members.batch_size):
+        # History rows from the failed attempt, if it got that far
+        await db_call("retry_match_results.player_matches.delete_many", db.player_matches.delete_many(
+            {"player_id": {"$in": player_ids[start:start + lobby_members.batch_size]}, "game_id": game_data["id"]}
+        ))
+    await write_match_results(game_data, state)
+
+async def write_match_results(game_data: dict, state: MatchState):
+    """Write every participant's stats and rating in one bulk write, plus the match results document.
+
+    Safe to repeat: players already credited with the game are skipped.
+    """
+    player_ids = list(state.players)
+    players = []
+    for start in range(0, len(player_ids), lobby_members.batch_size):
+        players += await db_call("persist_match_results.players.find", db.players.find(
+            {"id": {"$in": player_ids[start:start + lobby_members.batch_size]}},
+            {"id": 1, "rating": 1}
+        ).to_list(None))
+    ratings = rating_changes(players, state.placements())
+    requests = state.player_updates(ratings)
+    if requests:
+        await db_call("persist_match_results.players.bulk_write", db.players.bulk_write(requests, ordered=False))
+    await db_call("persist_match_results.match_results.replace_one", db.match_results.replace_one(
+        {"game_id": game_data["id"]}, state.result_document(game_data, ratings), upsert=True
+    ))
+    await db_call("persist_match_results.player_matches.insert_many", db.player_matches.insert_many(
+        state.history_rows(game_data), ordered=False
+    ))
+    await db_call("persist_match_results.games.update_one", db.games.update_one(
+        {"id": game_data["id"]}, {"$unset": {"results_pending": ""}}
+    ))
+
+async def record_tournament_match(game_data: dict, state: MatchState):
+    """Feed a finished bracket match into its tournament, which may start the next round"""
+    results = [
+        {"player_id": player_id, "placement": result.placement, "kills": result.kills}
+        for player_id, result in state.players.items()
+    ]
+    try:
+        await tournament_manager.record_result(game_data, results)
+    except Exception as e:
+        logger.error(f"Error advancing tournament {game_data['tournament_id']}: {e}")
+
+# Imported on the first image request rather than at startup
+fal_client = None
+
+def get_fal_client():
+    global fal_client
+    if fal_client is None:
+        import fal_client as client
+        fal_client = client
+    return fal_client
+
+def zone_fraction(game_data: dict) -> float:
+    """How much of the map is still in play, for rendered banners"""
+    return round(game_data.get("alive_players", 0) / max(game_data.get("current_players", 0), 1), 2)
+
+# Local banner renderer; its images are served from PUBLIC_BASE_URL/api/images/<hash>.png
+PUBLIC_BASE_URL = os.environ.get('PUBLIC_BASE_URL', '').rstrip('/')
+image_renderer = ImageRenderer(db.rendered_images, workers=int(os.environ.get('RENDER_WORKERS', '2')))
+
+async def render_game_image(prompt: str, era: str, scene: Optional[dict] = None) -> Optional[str]:
+    """Render a banner locally; None when rendering isn't available"""
+    if not PUBLIC_BASE_URL:
+        return None
+    start = time.perf_counter()
+    scene = {"era": era, "era_name": ERAS.get(era, {}).get("name"), **(scene or {"title": "CUT ROYALE", "subtitle": prompt[:80]})}
+    try:
+        key = await image_renderer.render(scene)
+    except Exception as e:
+        logger.error(f"Error rendering image: {e}")
+        return None
+    IMAGE_SECONDS.observe(time.perf_counter() - start, source="local")
+    IMAGE_REQUESTS.inc(outcome="rendered")
+    return f"{PUBLIC_BASE_URL}/api/images/{key}.png"
+
+async def generate_game_image(prompt: str, era: str, scene: Optional[dict] = None, guild_id: Optional[str] = None) -> Optional[str]:
+    """Generate game images using FAL.ai or the local renderer, per the guild's image_source"""
+    settings = await guild_settings.get(guild_id) if guild_id else GUILD_SETTING_DEFAULTS
+    if settings["image_source"] == "none":
+        return None
+    local_first = settings["image_source"] == "local"
+    if local_first:
+        image_url = await render_game_image(prompt, era, scene)
+        if image_url:
+            return image_url
+    
+    start = time.perf_counter()
     try:
         # Set FAL_KEY environment variable
         os.environ["FAL_KEY"] = os.environ.get('FAL_KEY', '')
         
         enhanced_prompt = f"{prompt}, {era} theme, game art style, high quality, detailed"
         
-        handler = await fal_client.submit_async(
-            "fal-ai/flux/dev",
-            arguments={"prompt": enhanced_prompt}
-        )
-        
-        result = await handler.get()
+        async with admission["images"].slot():
+            handler = await get_fal_client().submit_async(
+                "fal-ai/flux/dev",
+                arguments={"prompt": enhanced_prompt}
+            )
+            
+            result = await handler.get()
+        IMAGE_SECONDS.observe(time.perf_counter() - start, source="fal")
         
         if result.get("images") and len(result["images"]) > 0:
+            IMAGE_REQUESTS.inc(outcome="generated")
             return result["images"][0]["url"]
         
+        IMAGE_REQUESTS.inc(outcome="empty")
         return None
     except Exception as e:
         logger.error(f"Error generating image: {e}")
+        IMAGE_SECONDS.observe(time.perf_counter() - start, source="fallback")
+        IMAGE_REQUESTS.inc(outcome="fallback")
+        if not local_first:
+            image_url = await render_game_image(prompt, era, scene)
+            if image_url:
+                return image_url
         # For demo purposes, return a placeholder image related to the era
         placeholder_images = {
             "medieval": "https://images.unsplash.com/photo-1578662996442-48f60103fc96?w=800",
@@ -574,22 +1507,348 @@ async def root():
 
 @api_router.get("/games", response_model=List[dict])
 async def get_active_games():
-    games = await db.games.find({"status": {"$in": ["waiting", "active"]}}).to_list(100)
+    games = await db_call("get_active_games.games.find", db.games.find({"status": {"$in": ["waiting", "active"]}}, {"_id": 0}).to_list(100))
     return games
 
 @api_router.get("/players", response_model=List[dict])
 async def get_players():
-    players = await db.players.find().to_list(100)
+    players = await db_call("get_players.players.find", db.players.find({}, {"_id": 0}).to_list(100))
     return players
 
+@api_router.get("/games/{game_id}")
+async def get_game(game_id: str):
+    game = await db_call("get_game.games.find_one", db.games.find_one({"id": game_id}, {"_id": 0}))
+    results = await db_call("get_game.match_results.find_one", db.match_results.find_one({"game_id": game_id}, {"_id": 0}))
+    if not game:
+        if not results:
+            raise HTTPException(status_code=404, detail="Game not found")
+        # The game document expired after archiving; its results and timeline are kept
+        game = {
+            "id": game_id,
+            "guild_id": results.get("guild_id"),
+            "channel_id": results.get("channel_id"),
+            "mode": results.get("mode"),
+            "era": results.get("era"),
+            "status": "finished",
+            "start_time": results.get("started_at"),
+            "end_time": results.get("ended_at"),
+            "winner": results.get("winner"),
+            "current_players": results.get("player_count"),
+            "archived": True
+        }
+    return {"game": game, "results": results}
+
+@api_router.get("/games/{game_id}/live")
+async def get_live_game(game_id: str):
+    # Served from the snapshot the game loop published last tick; never reads Mongo
+    body = live_board.body(game_id)
+    if body is None:
+        raise HTTPException(status_code=404, detail="Game not running")
+    return Response(content=body, media_type="application/json")
+
+@api_router.get("/tournaments/{tournament_id}")
+async def get_tournament(tournament_id: str, limit: int = 50):
+    tournament = await db_call("get_tournament.tournaments.find_one", db.tournaments.find_one({"id": tournament_id}, {"_id": 0}))
+    if not tournament:
+        raise HTTPException(status_code=404, detail="Tournament not found")
+    rounds = await db_call("get_tournament.tournament_matches.find", tournament_manager.bracket(tournament_id))
+    standings = await db_call("get_tournament.tournament_entries.find", tournament_manager.standings(tournament_id, max(1, min(limit, 500))))
+    return {"tournament": tournament, "rounds": rounds, "standings": standings}
+
+# Competitive seasons; a rollover archives and resets player stats in chunks alongside live games
+season_manager = SeasonManager(
+    db,
+    owner_id=PROCESS_ID,
+    batch_size=int(os.environ.get('SEASON_BATCH_SIZE', '1000')),
+    pause_seconds=float(os.environ.get('SEASON_BATCH_PAUSE', '0.05'))
+)
+
+@api_router.get("/seasons")
+async def get_seasons():
+    return await db_call("get_seasons.seasons.find", season_manager.history())
+
+@api_router.get("/seasons/{number}/leaderboard")
+async def get_season_leaderboard(number: int, limit: int = 10):
+    return await db_call("get_season_leaderboard.season_stats.find", season_manager.leaderboard(number, max(1, min(limit, 100))))
+
+# Balance analytics, rolled up incrementally by whichever API process gets there first
+analytics = Analytics(db, refresh_seconds=float(os.environ.get('ANALYTICS_REFRESH_SECONDS', '300')))
+
+@api_router.get("/analytics")
+async def get_analytics(days: Optional[int] = None):
+    """Win rates, match length and kills per era and mode, and weapon popularity"""
+    if days is not None and days < 1:
+        raise HTTPException(status_code=400, detail="days must be positive")
+    return await analytics.summary(days)
+
+MATCH_HISTORY_PAGE_SIZE = 20
+MATCH_HISTORY_MAX_PAGE_SIZE = 100
+
+def encode_match_cursor(row: dict) -> str:
+    return f"{row['ended_at'].isoformat()}|{row['game_id']}"
+
+def decode_match_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        ended_at, game_id = cursor.split("|", 1)
+        return datetime.fromisoformat(ended_at), game_id
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+@api_router.get("/players/{player_id}/matches")
+async def get_player_matches(player_id: str, limit: int = MATCH_HISTORY_PAGE_SIZE, before: Optional[str] = None):
+    """A player's matches, newest first; pass the returned `next` as `before` for the following page"""
+    limit = max(1, min(limit, MATCH_HISTORY_MAX_PAGE_SIZE))
+    query: Dict[str, Any] = {"player_id": player_id}
+    if before:
+        # Keyset paging: resume strictly after the last row of the previous page
+        ended_at, game_id = decode_match_cursor(before)
+        query["$or"] = [
+            {"ended_at": {"$lt": ended_at}},
+            {"ended_at": ended_at, "game_id": {"$lt": game_id}}
+        ]
+    matches = await db_call("get_player_matches.player_matches.find", db.player_matches.find(
+        query, {"_id": 0, "player_id": 0}
+    ).sort([("ended_at", -1), ("game_id", -1)]).limit(limit).to_list(limit))
+    return {
+        "matches": matches,
+        "next": encode_match_cursor(matches[-1]) if len(matches) == limit else None
+    }
+
+@api_router.get("/images/{key}.png")
+async def get_rendered_image(key: str):
+    png = await image_renderer.get(key)
+    if png is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+    # Keyed by content hash, so the bytes behind a URL never change
+    return Response(content=png, media_type="image/png", headers={"Cache-Control": "public, max-age=604800, immutable"})
+
 @api_router.post("/generate_image")
 async def generate_image_endpoint(request: ImageGenRequest):
+    if admission["images"].saturated:
+        record_rejection("images")
+        raise HTTPException(status_code=503, detail="Image generation is at capacity, retry shortly", headers={"Retry-After": "5"})
     try:
         image_url = await generate_game_image(request.prompt, request.game_context or "modern")
         return {"success": True, "image_url": image_url}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@ops_router.get("/metrics")
+async def get_metrics():
+    for name, limit in admission.limits.items():
+        ADMISSION_IN_FLIGHT.set(limit.in_flight, limit=name)
+        ADMISSION_WAITING.set(limit.waiting, limit=name)
+    return Response(content=metrics_registry.render(), media_type=METRICS_CONTENT_TYPE)
+
+@ops_router.get("/ready")
+async def get_readiness():
+    """Readiness for load balancers: 503 while any admission limit is saturated"""
+    snapshot = admission.snapshot()
+    return JSONResponse(snapshot, status_code=200 if snapshot["ready"] else 503)
+
+# Admin endpoints require the X-Admin-Token header to match ADMIN_API_TOKEN
+async def require_admin(x_admin_token: Optional[str] = Header(None)):
+    expected = os.environ.get('ADMIN_API_TOKEN')
+    if not expected:
+        raise HTTPException(status_code=403, detail="Admin API is disabled")
+    if x_admin_token != expected:
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+class GuildSettingsUpdate(BaseModel):
+    action_retention_days: Optional[float] = None
+    game_retention_days: Optional[float] = None
+    image_source: Optional[Literal["fal", "local", "none"]] = None
+    min_players: Optional[int] = Field(None, ge=2)
+    tick_interval: Optional[Tuple[int, int]] = None
+    encounter_response_seconds: Optional[float] = Field(None, ge=0)
+    kill_digest: Optional[bool] = None
+
+# Settings that can't be cleared with null, unlike retention
+REQUIRED_GUILD_SETTINGS = {"image_source", "min_players", "tick_interval", "encounter_response_seconds", "kill_digest"}
+
+class TracingToggle(BaseModel):
+    enabled: bool
+
+class ProfilerToggle(BaseModel):
+    enabled: bool
+    interval_ms: Optional[float] = None
+
+@ops_router.get("/admin/traces", dependencies=[Depends(require_admin)])
+async def get_slowest_traces(limit: int = 20, game_id: Optional[str] = None):
+    return {"enabled": tracer.enabled, "traces": tracer.slowest(limit, game_id)}
+
+@ops_router.post("/admin/tracing", dependencies=[Depends(require_admin)])
+async def set_tracing(toggle: TracingToggle):
+    tracer.enabled = toggle.enabled
+    if not toggle.enabled:
+        tracer.recent.clear()
+    return {"enabled": tracer.enabled}
+
+@ops_router.get("/admin/profiler", dependencies=[Depends(require_admin)])
+async def get_profile(limit: int = 30):
+    return profiler.report(limit)
+
+@ops_router.post("/admin/profiler", dependencies=[Depends(require_admin)])
+async def set_profiler(toggle: ProfilerToggle):
+    if toggle.enabled:
+        # Called from the event loop, so the loop's thread is the one sampled
+        profiler.start(toggle.interval_ms / 1000 if toggle.interval_ms else None)
+    else:
+        profiler.stop()
+    return profiler.report()
+
+@ops_router.get("/admin/guilds/{guild_id}/settings", dependencies=[Depends(require_admin)])
+async def get_guild_settings(guild_id: str):
+    return await guild_settings.get(guild_id)
+
+@ops_router.put("/admin/guilds/{guild_id}/settings", dependencies=[Depends(require_admin)])
+async def update_guild_settings(guild_id: str, update: GuildSettingsUpdate):
+    """Change only the settings present in the body; a null retention keeps those rows forever.
+
+    Every process drops its cached copy as soon as the change reaches it, so no restart is needed.
+    """
+    changes = update.dict(exclude_unset=True)
+    cleared = sorted(key for key in REQUIRED_GUILD_SETTINGS if key in changes and changes[key] is None)
+    if cleared:
+        raise HTTPException(status_code=400, detail=f"Can't be null: {', '.join(cleared)}")
+    if "tick_interval" in changes:
+        low, high = changes["tick_interval"]
+        if not 0 <= low <= high:
+            raise HTTPException(status_code=400, detail="tick_interval must be [min, max] with 0 <= min <= max")
+        changes["tick_interval"] = [low, high]
+    return await guild_settings.update(guild_id, changes)
+
+async def run_season_rollover(season: dict):
+    try:
+        await season_manager.run_rollover(season)
+    except Exception as e:
+        # Picked up again by season_manager.run once its heartbeat goes stale
+        logger.error(f"Error rolling over season {season['number']}: {e}")
+
+@ops_router.post("/admin/seasons/rollover", status_code=202, dependencies=[Depends(require_admin)])
+async def start_season_rollover():
+    """Close the current season and archive it in the background; poll GET for progress"""
+    try:
+        season = await season_manager.start_rollover()
+    except SeasonError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if not season:
+        raise HTTPException(status_code=409, detail="A season rollover is already underway")
+    spawn_background(run_season_rollover(season))
+    return {"season": season["number"], "total": season["rollover"]["total"]}
+
+@ops_router.get("/admin/seasons/rollover", dependencies=[Depends(require_admin)])
+async def get_season_rollover():
+    return await db_call("get_season_rollover.seasons.find_one", season_manager.in_progress())
+
+@ops_router.get("/admin/export/{collection}", dependencies=[Depends(require_admin)])
+async def export_collection(collection: str, format: str = "ndjson", since: Optional[datetime] = None,
+                            until: Optional[datetime] = None, guild_id: Optional[str] = None,
+                            after: Optional[str] = None):
+    """Stream a collection in `_id` order; resume an interrupted export with `after=<last _id>`"""
+    filters = {"since": since, "until": until, "guild_id": guild_id, "after": after}
+    try:
+        export_query(collection, **filters)
+        if format not in EXPORT_FORMATS:
+            raise ExportError(f"Unknown format: {format}")
+    except ExportError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return StreamingResponse(
+        stream_export(db, collection, format, **filters),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{collection}.{format}"'}
+    )
+
+# Worker status shared with the API workers over the event channel
+worker_statuses: Dict[str, Dict[str, Any]] = {}
+
+async def record_worker_status(payload: Dict[str, Any]):
+    worker_statuses[payload["process_id"]] = payload
+
+event_channel.subscribe("worker_status", record_worker_status)
+
+def build_worker_status() -> Dict[str, Any]:
+    """Describe this bot worker for the API workers"""
+    return {
+        "process_id": PROCESS_ID,
+        "role": SERVICE_ROLE,
+        "bot_user": str(bot.user) if bot.user else None,
+        "ready": bot.is_ready(),
+        "guilds": len(bot.guilds),
+        "latency_ms": round(bot.latency * 1000, 1) if bot.is_ready() else None,
+        "running_games": len(running_games),
+        "shard_count": bot.shard_count,
+        "shards": build_shard_status(),
+        "updated_at": datetime.utcnow().isoformat()
+    }
+
+def build_shard_status() -> List[Dict[str, Any]]:
+    if isinstance(bot, commands.AutoShardedBot):
+        latencies = dict(bot.latencies)
+    else:
+        latencies = {0: bot.latency}
+    games_per_shard: Dict[int, int] = {}
+    for shard_id in running_game_shards.values():
+        games_per_shard[shard_id] = games_per_shard.get(shard_id, 0) + 1
+    return shard_stats.snapshot(latencies, games_per_shard)
+
+async def publish_worker_status():
+    """Periodically broadcast this worker's status"""
+    while True:
+        try:
+            await event_channel.publish("worker_status", build_worker_status())
+        except Exception as e:
+            logger.error(f"Error publishing worker status: {e}")
+        await asyncio.sleep(WORKER_STATUS_INTERVAL)
+
+@api_router.get("/workers")
+async def get_workers():
+    # Drop workers that stopped reporting
+    cutoff = datetime.utcnow() - timedelta(seconds=WORKER_STATUS_INTERVAL * 3)
+    return [
+        status for status in worker_statuses.values()
+        if datetime.fromisoformat(status["updated_at"]) >= cutoff
+    ]
+
+@api_router.get("/shards")
+async def get_shards():
+    cutoff = datetime.utcnow() - timedelta(seconds=WORKER_STATUS_INTERVAL * 3)
+    shards = []
+    for status in worker_statuses.values():
+        if datetime.fromisoformat(status["updated_at"]) < cutoff:
+            continue
+        for shard in status.get("shards", []):
+            shards.append({**shard, "process_id": status["process_id"]})
+    return sorted(shards, key=lambda shard: shard["shard_id"])
+
+async def ensure_indexes():
+    """Create the indexes behind the hot queries"""
+    try:
+        await db.games.create_index("id", unique=True)
+        await db.games.create_index("message_id")
+        await db.players.create_index("id", unique=True)
+        await db.players.create_index("discord_id")
+        await db.players.create_index([("current_game_id", 1), ("is_alive", 1)])
+        await db.players.create_index([("rating", -1)])
+        await lobby_members.ensure_indexes()
+        await tournament_manager.ensure_indexes()
+        await db.game_actions.create_index([("game_id", 1), ("timestamp", 1)])
+        await db.match_results.create_index("game_id", unique=True)
+        await db.games.create_index([("guild_id", 1), ("_id", 1)])
+        await db.game_actions.create_index([("guild_id", 1), ("_id", 1)])
+        await db.match_results.create_index("ended_at")
+        await guild_settings.ensure_indexes()
+        await season_manager.ensure_indexes()
+        await archiver.ensure_indexes()
+        await image_renderer.ensure_indexes()
+        if rate_limit_store is not None:
+            await ensure_rate_limit_indexes(rate_limit_store)
+        await db.game_actions.create_index([("action_type", 1), ("timestamp", 1)])
+        await db.player_matches.create_index([("player_id", 1), ("ended_at", -1), ("game_id", -1)])
+        await lease_manager.ensure_indexes()
+    except Exception as e:
+        logger.error(f"Error creating indexes: {e}")
+
 # Start Discord bot in background
 async def start_bot():
     try:
@@ -597,13 +1856,74 @@ async def start_bot():
     except Exception as e:
         logger.error(f"Error starting Discord bot: {e}")
 
+# Keep references to background tasks so they aren't garbage collected
+background_tasks = set()
+lease_task: Optional[asyncio.Task] = None
+
+def spawn_background(coro) -> asyncio.Task:
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
+
+def start_bot_services():
+    """Start the Discord bot and the game engine in this process"""
+    spawn_background(start_bot())
+    spawn_background(publish_worker_status())
+    # Due matches wait in their queues, like the enqueue path refuses new ones, while the arena is full
+    spawn_background(matchmaker.run(can_match=lambda: not admission["games"].saturated))
+
 # Background task to start bot
 @app.on_event("startup")
 async def startup_event():
-    asyncio.create_task(start_bot())
+    spawn_background(ensure_indexes())
+    spawn_background(event_channel.run())
+    spawn_background(guild_settings.watch())
+    spawn_background(season_manager.run())
+    spawn_background(analytics.run())
+    spawn_background(archiver.run())
+    if SERVICE_ROLE == "all":
+        start_bot_services()
+    elif SERVICE_ROLE != "api":
+        logger.warning(f"SERVICE_ROLE={SERVICE_ROLE} is served by bot_worker.py, not uvicorn")
 
 # Include the router in the main app
 app.include_router(api_router)
+app.include_router(ops_router)
+
+# Probes scraped by our own infrastructure aren't rate limited, and neither are rendered banners:
+# Discord's media proxy fetches those for every embed from a handful of IPs, and they are immutable
+RATE_LIMIT_EXEMPT = {"/api/metrics", "/api/ready"}
+RATE_LIMIT_EXEMPT_PREFIXES = ("/api/images/",)
+TRUST_PROXY_HEADERS = os.environ.get('TRUST_PROXY_HEADERS', '').lower() in ('1', 'true', 'yes')
+
+def client_ip(request: Request) -> str:
+    if TRUST_PROXY_HEADERS:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+# Registered before CORS so that 429 responses still carry CORS headers
+@app.middleware("http")
+async def rate_limit_requests(request: Request, call_next):
+    path = request.url.path
+    if RATE_LIMITING and path not in RATE_LIMIT_EXEMPT and not path.startswith(RATE_LIMIT_EXEMPT_PREFIXES):
+        if path == "/api/generate_image":
+            names = ["api", "generate_image"]
+        elif path.startswith("/api/games/") and path.endswith("/live"):
+            names = ["live"]
+        else:
+            names = ["api"]
+        for name in names:
+            retry_after = await rate_limit(name, f"ip:{client_ip(request)}")
+            if retry_after:
+                return JSONResponse(
+                    {"detail": "Too many requests"},
+                    status_code=429,
+                    headers={"Retry-After": str(math.ceil(retry_after))}
+                )
+    return await call_next(request)
 
 app.add_middleware(
     CORSMiddleware,
@@ -615,5 +1935,9 @@ app.add_middleware(
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    for task in list(background_tasks):
+        task.cancel()
+    if not bot.is_closed():
+        await bot.close()
+    image_renderer.shutdown()
     client.close()
-    await bot.close()
\ No newline at end of file
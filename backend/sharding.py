@@ -0,0 +1,75 @@
+"""Gateway shard configuration and per-shard bookkeeping"""
+import math
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+
+def parse_shard_ids(value: Optional[str]) -> Optional[List[int]]:
+    """Parse a shard range such as "0-3,8" into a sorted list of shard IDs"""
+    if not value or not value.strip():
+        return None
+    shard_ids = set()
+    for part in value.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        if '-' in part:
+            start, end = (int(bound) for bound in part.split('-', 1))
+            if end < start:
+                raise ValueError(f"Invalid shard range: {part}")
+            shard_ids.update(range(start, end + 1))
+        else:
+            shard_ids.add(int(part))
+    return sorted(shard_ids)
+
+
+def parse_shard_count(value: Optional[str]) -> Optional[int]:
+    """Parse DISCORD_SHARD_COUNT; None means "let Discord pick" or no sharding"""
+    if not value or value.strip().lower() in ('', 'auto'):
+        return None
+    count = int(value)
+    if count < 1:
+        raise ValueError("Shard count must be at least 1")
+    return count
+
+
+def shard_for_guild(guild_id, shard_count: Optional[int]) -> int:
+    """Shard that owns a guild, following Discord's (guild_id >> 22) % num_shards rule"""
+    if not shard_count:
+        return 0
+    return (int(guild_id) >> 22) % shard_count
+
+
+class ShardStats:
+    """Per-shard event and game counters for this process"""
+
+    def __init__(self):
+        self.events: Dict[int, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self.games_started: Dict[int, int] = defaultdict(int)
+
+    def record_event(self, shard_id: Optional[int], kind: str):
+        self.events[shard_id or 0][kind] += 1
+
+    def record_game_started(self, shard_id: Optional[int]):
+        self.games_started[shard_id or 0] += 1
+
+    def snapshot(self, latencies: Dict[int, float], running_games: Dict[int, int]) -> List[dict]:
+        """Summarise every shard known to this process"""
+        shard_ids = set(latencies) | set(self.events) | set(self.games_started) | set(running_games)
+        return [
+            {
+                "shard_id": shard_id,
+                "latency_ms": _latency_ms(latencies.get(shard_id)),
+                "events": dict(self.events.get(shard_id, {})),
+                "games_started": self.games_started.get(shard_id, 0),
+                "running_games": running_games.get(shard_id, 0)
+            }
+            for shard_id in sorted(shard_ids)
+        ]
+
+
+def _latency_ms(latency: Optional[float]) -> Optional[float]:
+    # Shards that haven't heartbeated yet report inf/nan
+    if latency is None or not math.isfinite(latency):
+        return None
+    return round(latency * 1000, 1)
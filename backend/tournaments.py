@@ -0,0 +1,233 @@
+"""Bracketed tournaments: rating-seeded rounds of battle royale matches played concurrently"""
+import asyncio
+import math
+import uuid
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence
+
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from ratings import DEFAULT_RATING
+
+DEFAULT_MATCH_SIZE = 16
+
+
+def seed_groups(player_ids: Sequence[str], match_size: int) -> List[List[str]]:
+    """Split players, strongest first, into as few matches as fit `match_size`.
+
+    Seeds are dealt out in a snake (1..m, then m..1) so every match gets a
+    similar spread of ratings and sizes differ by at most one.
+    """
+    count = math.ceil(len(player_ids) / match_size)
+    groups: List[List[str]] = [[] for _ in range(count)]
+    for seed, player_id in enumerate(player_ids):
+        lap, offset = divmod(seed, count)
+        groups[offset if lap % 2 == 0 else count - 1 - offset].append(player_id)
+    return groups
+
+
+def advancing(results: List[dict], count: int) -> List[str]:
+    """The `count` best finishers of a match: by placement, then kills"""
+    ranked = sorted(results, key=lambda result: (result["placement"], -result["kills"]))
+    return [result["player_id"] for result in ranked[:count]]
+
+
+class TournamentManager:
+    """Runs tournaments out of three collections.
+
+    `tournaments` holds one document per tournament with its current round,
+    `tournament_matches` one per bracket match (linked to the game playing it)
+    and `tournament_entries` one per entrant, which doubles as the standings:
+    every finished match `$inc`s its players' points and kills, so standings
+    are never recomputed from scratch. Each round's matches start together;
+    whichever process records the last result of a round seeds and launches
+    the next one.
+
+    `create_match(tournament, round, player_ids)` creates the game for a
+    bracket match and returns its ID, `start_match(game_id)` starts it, and
+    `on_finished(tournament)` announces the champion.
+    """
+
+    def __init__(self, db, create_match: Callable[[dict, int, List[str]], Awaitable[str]],
+                 start_match: Callable[[str], Awaitable[None]],
+                 on_finished: Optional[Callable[[dict], Awaitable[None]]] = None):
+        self.tournaments = db.tournaments
+        self.matches = db.tournament_matches
+        self.entries = db.tournament_entries
+        self.players = db.players
+        self.create_match = create_match
+        self.start_match = start_match
+        self.on_finished = on_finished
+
+    async def ensure_indexes(self):
+        await self.tournaments.create_index("id", unique=True)
+        await self.tournaments.create_index([("guild_id", 1), ("channel_id", 1), ("status", 1)])
+        await self.matches.create_index("game_id", unique=True)
+        await self.matches.create_index([("tournament_id", 1), ("round", 1)])
+        await self.entries.create_index([("tournament_id", 1), ("player_id", 1)], unique=True)
+        await self.entries.create_index([("tournament_id", 1), ("best_round", -1), ("points", -1), ("kills", -1)])
+
+    async def create(self, guild_id: str, channel_id: str, era: str, created_by: str,
+                     match_size: int = DEFAULT_MATCH_SIZE, advance_per_match: int = 1) -> dict:
+        tournament = {
+            "id": str(uuid.uuid4()),
+            "guild_id": guild_id,
+            "channel_id": channel_id,
+            "era": era,
+            "created_by": created_by,
+            "match_size": match_size,
+            "advance_per_match": advance_per_match,
+            "status": "registration",
+            "round": 0,
+            "entrants": 0,
+            "champion": None,
+            "created_at": datetime.utcnow()
+        }
+        await self.tournaments.insert_one(dict(tournament))
+        return tournament
+
+    async def register(self, tournament_id: str, player: dict) -> bool:
+        """Sign a player up; False if they already were or registration has closed"""
+        try:
+            await self.entries.insert_one({
+                "tournament_id": tournament_id,
+                "player_id": player["id"],
+                "discord_id": player.get("discord_id"),
+                "username": player.get("username"),
+                "points": 0,
+                "kills": 0,
+                "matches": 0,
+                "best_round": 0,
+                "eliminated_round": None
+            })
+        except DuplicateKeyError:
+            return False
+        result = await self.tournaments.update_one(
+            {"id": tournament_id, "status": "registration"},
+            {"$inc": {"entrants": 1}}
+        )
+        if result.modified_count == 0:
+            await self.entries.delete_one({"tournament_id": tournament_id, "player_id": player["id"]})
+            return False
+        return True
+
+    async def start(self, tournament_id: str) -> Optional[dict]:
+        """Close registration and launch the first round; None if it had already started"""
+        tournament = await self.tournaments.find_one_and_update(
+            {"id": tournament_id, "status": "registration", "entrants": {"$gte": 2}},
+            {"$set": {"status": "active", "round": 1, "started_at": datetime.utcnow()}},
+            projection={"_id": 0}
+        )
+        if not tournament:
+            return None
+        tournament.update(status="active", round=1)
+        entries = await self.entries.find({"tournament_id": tournament_id}, {"player_id": 1}).to_list(None)
+        await self.launch_round(tournament, 1, [entry["player_id"] for entry in entries])
+        return tournament
+
+    async def launch_round(self, tournament: dict, round_number: int, player_ids: List[str]):
+        """Seed a round by current rating and start all of its matches at once"""
+        ratings = {
+            player["id"]: player.get("rating", DEFAULT_RATING)
+            for player in await self.players.find({"id": {"$in": player_ids}}, {"id": 1, "rating": 1}).to_list(None)
+        }
+        seeded = sorted(player_ids, key=lambda player_id: ratings.get(player_id, DEFAULT_RATING), reverse=True)
+        groups = seed_groups(seeded, tournament["match_size"])
+
+        await self.entries.update_many(
+            {"tournament_id": tournament["id"], "player_id": {"$in": player_ids}},
+            {"$set": {"best_round": round_number}}
+        )
+        game_ids = []
+        for index, group in enumerate(groups):
+            game_id = await self.create_match(tournament, round_number, group)
+            await self.matches.insert_one({
+                "tournament_id": tournament["id"],
+                "round": round_number,
+                "index": index,
+                "game_id": game_id,
+                "player_ids": group,
+                "status": "active",
+                "advanced": []
+            })
+            game_ids.append(game_id)
+        await asyncio.gather(*(self.start_match(game_id) for game_id in game_ids))
+
+    async def record_result(self, game_data: dict, results: List[dict]):
+        """Apply a finished match to the standings and advance the bracket once its round is complete.
+
+        `results` holds each participant's player_id, placement and kills.
+        """
+        tournament = await self.tournaments.find_one({"id": game_data["tournament_id"]}, {"_id": 0})
+        if not tournament:
+            return
+        advanced = advancing(results, tournament["advance_per_match"])
+        match = await self.matches.find_one_and_update(
+            {"game_id": game_data["id"], "status": "active"},
+            {"$set": {"status": "finished", "advanced": advanced, "finished_at": datetime.utcnow()}}
+        )
+        if not match:
+            return
+        round_number = match["round"]
+
+        requests = []
+        for result in results:
+            update = {"$inc": {"points": len(results) - result["placement"], "kills": result["kills"], "matches": 1}}
+            if result["player_id"] not in advanced:
+                update["$set"] = {"eliminated_round": round_number}
+            requests.append(UpdateOne({"tournament_id": tournament["id"], "player_id": result["player_id"]}, update))
+        if requests:
+            await self.entries.bulk_write(requests, ordered=False)
+
+        if await self.matches.count_documents({"tournament_id": tournament["id"], "round": round_number, "status": "active"}):
+            return
+        await self.advance(tournament, round_number)
+
+    async def advance(self, tournament: dict, round_number: int):
+        matches = await self.matches.find({"tournament_id": tournament["id"], "round": round_number}).to_list(None)
+        advancers = [player_id for match in sorted(matches, key=lambda match: match["index"]) for player_id in match["advanced"]]
+
+        if len(matches) == 1 or len(advancers) < 2:
+            champion = advancers[0] if advancers else None
+            finished = await self.tournaments.find_one_and_update(
+                {"id": tournament["id"], "status": "active", "round": round_number},
+                {"$set": {"status": "finished", "champion": champion, "ended_at": datetime.utcnow()}},
+                projection={"_id": 0}
+            )
+            if not finished:
+                return
+            finished.update(status="finished", champion=champion)
+            if champion:
+                await self.entries.update_one(
+                    {"tournament_id": tournament["id"], "player_id": champion},
+                    {"$set": {"best_round": round_number + 1}}
+                )
+            if self.on_finished:
+                await self.on_finished(finished)
+            return
+
+        # Only the caller that moves the tournament on launches the next round
+        result = await self.tournaments.update_one(
+            {"id": tournament["id"], "status": "active", "round": round_number},
+            {"$set": {"round": round_number + 1}}
+        )
+        if result.modified_count == 0:
+            return
+        await self.launch_round(tournament, round_number + 1, advancers)
+
+    async def standings(self, tournament_id: str, limit: int = 50) -> List[dict]:
+        return await self.entries.find(
+            {"tournament_id": tournament_id},
+            {"_id": 0, "tournament_id": 0}
+        ).sort([("best_round", -1), ("points", -1), ("kills", -1)]).limit(limit).to_list(limit)
+
+    async def bracket(self, tournament_id: str) -> List[List[dict]]:
+        """Matches grouped by round, first round first"""
+        matches = await self.matches.find({"tournament_id": tournament_id}, {"_id": 0, "tournament_id": 0}).sort(
+            [("round", 1), ("index", 1)]
+        ).to_list(None)
+        rounds: Dict[int, List[dict]] = {}
+        for match in matches:
+            rounds.setdefault(match["round"], []).append(match)
+        return [rounds[round_number] for round_number in sorted(rounds)]
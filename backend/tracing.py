@@ -0,0 +1,182 @@
+"""Opt-in per-game tick tracing and an on-demand sampling profiler"""
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+
+class _NoopSpan:
+    """Shared do-nothing span returned while tracing is off"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class TickTrace:
+    """Spans recorded for one tick of one game"""
+    __slots__ = ("game_id", "started_at", "start", "duration", "spans")
+
+    def __init__(self, game_id: str):
+        self.game_id = game_id
+        self.started_at = datetime.utcnow()
+        self.start = time.perf_counter()
+        self.duration = 0.0
+        self.spans: List[list] = []  # [name, offset, duration]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "game_id": self.game_id,
+            "started_at": self.started_at.isoformat(),
+            "duration_ms": round(self.duration * 1000, 2),
+            "spans": [
+                {"name": name, "offset_ms": round(offset * 1000, 2), "duration_ms": round(duration * 1000, 2)}
+                for name, offset, duration in self.spans
+            ]
+        }
+
+
+class _Span:
+    __slots__ = ("trace", "name", "start")
+
+    def __init__(self, trace: TickTrace, name: str):
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter()
+        self.trace.spans.append([self.name, self.start - self.trace.start, end - self.start])
+        return False
+
+
+class _TickScope:
+    __slots__ = ("tracer", "trace", "token")
+
+    def __init__(self, tracer: "Tracer", game_id: str):
+        self.tracer = tracer
+        self.trace = TickTrace(game_id)
+
+    def __enter__(self):
+        self.token = _current_trace.set(self.trace)
+        return self.trace
+
+    def __exit__(self, *exc):
+        _current_trace.reset(self.token)
+        self.trace.duration = time.perf_counter() - self.trace.start
+        self.tracer.recent.append(self.trace)
+        return False
+
+
+_current_trace: ContextVar[Optional[TickTrace]] = ContextVar("current_trace", default=None)
+
+
+class Tracer:
+    """Records the stages of each game tick when enabled.
+
+    While disabled, `tick()` and `span()` hand back a shared no-op context
+    manager, so instrumented code pays one attribute check per call.
+    """
+
+    def __init__(self, enabled: bool = False, keep: int = 1000):
+        self.enabled = enabled
+        self.recent: deque = deque(maxlen=keep)
+
+    def tick(self, game_id: str):
+        """Scope covering one game tick; spans opened inside attach to it"""
+        if not self.enabled:
+            return NOOP_SPAN
+        return _TickScope(self, game_id)
+
+    def span(self, name: str):
+        """Time a stage of the current tick"""
+        if not self.enabled:
+            return NOOP_SPAN
+        trace = _current_trace.get()
+        if trace is None:
+            return NOOP_SPAN
+        return _Span(trace, name)
+
+    def slowest(self, limit: int = 20, game_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        traces = [trace for trace in self.recent if game_id is None or trace.game_id == game_id]
+        traces.sort(key=lambda trace: trace.duration, reverse=True)
+        return [trace.to_dict() for trace in traces[:limit]]
+
+
+class SamplingProfiler:
+    """Samples the event loop thread's stack from a background thread"""
+
+    def __init__(self, interval: float = 0.005, max_depth: int = 40):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.samples: Counter = Counter()
+        self.sample_count = 0
+        self.started_at: Optional[datetime] = None
+        self._target_thread_id: Optional[int] = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval: Optional[float] = None):
+        """Start sampling the calling thread"""
+        if self.running:
+            return
+        if interval:
+            self.interval = interval
+        with self._lock:
+            self.samples.clear()
+            self.sample_count = 0
+        self.started_at = datetime.utcnow()
+        self._target_thread_id = threading.get_ident()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target_thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None and len(stack) < self.max_depth:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{frame.f_lineno})")
+                frame = frame.f_back
+            with self._lock:
+                self.samples[";".join(reversed(stack))] += 1
+                self.sample_count += 1
+
+    def report(self, limit: int = 30) -> Dict[str, Any]:
+        """Most frequently sampled stacks, in collapsed (flame graph) format"""
+        with self._lock:
+            top = self.samples.most_common(limit)
+            sample_count = self.sample_count
+        return {
+            "running": self.running,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "interval_ms": self.interval * 1000,
+            "samples": sample_count,
+            "stacks": [{"stack": stack, "samples": count} for stack, count in top]
+        }
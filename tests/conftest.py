@@ -0,0 +1,26 @@
+"""Regression gate for the hot-path benchmarks in test_hotpaths.py"""
+from pathlib import Path
+
+# Runs saved under this name are the baseline later runs are held to
+BENCHMARK_BASELINE = "baseline"
+# A hot path whose mean is this much slower than in the baseline fails the run
+BENCHMARK_COMPARE_FAIL = "mean:25%"
+
+
+def pytest_configure(config):
+    """Compare benchmark runs against this machine's latest saved baseline, unless told otherwise"""
+    if not config.pluginmanager.hasplugin("benchmark") or config.getoption("benchmark_disable"):
+        return
+    if config.getoption("benchmark_compare") or config.getoption("benchmark_compare_fail"):
+        return
+    from pytest_benchmark.utils import get_machine_id, parse_compare_fail
+
+    storage = config.getoption("benchmark_storage")
+    if "://" in storage and not storage.startswith("file://"):
+        return
+    # Baselines are only comparable on the machine they were recorded on
+    directory = Path(storage.split("://")[-1]) / get_machine_id()
+    baselines = sorted(directory.glob(f"[0-9][0-9][0-9][0-9]_{BENCHMARK_BASELINE}.json"))
+    if baselines:
+        config.option.benchmark_compare = str(baselines[-1].resolve())
+        config.option.benchmark_compare_fail = [parse_compare_fail(BENCHMARK_COMPARE_FAIL)]
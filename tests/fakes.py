@@ -0,0 +1,223 @@
+"""In-process stand-ins for Discord, FAL and Mongo used by the offline harnesses"""
+import asyncio
+import itertools
+import os
+import sys
+from collections import Counter
+from pathlib import Path
+from typing import Optional
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+
+_ids = itertools.count(10 ** 17)
+
+
+def next_id() -> int:
+    """Snowflake-sized unique ID"""
+    return next(_ids)
+
+
+# Mongo
+
+COUNTED_OPERATIONS = {
+    "find", "find_one", "insert_one", "insert_many", "update_one", "update_many", "replace_one",
+    "delete_one", "delete_many", "find_one_and_update", "bulk_write", "aggregate", "count_documents",
+    "distinct", "create_index"
+}
+
+
+class CountingCollection:
+    """Collection proxy counting every Mongo operation issued against it"""
+
+    def __init__(self, collection, counter: Counter):
+        self._collection = collection
+        self._counter = counter
+
+    def __getattr__(self, name):
+        attr = getattr(self._collection, name)
+        if name not in COUNTED_OPERATIONS:
+            return attr
+        counter, key = self._counter, f"{self._collection.name}.{name}"
+
+        def counted(*args, **kwargs):
+            counter[key] += 1
+            return attr(*args, **kwargs)
+
+        return counted
+
+
+class CountingDatabase:
+    def __init__(self, database, counter: Counter):
+        self._database = database
+        self._counter = counter
+        self._collections = {}
+
+    def __getitem__(self, name):
+        collection = self._collections.get(name)
+        if collection is None:
+            collection = self._collections[name] = CountingCollection(self._database[name], self._counter)
+        return collection
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        attr = getattr(self._database, name)
+        if callable(attr):
+            return attr
+        return self[name]
+
+
+def make_counting_client_class(counter: Counter):
+    from mongomock_motor import AsyncMongoMockClient
+
+    class CountingMongoClient(AsyncMongoMockClient):
+        def __getitem__(self, name):
+            return CountingDatabase(super().__getitem__(name), counter)
+
+    return CountingMongoClient
+
+
+# Discord
+
+class FakeAsset:
+    def __init__(self, url: str):
+        self.url = url
+
+
+class FakeUser:
+    def __init__(self, name: Optional[str] = None, bot: bool = False):
+        self.id = next_id()
+        self.display_name = name or f"player{self.id % 100000}"
+        self.display_avatar = FakeAsset(f"https://cdn.example/avatars/{self.id}.png")
+        self.bot = bot
+
+
+class FakeGuild:
+    def __init__(self, shard_id: int = 0):
+        self.id = next_id()
+        self.shard_id = shard_id
+
+
+class FakeMessage:
+    def __init__(self, channel: "FakeChannel", embed=None, **kwargs):
+        self.id = next_id()
+        self.channel = channel
+        self.guild = channel.guild
+        self.embed = embed
+        self.reactions = []
+
+    async def add_reaction(self, emoji):
+        await self.channel.network_delay()
+        self.reactions.append(emoji)
+
+    async def edit(self, embed=None, **kwargs):
+        await self.channel.network_delay()
+        self.embed = embed
+
+
+class FakeChannel:
+    """Text channel recording everything the bot sends"""
+
+    def __init__(self, guild: FakeGuild, latency: float = 0.0):
+        self.id = next_id()
+        self.guild = guild
+        self.latency = latency
+        self.sent = []
+
+    async def network_delay(self):
+        await asyncio.sleep(self.latency)
+
+    async def send(self, content=None, embed=None, **kwargs):
+        await self.network_delay()
+        message = FakeMessage(self, embed=embed)
+        self.sent.append(message)
+        return message
+
+
+class FakeResponse:
+    def __init__(self, interaction: "FakeInteraction"):
+        self.interaction = interaction
+
+    async def send_message(self, content=None, embed=None, **kwargs):
+        message = await self.interaction.channel.send(content, embed=embed, **kwargs)
+        self.interaction.message = message
+
+
+class FakeInteraction:
+    def __init__(self, channel: FakeChannel, user: FakeUser):
+        self.channel = channel
+        self.guild = channel.guild
+        self.user = user
+        self.message: Optional[FakeMessage] = None
+        self.response = FakeResponse(self)
+
+    async def original_response(self):
+        return self.message
+
+
+class FakeReaction:
+    def __init__(self, message: FakeMessage, emoji: str):
+        self.message = message
+        self.emoji = emoji
+
+
+# FAL
+
+class FakeFalHandler:
+    def __init__(self, latency: float, prompt: str):
+        self.latency = latency
+        self.prompt = prompt
+
+    async def get(self):
+        await asyncio.sleep(self.latency)
+        return {"images": [{"url": f"https://fal.example/{abs(hash(self.prompt))}.png"}]}
+
+
+class FakeFal:
+    """Replacement for fal_client.submit_async with a configurable latency"""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.requests = 0
+
+    async def submit_async(self, application, arguments):
+        self.requests += 1
+        return FakeFalHandler(self.latency, arguments["prompt"])
+
+
+# Server
+
+# Mongo operations issued by the server loaded through load_server(), by "collection.operation"
+db_ops: Counter = Counter()
+
+
+def load_server(fal_latency: float = 0.0):
+    """Import backend/server.py wired to mongomock, a fake FAL and instant pacing.
+
+    The server module is a process-wide singleton: the first call imports it,
+    later calls return the same module.
+    """
+    server = sys.modules.get("server")
+    if server is not None:
+        if not isinstance(server.fal_client, FakeFal):
+            raise RuntimeError("server was imported before load_server()")
+        server.fal_client.latency = fal_latency
+        return server
+    import motor.motor_asyncio
+
+    os.environ["MONGO_URL"] = "mongodb://fake"
+    os.environ["DB_NAME"] = "cut_royale_loadtest"
+    os.environ.setdefault("SERVICE_ROLE", "all")
+    # Simulated players hit commands far faster than real ones
+    os.environ.setdefault("RATE_LIMITING", "0")
+    os.environ.setdefault("LOBBY_EDIT_DELAY", "0")
+    os.environ.setdefault("GAME_TICK_INTERVAL", "0-0")
+    os.environ.setdefault("ENCOUNTER_RESPONSE_SECONDS", "0")
+    motor.motor_asyncio.AsyncIOMotorClient = make_counting_client_class(db_ops)
+    if str(BACKEND_DIR) not in sys.path:
+        sys.path.insert(0, str(BACKEND_DIR))
+
+    import server
+
+    server.fal_client = FakeFal(fal_latency)
+    return server
@@ -0,0 +1,196 @@
+"""Offline load test for the bot and API.
+
+Drives start_game, on_reaction_add, start_battle_royale, the game loop and the
+HTTP API against in-process fakes for Discord, FAL and Mongo, then reports
+throughput, Mongo operations per match and latency percentiles:
+
+    python -m tests.loadtest --games 500 --players 10
+
+or a few custom lobbies that start once all their players have joined:
+
+    python -m tests.loadtest --games 2 --players 1000 --lobby-size 1000
+
+mongomock scans collections linearly, so absolute latencies overstate what a
+real indexed Mongo would show; compare runs against each other, not against
+production.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from tests.fakes import FakeChannel, FakeGuild, FakeInteraction, FakeReaction, FakeUser, db_ops, load_server
+
+
+def percentile(samples: List[float], q: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(q / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    return {
+        "count": len(samples),
+        "p50_ms": round(percentile(samples, 50) * 1000, 3),
+        "p99_ms": round(percentile(samples, 99) * 1000, 3),
+        "max_ms": round(max(samples) * 1000, 3) if samples else 0.0,
+        "mean_ms": round(statistics.fmean(samples) * 1000, 3) if samples else 0.0
+    }
+
+
+class LoadTest:
+    def __init__(self, games: int, players: int, guilds: int, discord_latency: float, fal_latency: float,
+                 api_requests: int, lobby_size: Optional[int] = None):
+        self.games = games
+        self.players = players
+        self.lobby_size = lobby_size
+        self.guilds = guilds
+        self.discord_latency = discord_latency
+        self.api_requests = api_requests
+        self.server = load_server(fal_latency=fal_latency)
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.channels: Dict[int, FakeChannel] = {}
+
+    def _timed(self, name: str, func):
+        latencies = self.latencies[name]
+
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                latencies.append(time.perf_counter() - start)
+
+        return wrapper
+
+    @contextmanager
+    def _instrumented(self):
+        """Route the server's channel lookups to the fakes and record per-call latencies"""
+        server = self.server
+        tick_latencies = self.latencies["game_tick"]
+        tick_histogram = server.GAME_TICK_SECONDS
+
+        def observe(value, **labels):
+            tick_latencies.append(value)
+            type(tick_histogram).observe(tick_histogram, value, **labels)
+
+        # Module-level lookups inside server pick these up
+        patches = {
+            "start_battle_royale": self._timed("start_battle_royale", server.start_battle_royale),
+            "get_game_channel": lambda channel_id: self.channels[int(channel_id)]
+        }
+        originals = {name: getattr(server, name) for name in patches}
+        for name, value in patches.items():
+            setattr(server, name, value)
+        tick_histogram.observe = observe
+        try:
+            yield
+        finally:
+            for name, value in originals.items():
+                setattr(server, name, value)
+            del tick_histogram.observe
+
+    async def play_game(self, guild: FakeGuild):
+        server = self.server
+        channel = FakeChannel(guild, latency=self.discord_latency)
+        self.channels[channel.id] = channel
+
+        interaction = FakeInteraction(channel, FakeUser())
+        start = time.perf_counter()
+        await server.start_game.callback(interaction, mode="solo", era="modern", size=self.lobby_size)
+        self.latencies["start_game"].append(time.perf_counter() - start)
+
+        lobby = interaction.message
+        on_reaction_add = self._timed("on_reaction_add", server.on_reaction_add)
+        await asyncio.gather(*(
+            on_reaction_add(FakeReaction(lobby, "🎮"), FakeUser())
+            for _ in range(self.players)
+        ))
+
+    async def hammer_api(self, stop: asyncio.Event):
+        import httpx
+
+        transport = httpx.ASGITransport(app=self.server.app)
+        routes = ["/api/", "/api/games", "/api/players", "/api/metrics"]
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest") as api:
+            sent = 0
+            while sent < self.api_requests and not stop.is_set():
+                for route in routes:
+                    start = time.perf_counter()
+                    response = await api.get(route)
+                    self.latencies[f"GET {route}"].append(time.perf_counter() - start)
+                    if response.status_code != 200:
+                        self.latencies[f"GET {route} errors"].append(0.0)
+                    sent += 1
+
+    async def run(self) -> dict:
+        with self._instrumented():
+            return await self._run()
+
+    async def _run(self) -> dict:
+        server = self.server
+        await server.ensure_indexes()
+        db_ops.clear()
+        games_before = server.GAMES_FINISHED.value()
+        fal_before = server.fal_client.requests
+        guilds = [FakeGuild() for _ in range(self.guilds)]
+
+        started = time.perf_counter()
+        stop_api = asyncio.Event()
+        api_task = asyncio.create_task(self.hammer_api(stop_api))
+        await asyncio.gather(*(self.play_game(guilds[i % len(guilds)]) for i in range(self.games)))
+        lobbies_done = time.perf_counter()
+
+        while server.running_games:
+            await asyncio.gather(*list(server.running_games.values()), return_exceptions=True)
+        finished = time.perf_counter()
+        stop_api.set()
+        await api_task
+
+        ticks = len(self.latencies["game_tick"])
+        games_finished = server.GAMES_FINISHED.value() - games_before
+        engine_seconds = finished - lobbies_done
+        total_ops = sum(db_ops.values())
+        return {
+            "games": self.games,
+            "players_per_game": self.players,
+            "lobby_size": self.lobby_size,
+            "games_finished": games_finished,
+            "wall_seconds": round(finished - started, 3),
+            "lobby_phase_seconds": round(lobbies_done - started, 3),
+            "ticks": ticks,
+            "ticks_per_second": round(ticks / engine_seconds, 1) if engine_seconds else None,
+            "db_ops_total": total_ops,
+            "db_ops_per_match": round(total_ops / games_finished, 1) if games_finished else None,
+            "db_ops_by_call": dict(db_ops.most_common()),
+            "fal_requests": server.fal_client.requests - fal_before,
+            "latency": {name: summarize(samples) for name, samples in sorted(self.latencies.items())}
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--games", type=int, default=100, help="concurrent games")
+    parser.add_argument("--players", type=int, default=10, help="players joining each lobby")
+    parser.add_argument("--guilds", type=int, default=20)
+    parser.add_argument("--discord-latency", type=float, default=0.0, help="seconds per fake Discord request")
+    parser.add_argument("--fal-latency", type=float, default=0.0, help="seconds per fake image generation")
+    parser.add_argument("--api-requests", type=int, default=2000, help="API requests issued during the run")
+    parser.add_argument("--lobby-size", type=int, default=None, help="custom lobby size; the game starts once full")
+    args = parser.parse_args(argv)
+
+    load_test = LoadTest(args.games, args.players, args.guilds, args.discord_latency, args.fal_latency,
+                         args.api_requests, args.lobby_size)
+    report = asyncio.run(load_test.run())
+    print(json.dumps(report, indent=2))
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("mongomock_motor")
+
+from tests.fakes import load_server  # noqa: E402
+
+server = load_server()
+
+from admission import AdmissionController, Limit, Saturated  # noqa: E402
+
+
+async def hold(limit: Limit, release: asyncio.Event, order: list, name: str):
+    async with limit.slot():
+        order.append(name)
+        await release.wait()
+
+
+def test_slots_queue_in_order_then_reject_past_the_queue():
+    rejected = []
+    limit = Limit("images", capacity=1, queue=2, timeout=5, on_reject=rejected.append)
+
+    async def scenario():
+        release, order = asyncio.Event(), []
+        holders = [asyncio.ensure_future(hold(limit, release, order, name)) for name in ("a", "b", "c")]
+        await asyncio.sleep(0)
+        assert (limit.in_flight, limit.waiting, limit.saturated) == (1, 2, True)
+        with pytest.raises(Saturated):
+            async with limit.slot():
+                pass
+        release.set()
+        await asyncio.gather(*holders)
+        return order
+
+    assert asyncio.run(scenario()) == ["a", "b", "c"]
+    assert rejected == ["images"]
+    assert (limit.in_flight, limit.waiting, limit.saturated) == (0, 0, False)
+
+
+def test_a_queued_caller_is_rejected_when_its_wait_times_out():
+    limit = Limit("images", capacity=1, queue=1, timeout=0.01)
+
+    async def scenario():
+        release = asyncio.Event()
+        holder = asyncio.ensure_future(hold(limit, release, [], "a"))
+        await asyncio.sleep(0)
+        with pytest.raises(Saturated):
+            await limit.acquire()
+        assert limit.waiting == 0
+        release.set()
+        await holder
+
+    asyncio.run(scenario())
+    assert limit.in_flight == 0
+
+
+def test_a_cancelled_waiter_gives_up_its_place():
+    limit = Limit("images", capacity=1, queue=2)
+
+    async def scenario():
+        release, order = asyncio.Event(), []
+        first = asyncio.ensure_future(hold(limit, release, order, "a"))
+        cancelled = asyncio.ensure_future(hold(limit, release, order, "b"))
+        last = asyncio.ensure_future(hold(limit, release, order, "c"))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        release.set()
+        await asyncio.gather(first, last)
+        return order
+
+    assert asyncio.run(scenario()) == ["a", "c"]
+    assert limit.in_flight == 0 and limit.waiting == 0
+
+
+def test_backpressure_only_limits_never_reject():
+    limit = Limit("games", capacity=1, queue=0, reject=False)
+
+    async def scenario():
+        release, order = asyncio.Event(), []
+        holders = [asyncio.ensure_future(hold(limit, release, order, name)) for name in "abc"]
+        await asyncio.sleep(0)
+        assert limit.saturated and limit.waiting == 2
+        release.set()
+        await asyncio.gather(*holders)
+        return order
+
+    assert asyncio.run(scenario()) == ["a", "b", "c"]
+
+
+def test_the_process_is_ready_until_any_limit_saturates():
+    games, images = Limit("games", capacity=1), Limit("images", capacity=2)
+    admission = AdmissionController(games, images)
+    assert admission.ready
+    # Work already committed to is counted even past capacity
+    games.take()
+    games.take()
+    snapshot = admission.snapshot()
+    assert not snapshot["ready"] and snapshot["limits"]["games"]["in_flight"] == 2
+    games.release()
+    games.release()
+    assert admission.ready
@@ -0,0 +1,84 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("mongomock_motor")
+
+from tests.fakes import load_server  # noqa: E402
+
+server = load_server()
+
+import analytics  # noqa: E402
+from analytics import Analytics, day_start  # noqa: E402
+
+
+@pytest.fixture
+def windows(monkeypatch):
+    """Record the windows each refresh aggregates; mongomock has no $merge, so the pipeline only matches"""
+    calls = []
+    failures = []
+
+    def pipeline(start, until):
+        calls.append((start, until))
+        if failures:
+            failures.pop()
+            return [{"$unsupported": {}}]
+        return [{"$match": {"ended_at": {"$gte": start, "$lte": until}}}]
+
+    monkeypatch.setattr(analytics, "ROLLUPS", {"test_rollup": ("match_results", pipeline)})
+    asyncio.run(server.db.analytics_state.delete_many({"_id": "test_rollup"}))
+    return calls, failures
+
+
+def state():
+    return asyncio.run(server.db.analytics_state.find_one({"_id": "test_rollup"}))
+
+
+def test_watermark_advances_only_after_the_aggregate_succeeds(windows):
+    calls, failures = windows
+    rollups = Analytics(server.db, settle_seconds=0)
+    failures.append(True)
+
+    with pytest.raises(Exception):
+        asyncio.run(rollups.refresh_rollup("test_rollup"))
+    assert state().get("watermark") is None and state()["locked_until"] is None
+
+    assert asyncio.run(rollups.refresh_rollup("test_rollup"))
+    # The failed window was redone from the same start
+    assert calls[0][0] == calls[1][0] == analytics.EPOCH
+    assert state()["watermark"] == calls[1][1]
+
+
+def test_refresh_recomputes_whole_days_from_the_watermark(windows):
+    calls, _ = windows
+    rollups = Analytics(server.db, settle_seconds=0)
+    watermark = datetime.utcnow().replace(microsecond=0) - timedelta(minutes=5)
+    asyncio.run(server.db.analytics_state.insert_one({"_id": "test_rollup", "watermark": watermark, "locked_until": None}))
+
+    assert asyncio.run(rollups.refresh_rollup("test_rollup"))
+    assert calls == [(day_start(watermark), state()["watermark"])]
+
+
+def test_one_process_at_a_time_until_its_lock_expires(windows):
+    calls, _ = windows
+    here, there = Analytics(server.db, settle_seconds=0), Analytics(server.db, settle_seconds=0)
+    now = datetime.utcnow()
+    asyncio.run(server.db.analytics_state.insert_one({"_id": "test_rollup", "locked_until": now + timedelta(minutes=10)}))
+
+    assert not asyncio.run(there.refresh_rollup("test_rollup"))
+    assert calls == []
+
+    # The lock holder died; once its lock lapses the next process redoes the window
+    asyncio.run(server.db.analytics_state.update_one({"_id": "test_rollup"}, {"$set": {"locked_until": now - timedelta(seconds=1)}}))
+    assert asyncio.run(here.refresh_rollup("test_rollup"))
+    assert len(calls) == 1 and state()["locked_until"] is None
+
+
+def test_rollups_replace_recomputed_days():
+    start, until = datetime(2024, 1, 1), datetime(2024, 1, 2, 12)
+    for build in (analytics.match_rollup_pipeline, analytics.weapon_rollup_pipeline):
+        pipeline = build(start, until)
+        assert pipeline[-1]["$merge"]["whenMatched"] == "replace"
+        window = pipeline[0]["$match"].get("ended_at") or pipeline[0]["$match"]["timestamp"]
+        assert window == {"$gte": start, "$lte": until}
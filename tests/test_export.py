@@ -0,0 +1,81 @@
+import asyncio
+import csv
+import io
+import json
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("mongomock_motor")
+
+from tests.fakes import load_server  # noqa: E402
+
+server = load_server()
+
+from bson import ObjectId  # noqa: E402
+
+from export import ExportError, export_query, stream_export  # noqa: E402
+
+
+def export_db():
+    db = server.client[f"export_{uuid.uuid4().hex}"]
+    players = [
+        {"_id": ObjectId(), "id": f"player-{index}", "username": f"player {index}", "stats": {"kills": index}}
+        for index in range(5)
+    ]
+    asyncio.run(db.players.insert_many(players))
+    return db
+
+
+def export(db, format: str, **filters) -> list:
+    async def collect():
+        return [chunk async for chunk in stream_export(db, "players", format, batch_size=2, **filters)]
+    return asyncio.run(collect())
+
+
+def test_an_interrupted_ndjson_export_resumes_after_the_last_id():
+    db = export_db()
+    chunks = export(db, "ndjson")
+    # One chunk per cursor batch
+    assert [chunk.count("\n") for chunk in chunks] == [2, 2, 1]
+    full = "".join(chunks).splitlines()
+
+    written = full[:3]
+    resumed = "".join(export(db, "ndjson", after=json.loads(written[-1])["_id"])).splitlines()
+    assert written + resumed == full
+    assert [json.loads(line)["stats"]["kills"] for line in full] == [0, 1, 2, 3, 4]
+
+
+def test_an_interrupted_csv_export_appends_without_a_second_header():
+    db = export_db()
+    full = list(csv.reader(io.StringIO("".join(export(db, "csv")))))
+    header, rows = full[0], full[1:]
+    assert header[:4] == ["_id", "id", "discord_id", "username"] and len(rows) == 5
+    assert rows[0][header.index("stats.kills")] == "0"
+
+    written = full[:3]
+    resumed = list(csv.reader(io.StringIO("".join(export(db, "csv", after=written[-1][0])))))
+    assert written + resumed == full
+
+
+def test_time_ranges_and_cursors_become_id_ranges():
+    since, until = datetime(2024, 1, 1), datetime(2024, 2, 1)
+    query = export_query("games", since=since, until=until, guild_id="guild-1")
+    assert query == {"_id": {"$gte": ObjectId.from_datetime(since), "$lt": ObjectId.from_datetime(until)},
+                     "guild_id": "guild-1"}
+
+    # A cursor past the start of the range replaces it; one before it is ignored
+    after = ObjectId.from_datetime(since + timedelta(days=1))
+    assert export_query("games", since=since, after=str(after))["_id"] == {"$gt": after}
+    before = ObjectId.from_datetime(since - timedelta(days=1))
+    assert export_query("games", since=since, after=str(before))["_id"] == {"$gte": ObjectId.from_datetime(since)}
+
+
+def test_bad_export_requests_are_rejected():
+    for kwargs in ({"collection": "secrets"}, {"collection": "players", "guild_id": "guild-1"},
+                   {"collection": "games", "after": "not-an-id"}):
+        with pytest.raises(ExportError):
+            export_query(**kwargs)
+    with pytest.raises(ExportError):
+        export(export_db(), "xml")
@@ -0,0 +1,32 @@
+import asyncio
+import uuid
+
+import pytest
+
+pytest.importorskip("mongomock_motor")
+
+from tests.fakes import load_server  # noqa: E402
+
+server = load_server()
+
+from guild_settings import GuildSettingsCache  # noqa: E402
+
+
+def test_guild_settings_changes_reach_other_processes():
+    collection = server.db[f"guild_settings_{uuid.uuid4().hex}"]
+    defaults = {"min_players": 10, "kill_digest": False}
+    here, there = GuildSettingsCache(collection, defaults, poll_seconds=0.2), GuildSettingsCache(collection, defaults)
+
+    async def change():
+        assert (await here.get("guild-1"))["min_players"] == 10
+        poller = asyncio.create_task(here._poll())
+        await asyncio.sleep(0.05)
+        await there.update("guild-1", {"min_players": 3})
+        stale = (await here.get("guild-1"))["min_players"]
+        await asyncio.sleep(0.3)
+        poller.cancel()
+        return stale, (await here.get("guild-1"))["min_players"]
+
+    stale, fresh = asyncio.run(change())
+
+    assert (stale, fresh) == (10, 3)
@@ -0,0 +1,278 @@
+"""Micro-benchmarks for the engine's pure hot paths.
+
+Save a baseline once, on the machine that will run the benchmarks:
+
+    pytest tests/test_hotpaths.py --benchmark-only --benchmark-save=baseline
+
+From then on every run that benchmarks is compared against the latest saved
+baseline and fails if a hot path slowed down by more than the threshold in
+conftest.py (mean:25%). Pass --benchmark-compare or --benchmark-compare-fail
+to compare differently. Baselines live under .benchmarks/ and are machine
+specific, so they are not committed.
+"""
+import random
+import uuid
+from datetime import datetime
+from typing import Dict, Optional
+
+import pytest
+from pydantic import BaseModel, Field
+
+pytest.importorskip("pytest_benchmark")
+pytest.importorskip("mongomock_motor")
+
+from tests.fakes import load_server  # noqa: E402
+
+server = load_server()
+
+
+def make_player(index: int) -> dict:
+    return {
+        "id": f"player-{index}",
+        "discord_id": str(10 ** 17 + index),
+        "username": f"player{index}",
+        "stats": {
+            "kills": random.randint(0, 500),
+            "deaths": random.randint(0, 500),
+            "wins": random.randint(0, 50),
+            "games_played": random.randint(0, 200),
+            "damage_dealt": 0
+        }
+    }
+
+
+@pytest.fixture(scope="module")
+def players():
+    random.seed(1234)
+    return [make_player(index) for index in range(100)]
+
+
+@pytest.fixture(scope="module")
+def many_players():
+    random.seed(5678)
+    return [make_player(index) for index in range(10_000)]
+
+
+def match_state(players) -> "server.MatchState":
+    return server.MatchState("game-1", server.datetime.utcnow(), players)
+
+
+@pytest.mark.parametrize("size", [100, 1_000, 10_000])
+def test_pick_encounters(benchmark, many_players, size):
+    state = match_state(many_players[:size])
+    encounters = benchmark(server.pick_encounters, state)
+    picked = [player["id"] for pair in encounters for player in pair]
+    assert len(encounters) == server.encounters_per_tick(size)
+    assert len(set(picked)) == len(picked)
+
+
+@pytest.mark.parametrize("size", [1_000, 10_000])
+def test_record_kill(benchmark, many_players, size):
+    def setup():
+        state = match_state(many_players[:size])
+        (killer, victim), = state.pick_encounters(1)
+        return (state, killer.player_id, victim.player_id), {}
+
+    def kill(state, killer_id, victim_id):
+        state.record_kill(killer_id, victim_id)
+        return state
+
+    state = benchmark.pedantic(kill, setup=setup, rounds=20)
+    assert state.alive == size - 1
+
+
+def test_resolve_encounter(benchmark, players):
+    state = server.MatchState("game-1", server.datetime.utcnow(), players[:2], server.WEAPON_TABLES["modern"])
+    state.record_loot(players[0]["id"], "sniper rifle")
+    winner, loser, weapon, damage, damage_taken = benchmark(server.resolve_encounter, state, players[0], players[1])
+    assert {winner["id"], loser["id"]} == {players[0]["id"], players[1]["id"]}
+    assert weapon in ("sniper rifle", "fists")
+    assert damage == 100 and 0 <= damage_taken < 100
+
+
+def test_resolve_encounter_without_match_state_is_random(players):
+    random.seed(99)
+    winners = [server.resolve_encounter(None, players[0], players[1])[0]["id"] for _ in range(1000)]
+    assert 500 < winners.count(players[0]["id"]) < 700
+
+
+def test_combat_and_loot_allocate_nothing(many_players):
+    import tracemalloc
+
+    state = server.MatchState("game-1", server.datetime.utcnow(), many_players, server.WEAPON_TABLES["wild_west"])
+    armory, table = state.armory, state.armory.table
+    rng = random.Random(42)
+
+    def rounds(count):
+        for _ in range(count):
+            attacker, defender = rng.randrange(len(many_players)), rng.randrange(len(many_players))
+            armory.scavenge(attacker, table.roll(rng))
+            winner, loser, _, _, damage_taken = armory.fight(attacker, defender, rng)
+            armory.apply(winner, loser, damage_taken)
+            armory.health[loser] = 100  # Keep everyone fighting
+
+    rounds(1000)
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    rounds(10_000)
+    grown = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    assert grown < 1024
+    assert sum(state.armory.best) > 0
+
+
+@pytest.mark.parametrize("size", [1_000, 10_000])
+def test_scavenge(benchmark, many_players, size):
+    state = server.MatchState("game-1", server.datetime.utcnow(), many_players[:size], server.WEAPON_TABLES["medieval"])
+    found = benchmark(state.scavenge, server.encounters_per_tick(size))
+    assert all(weapon in server.ERAS["medieval"]["weapons"] for _, weapon in found)
+
+
+def test_live_snapshot(benchmark, many_players):
+    state = match_state(many_players)
+    rng = random.Random(7)
+    for _ in range(5_000):
+        (killer, victim), = state.pick_encounters(1, rng)
+        state.record_kill(killer.player_id, victim.player_id)
+    game_data = {"channel_id": "1", "guild_id": "1", "era": "modern", "mode": "solo"}
+    snapshot = benchmark(server.build_live_snapshot, game_data, state, 1)
+    leaders = sorted(state.players.values(), key=lambda result: result.kills, reverse=True)
+    assert [leader["kills"] for leader in snapshot["top_killers"]] == [result.kills for result in leaders[:5]]
+    assert snapshot["alive"] == 5_000
+
+
+def test_serve_live_status(benchmark):
+    board = server.LiveBoard()
+    board.publish({"game_id": "game-1", "channel_id": "1", "alive": 10})
+    assert benchmark(board.body, "game-1") == b'{"game_id": "game-1", "channel_id": "1", "alive": 10}'
+
+
+def test_kill_handling(benchmark, players):
+    winner, loser = players[0], players[1]
+
+    def handle():
+        kill_msg = server.kill_message(winner, loser)
+        embed = server.build_kill_embed(kill_msg, "https://fal.example/kill.png", 42)
+        action = server.GameAction(
+            game_id="game-1",
+            player_id=winner["id"],
+            action_type="kill",
+            target_player_id=loser["id"],
+            description=kill_msg
+        )
+        return embed, action.to_document()
+
+    embed, action = benchmark(handle)
+    assert action["target_player_id"] == loser["id"]
+    assert embed.fields[0].value == "42"
+
+
+class PydanticGameAction(BaseModel):
+    """The kill/loot action model as it was before records.py, for comparison"""
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    game_id: str
+    guild_id: Optional[str] = None
+    player_id: str
+    action_type: str
+    target_player_id: Optional[str] = None
+    weapon: Optional[str] = None
+    damage: Optional[int] = None
+    damage_taken: Optional[int] = None
+    description: str
+    timestamp: datetime = Field(default_factory=datetime.utcnow)
+    expires_at: Optional[datetime] = None
+
+
+class PydanticPlayer(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    discord_id: str
+    username: str
+    avatar_url: Optional[str] = None
+    stats: Dict[str, int] = Field(default_factory=lambda: {"kills": 0, "deaths": 0, "wins": 0, "games_played": 0, "damage_dealt": 0})
+    current_game_id: Optional[str] = None
+    is_alive: bool = True
+    team_id: Optional[str] = None
+    position: Dict[str, int] = Field(default_factory=lambda: {"x": 0, "y": 0})
+
+
+def kill_action(model):
+    return model(game_id="game-1", guild_id="2", player_id="player-0", action_type="kill", target_player_id="player-1",
+                 weapon="sword", damage=100, damage_taken=35, description="player0 sent player1 to the shadow realm!")
+
+
+def new_player(model):
+    return model(discord_id="100000000000000000", username="player0", avatar_url="https://cdn.example/a.png")
+
+
+# Per-event document construction, old models against the slotted records:
+#     pytest tests/test_hotpaths.py -k document --benchmark-only --benchmark-group-by=func
+@pytest.mark.parametrize("model", ["pydantic", "slotted"])
+def test_action_document(benchmark, model):
+    if model == "pydantic":
+        document = benchmark(lambda: kill_action(PydanticGameAction).dict())
+    else:
+        document = benchmark(lambda: kill_action(server.GameAction).to_document())
+    assert document == {**kill_action(PydanticGameAction).dict(), "id": document["id"], "timestamp": document["timestamp"]}
+
+
+@pytest.mark.parametrize("model", ["pydantic", "slotted"])
+def test_player_document(benchmark, model):
+    if model == "pydantic":
+        document = benchmark(lambda: new_player(PydanticPlayer).dict())
+    else:
+        document = benchmark(lambda: new_player(server.Player).to_document())
+    assert document == {**new_player(PydanticPlayer).dict(), "id": document["id"]}
+
+
+def test_slotted_records_allocate_less():
+    import tracemalloc
+
+    def allocated(build) -> int:
+        tracemalloc.start()
+        events = [build() for _ in range(1000)]
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        assert len(events) == 1000
+        return size
+
+    assert allocated(lambda: kill_action(server.GameAction)) < allocated(lambda: kill_action(PydanticGameAction))
+    assert allocated(lambda: new_player(server.Player)) < allocated(lambda: new_player(PydanticPlayer))
+
+
+def test_build_lobby_embed(benchmark):
+    game = server.Game(channel_id="1", guild_id="2", mode="squad", era="medieval", max_players=100).dict()
+    embed = benchmark(server.build_lobby_embed, game)
+    assert game["id"] in embed.footer.text
+
+
+def test_stat_aggregation(benchmark, players):
+    stats = players[0]["stats"]
+    embed = benchmark(server.build_stats_embed, "player0", stats, "https://cdn.example/a.png")
+    assert len(embed.fields) == 7
+
+
+def test_rank_leaderboard(benchmark, players):
+    ranked = benchmark(server.rank_leaderboard, players)
+    assert len(ranked) == 10
+    assert ranked == sorted(players, key=server.leaderboard_key, reverse=True)[:10]
+
+
+def test_rank_leaderboard_10k(benchmark, many_players):
+    ranked = benchmark(server.rank_leaderboard, many_players)
+    assert server.leaderboard_key(ranked[0]) == max(map(server.leaderboard_key, many_players))
+
+
+def test_render_banner(benchmark, players):
+    pytest.importorskip("PIL")
+    import renderer
+
+    scene = {
+        "era": "medieval",
+        "era_name": server.ERAS["medieval"]["name"],
+        "title": "VICTORY ROYALE",
+        "subtitle": f"{players[0]['username']} is the last one standing",
+        "lines": renderer.scene_lines([{"username": player["username"], "kills": 3} for player in players]),
+        "zone": 0.25
+    }
+    png = benchmark(renderer.render_png, scene)
+    assert png.startswith(b"\x89PNG")
@@ -0,0 +1,108 @@
+import asyncio
+import uuid
+
+import pytest
+
+pytest.importorskip("mongomock_motor")
+
+from tests.fakes import load_server  # noqa: E402
+
+server = load_server()
+
+from pymongo.errors import OperationFailure  # noqa: E402
+
+import bot_worker  # noqa: E402
+from ipc import EventChannel  # noqa: E402
+
+
+def channels():
+    """An API-side and a bot-side channel on one collection; mongomock can't create capped collections"""
+    name = f"process_events_{uuid.uuid4().hex}"
+    api, bot = EventChannel(server.db, "api-1", name=name), EventChannel(server.db, "bot-1", name=name)
+    api._ready = bot._ready = True
+    return api, bot
+
+
+def test_events_reach_subscribers_across_cursor_restarts():
+    api, bot = channels()
+    received = []
+
+    async def record(payload):
+        received.append(payload["n"])
+
+    async def scenario():
+        bot.subscribe("game_status", record)
+        await api.publish("game_status", {"n": 0})
+        consumer = asyncio.ensure_future(bot._run_tailable_cursor())
+        await asyncio.sleep(0.1)
+        await api.publish("game_status", {"n": 1})
+        await api.publish("other", {"n": -1})
+        # The cursor runs dry between these and is reopened after the last event it saw
+        await asyncio.sleep(0.7)
+        await api.publish("game_status", {"n": 2})
+        await asyncio.sleep(0.7)
+        consumer.cancel()
+
+    asyncio.run(scenario())
+    # Events from before the consumer started are not replayed, and none are delivered twice
+    assert received == [1, 2]
+
+
+def test_a_failing_handler_does_not_stop_the_others():
+    _, bot = channels()
+    received = []
+
+    async def broken(payload):
+        raise RuntimeError("boom")
+
+    async def record(payload):
+        received.append(payload)
+
+    bot.subscribe("game_status", broken)
+    bot.subscribe("game_status", record)
+    asyncio.run(bot._dispatch({"kind": "game_status", "payload": {"n": 1}}))
+    assert received == [{"n": 1}]
+
+
+def test_falls_back_to_a_tailable_cursor_without_change_streams(monkeypatch):
+    _, bot = channels()
+
+    async def standalone():
+        raise OperationFailure("The $changeStream stage is only supported on replica sets", code=40573)
+
+    async def scenario():
+        tailing = asyncio.Event()
+
+        async def tail():
+            tailing.set()
+            await asyncio.sleep(3600)
+
+        monkeypatch.setattr(bot, "_run_change_stream", standalone)
+        monkeypatch.setattr(bot, "_run_tailable_cursor", tail)
+        consumer = asyncio.ensure_future(bot.run())
+        await asyncio.wait_for(tailing.wait(), 1)
+        consumer.cancel()
+
+    asyncio.run(scenario())
+
+
+def test_bot_worker_refuses_other_roles_and_serves_ops_routes():
+    assert server.SERVICE_ROLE != "bot"
+    with pytest.raises(SystemExit):
+        asyncio.run(bot_worker.main())
+
+    import httpx
+
+    ops_server = bot_worker.build_ops_server()
+
+    async def fetch():
+        transport = httpx.ASGITransport(app=ops_server.config.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://worker") as ops:
+            return await ops.get("/api/metrics"), await ops.get("/api/")
+
+    metrics, api = asyncio.run(fetch())
+    assert metrics.status_code == 200 and "cutroyale_" in metrics.text
+    # Only operational routes; the public API is served by the API workers
+    assert api.status_code == 404
+    # The worker's own SIGINT/SIGTERM handling stays in charge
+    assert ops_server.install_signal_handlers() is None
@@ -0,0 +1,55 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("mongomock_motor")
+
+from tests.fakes import load_server  # noqa: E402
+
+server = load_server()
+
+from leases import GameLeaseManager  # noqa: E402
+
+
+def leases(collection, owner_id: str) -> GameLeaseManager:
+    return GameLeaseManager(collection, owner_id=owner_id, ttl_seconds=30, heartbeat_seconds=10)
+
+
+def test_starting_a_game_takes_its_lease_in_the_same_update():
+    games = server.db[f"games_{uuid.uuid4().hex}"]
+    here, there = leases(games, "worker-1"), leases(games, "worker-2")
+
+    async def scenario():
+        await games.insert_one({"id": "game-1", "status": "waiting"})
+        assert await here.start("game-1", {"start_time": datetime.utcnow()})
+        assert not await there.start("game-1", {"start_time": datetime.utcnow()})
+        return await games.find_one({"id": "game-1"}), await there.claim_orphans([0])
+
+    game, claimed = asyncio.run(scenario())
+    assert game["status"] == "active" and game["lease"]["owner"] == "worker-1"
+    assert here.owns("game-1") and here.fence("game-1")["lease_epoch"] == game["lease_epoch"] == 1
+    assert claimed == []
+
+
+def test_only_expired_or_old_lease_less_games_are_claimed():
+    games = server.db[f"games_{uuid.uuid4().hex}"]
+    worker = leases(games, "worker-1")
+    now = datetime.utcnow()
+
+    async def scenario():
+        await games.insert_many([
+            {"id": "expired", "status": "active", "start_time": now - timedelta(minutes=5),
+             "lease": {"owner": "dead-worker", "expires_at": now - timedelta(seconds=1)}},
+            {"id": "held", "status": "active", "start_time": now - timedelta(minutes=5),
+             "lease": {"owner": "live-worker", "expires_at": now + timedelta(seconds=20)}},
+            {"id": "legacy", "status": "active", "start_time": now - timedelta(minutes=5)},
+            {"id": "legacy-no-start", "status": "active"},
+            {"id": "just-started", "status": "active", "start_time": now - timedelta(seconds=1)},
+            {"id": "finished", "status": "finished", "start_time": now - timedelta(minutes=5)},
+        ])
+        return await worker.claim_orphans([0])
+
+    claimed = asyncio.run(scenario())
+    assert sorted(game["id"] for game in claimed) == ["expired", "legacy", "legacy-no-start"]
@@ -0,0 +1,230 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("mongomock_motor")
+
+from tests.fakes import FakeChannel, FakeGuild, FakeInteraction, FakeReaction, FakeUser  # noqa: E402
+from tests.loadtest import LoadTest  # noqa: E402
+
+
+def test_load_test_plays_every_game_to_completion():
+    load_test = LoadTest(games=5, players=10, guilds=2, discord_latency=0, fal_latency=0, api_requests=8)
+    report = asyncio.run(load_test.run())
+
+    assert report["games_finished"] == 5
+    # Ten players per lobby: nine eliminations per game
+    assert report["ticks"] >= 5 * 9
+    assert report["db_ops_per_match"] > 0
+    assert report["latency"]["on_reaction_add"]["count"] == 50
+    assert "GET /api/games errors" not in report["latency"]
+
+
+def test_custom_lobby_starts_when_full():
+    load_test = LoadTest(games=1, players=150, guilds=1, discord_latency=0, fal_latency=0, api_requests=0, lobby_size=150)
+    report = asyncio.run(load_test.run())
+
+    assert report["games_finished"] == 1
+    # Several encounters per tick once the lobby is big enough
+    assert report["ticks"] < 149
+    results = asyncio.run(load_test.server.db.match_results.find_one({"player_count": 150}))
+    assert results is not None
+    assert report["db_ops_by_call"]["game_players.insert_one"] == 150
+
+
+def test_tournament_advances_winners_to_a_final():
+    load_test = LoadTest(games=0, players=0, guilds=1, discord_latency=0, fal_latency=0, api_requests=0)
+    server = load_test.server
+
+    async def play():
+        channel = FakeChannel(FakeGuild())
+        load_test.channels[channel.id] = channel
+        host = FakeInteraction(channel, FakeUser())
+        with load_test._instrumented():
+            await server.ensure_indexes()
+            await server.tournament_create.callback(host, era="zombie", match_size=10)
+            signup = host.message
+            await asyncio.gather(*(server.on_reaction_add(FakeReaction(signup, "🏆"), FakeUser()) for _ in range(40)))
+            await server.tournament_start.callback(FakeInteraction(channel, host.user))
+            # Four first-round matches run at once
+            assert len(server.running_games) == 4
+            while server.running_games:
+                await asyncio.gather(*list(server.running_games.values()), return_exceptions=True)
+        tournament = await server.db.tournaments.find_one({})
+        return tournament, await server.tournament_manager.bracket(tournament["id"]), await server.tournament_manager.standings(tournament["id"])
+
+    tournament, rounds, standings = asyncio.run(play())
+
+    assert tournament["status"] == "finished"
+    assert [len(matches) for matches in rounds] == [4, 1]
+    assert sorted(len(match["player_ids"]) for match in rounds[0]) == [10, 10, 10, 10]
+    assert sorted(rounds[1][0]["player_ids"]) == sorted(match["advanced"][0] for match in rounds[0])
+    assert standings[0]["player_id"] == tournament["champion"] == rounds[1][0]["advanced"][0]
+    assert sum(entry["matches"] for entry in standings) == 44
+
+
+def test_live_status_is_served_without_database_reads():
+    import httpx
+
+    from tests.fakes import db_ops
+
+    load_test = LoadTest(games=1, players=10, guilds=1, discord_latency=0, fal_latency=0, api_requests=0)
+    server = load_test.server
+
+    async def fetch(api, game_id, channel):
+        before = sum(db_ops.values())
+        response = await api.get(f"/api/games/{game_id}/live")
+        interaction = FakeInteraction(channel, FakeUser())
+        await server.game_status.callback(interaction)
+        return response, interaction.message.embed, sum(db_ops.values()) - before
+
+    async def play():
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest") as api:
+            with load_test._instrumented():
+                await server.ensure_indexes()
+                await load_test.play_game(FakeGuild())
+                channel = next(iter(load_test.channels.values()))
+                game_id = next(iter(server.running_games))
+                while not server.live_board.get(game_id):
+                    await asyncio.sleep(0)
+                during = await fetch(api, game_id, channel)
+                while server.running_games:
+                    await asyncio.gather(*list(server.running_games.values()), return_exceptions=True)
+                after = await fetch(api, game_id, channel)
+                missing = await api.get("/api/games/unknown/live")
+        return during, after, missing
+
+    (live, live_embed, _), (final, final_embed, final_ops), missing = asyncio.run(play())
+
+    # Mid-game the loop itself is querying too, so only count once it is done
+    assert final_ops == 0
+    assert live.status_code == 200 and live.json()["status"] == "active"
+    assert live.json()["tick"] >= 1 and live.json()["players"] == 10
+    assert final.json()["status"] == "finished" and final.json()["alive"] == 1
+    assert sum(leader["kills"] for leader in final.json()["top_killers"]) <= 9
+    assert final.json()["top_killers"][0]["kills"] == max(leader["kills"] for leader in final.json()["top_killers"])
+    assert "Live" in live_embed.title and "Final" in final_embed.title
+    assert missing.status_code == 404
+
+
+def test_guild_settings_pace_games_per_guild():
+    load_test = LoadTest(games=1, players=4, guilds=1, discord_latency=0, fal_latency=0, api_requests=0)
+    server = load_test.server
+    guild = FakeGuild()
+
+    async def play():
+        await server.guild_settings.update(str(guild.id), {"min_players": 4, "kill_digest": True, "image_source": "none"})
+        fal_before = server.fal_client.requests
+        with load_test._instrumented():
+            await server.ensure_indexes()
+            await load_test.play_game(guild)
+            assert server.running_games  # Started at 4 players rather than 10
+            while server.running_games:
+                await asyncio.gather(*list(server.running_games.values()), return_exceptions=True)
+        return server.fal_client.requests - fal_before
+
+    fal_requests = asyncio.run(play())
+
+    titles = [message.embed.title for channel in load_test.channels.values() for message in channel.sent if message.embed]
+    assert titles.count("💀 ELIMINATIONS!") == 3
+    assert "💀 ELIMINATION!" not in titles
+    assert fal_requests == 0
+
+
+def test_worker_that_loses_its_lease_mid_encounter_records_nothing():
+    load_test = LoadTest(games=1, players=4, guilds=1, discord_latency=0, fal_latency=0, api_requests=0)
+    server = load_test.server
+    guild = FakeGuild()
+
+    async def play():
+        await server.guild_settings.update(str(guild.id), {"min_players": 4, "encounter_response_seconds": 0.2})
+        with load_test._instrumented():
+            await server.ensure_indexes()
+            await load_test.play_game(guild)
+            game_id = next(iter(server.running_games))
+            channel = next(iter(load_test.channels.values()))
+            while not any(message.embed and message.embed.title == "⚔️ ENCOUNTER!" for message in channel.sent):
+                await asyncio.sleep(0.01)
+            # Another worker takes the game over while this one waits for the encounter's answers
+            now = server.datetime.utcnow()
+            await server.db.games.update_one({"id": game_id}, {
+                "$set": {"lease": {"owner": "other-worker", "heartbeat_at": now, "expires_at": now + server.timedelta(seconds=60)}},
+                "$inc": {"lease_epoch": 1}
+            })
+            assert server.lease_manager.owns(game_id)  # Not noticed until the next heartbeat
+            await asyncio.gather(*list(server.running_games.values()), return_exceptions=True)
+        game = await server.db.games.find_one({"id": game_id})
+        kills = await server.db.game_actions.count_documents({"game_id": game_id, "action_type": "kill"})
+        results = await server.db.match_results.find_one({"game_id": game_id})
+        return game, kills, results
+
+    game, kills, results = asyncio.run(play())
+
+    assert kills == 0 and results is None
+    assert game["status"] == "active" and game["alive_players"] == 4
+    assert game["lease"]["owner"] == "other-worker"
+    assert not server.lease_manager.owns(game["id"])
+
+
+def test_a_starting_game_cannot_be_claimed_before_its_roster_is_locked(monkeypatch):
+    load_test = LoadTest(games=1, players=4, guilds=1, discord_latency=0, fal_latency=0, api_requests=0)
+    server = load_test.server
+    guild = FakeGuild()
+    other_worker = server.GameLeaseManager(server.db.games, owner_id="other-worker")
+    claimed = []
+    games = server.db.games
+
+    def claim_right_after_start(method):
+        original = getattr(games, method)
+
+        async def write(query, update, *args, **kwargs):
+            result = await original(query, update, *args, **kwargs)
+            if update.get("$set", {}).get("status") == "active":
+                # Another worker's heartbeat lands right after the game goes active
+                claimed.extend(await other_worker.claim_orphans([0]))
+            return result
+
+        monkeypatch.setattr(games, method, write)
+
+    claim_right_after_start("update_one")
+    claim_right_after_start("find_one_and_update")
+
+    async def play():
+        await server.guild_settings.update(str(guild.id), {"min_players": 4})
+        with load_test._instrumented():
+            await load_test.play_game(guild)
+            game_id = next(iter(server.running_games))
+            await asyncio.gather(*list(server.running_games.values()))
+        return await server.db.games.find_one({"id": game_id})
+
+    game = asyncio.run(play())
+
+    assert claimed == []
+    assert game["status"] == "finished" and game["winner"] is not None and game["current_players"] == 4
+
+
+def test_the_game_loop_starts_even_if_the_start_announcement_fails(monkeypatch):
+    load_test = LoadTest(games=1, players=4, guilds=1, discord_latency=0, fal_latency=0, api_requests=0)
+    server = load_test.server
+    guild = FakeGuild()
+    generate_game_image = server.generate_game_image
+
+    async def broken_start_image(prompt, era, scene=None, guild_id=None):
+        if scene and scene["title"] == "BATTLE ROYALE STARTED":
+            raise RuntimeError("image backend down")
+        return await generate_game_image(prompt, era, scene=scene, guild_id=guild_id)
+
+    monkeypatch.setattr(server, "generate_game_image", broken_start_image)
+
+    async def play():
+        await server.guild_settings.update(str(guild.id), {"min_players": 4})
+        with load_test._instrumented():
+            await load_test.play_game(guild)
+            assert server.running_games
+            await asyncio.gather(*list(server.running_games.values()))
+        return await server.db.games.find_one({"guild_id": str(guild.id)})
+
+    game = asyncio.run(play())
+
+    assert game["status"] == "finished" and "lease" not in game
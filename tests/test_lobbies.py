@@ -0,0 +1,92 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("mongomock_motor")
+
+from tests.fakes import load_server  # noqa: E402
+
+server = load_server()
+
+from lobbies import LobbyMembers  # noqa: E402
+
+
+def lobby() -> LobbyMembers:
+    members = LobbyMembers(server.db[f"game_players_{uuid.uuid4().hex}"], batch_size=2)
+    asyncio.run(members.ensure_indexes())
+    return members
+
+
+async def roster(members: LobbyMembers, game: dict) -> list:
+    return [player_id async for batch in members.batches(game) for player_id in batch]
+
+
+def test_players_join_a_lobby_once():
+    members = lobby()
+
+    async def scenario():
+        assert await members.join("game-1", "a")
+        assert not await members.join("game-1", "a")
+        assert await members.join("game-2", "a")
+        return await members.collection.count_documents({})
+
+    assert asyncio.run(scenario()) == 2
+
+
+def test_the_roster_is_frozen_when_the_game_starts():
+    members = lobby()
+
+    async def scenario():
+        for player_id in "abc":
+            await members.join("game-1", player_id)
+        assert await members.withdraw("game-1", "c")
+        await members.lock("game-1")
+        # A join that lost the race to the start can no longer back out of it
+        late = await members.join("game-1", "d")
+        return late, await members.withdraw("game-1", "a"), await roster(members, {"id": "game-1"})
+
+    late, withdrawn, players = asyncio.run(scenario())
+    assert late and not withdrawn
+    assert sorted(players) == ["a", "b"]
+
+
+def test_batches_stream_the_roster_and_legacy_player_lists():
+    members = lobby()
+
+    async def scenario():
+        await members.add_many("game-1", ["a", "b", "c", "d", "e"])
+        batches = [batch async for batch in members.batches({"id": "game-1"})]
+        legacy = [batch async for batch in members.batches({"id": "game-2", "players": ["x", "y", "z"]})]
+        return batches, legacy
+
+    batches, legacy = asyncio.run(scenario())
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+    assert legacy == [["x", "y"], ["z"]]
+
+
+def test_remove_game_drops_only_that_roster():
+    members = lobby()
+
+    async def scenario():
+        await members.add_many("game-1", ["a", "b"])
+        await members.add_many("game-2", ["a"])
+        await members.remove_game("game-1")
+        return await roster(members, {"id": "game-1"}), await roster(members, {"id": "game-2"})
+
+    assert asyncio.run(scenario()) == ([], ["a"])
+
+
+def test_archiving_a_game_drops_its_roster():
+    game_id = f"game-{uuid.uuid4().hex}"
+
+    async def scenario():
+        await server.lobby_members.add_many(game_id, ["a", "b"])
+        await server.archiver.archive_game({
+            "id": game_id, "guild_id": "guild-1", "status": "finished",
+            "start_time": datetime.utcnow() - timedelta(minutes=5), "end_time": datetime.utcnow()
+        })
+        return await server.db.game_players.count_documents({"game_id": game_id})
+
+    assert asyncio.run(scenario()) == 0
@@ -0,0 +1,58 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("mongomock_motor")
+
+from tests.fakes import load_server  # noqa: E402
+
+server = load_server()
+
+from fastapi import HTTPException  # noqa: E402
+
+from engine import MatchState  # noqa: E402
+
+
+def test_history_rows_hold_one_row_per_participant():
+    started = datetime(2024, 1, 1, 12)
+    state = MatchState("game-1", started, [{"id": "a"}, {"id": "b"}, {"id": "c"}])
+    state.record_kill("a", "b", at=started + timedelta(seconds=30))
+    state.finish("a", at=started + timedelta(seconds=60))
+
+    rows = {row["player_id"]: row for row in state.history_rows({"mode": "solo", "era": "modern"})}
+    assert rows["a"] == {
+        "player_id": "a", "game_id": "game-1", "ended_at": started + timedelta(seconds=60),
+        "placement": 1, "kills": 1, "player_count": 3, "mode": "solo", "era": "modern"
+    }
+    assert rows["b"]["placement"] == 3 and rows["b"]["kills"] == 0
+
+
+def test_match_history_pages_newest_first_without_gaps_or_repeats():
+    player_id = str(uuid.uuid4())
+    ended = datetime(2024, 1, 1)
+    # Two matches ending at the same moment are ordered by game id
+    rows = [
+        {"player_id": player_id, "game_id": game_id, "ended_at": ended + timedelta(minutes=minutes), "placement": 1}
+        for game_id, minutes in (("g1", 0), ("g2", 5), ("g3", 5), ("g4", 10), ("g5", 20))
+    ]
+
+    async def scenario():
+        await server.db.player_matches.insert_many([dict(row) for row in rows])
+        await server.db.player_matches.insert_one({"player_id": "someone-else", "game_id": "g9", "ended_at": ended})
+        pages, before = [], None
+        while True:
+            page = await server.get_player_matches(player_id, limit=2, before=before)
+            pages.append([match["game_id"] for match in page["matches"]])
+            before = page["next"]
+            if before is None:
+                return pages
+
+    assert asyncio.run(scenario()) == [["g5", "g4"], ["g3", "g2"], ["g1"]]
+
+
+def test_match_history_rejects_a_malformed_cursor():
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(server.get_player_matches("player-1", before="not-a-cursor"))
+    assert error.value.status_code == 400
@@ -0,0 +1,130 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("mongomock_motor")
+
+from tests.fakes import FakeChannel, FakeGuild, FakeInteraction, FakeUser, load_server  # noqa: E402
+
+server = load_server()
+
+from matchmaking import Matchmaker, QueueEntry  # noqa: E402
+
+
+def entry(discord_id: str, joined_at: float) -> QueueEntry:
+    queued = QueueEntry(discord_id, discord_id, None, "channel-1")
+    queued.joined_at = joined_at
+    return queued
+
+
+def matchmaker(capacity: int = 3, **kwargs) -> Matchmaker:
+    async def on_match(key, entries):
+        pass
+    return Matchmaker(capacity_for=lambda mode: capacity, on_match=on_match, max_wait_seconds=10, **kwargs)
+
+
+def test_a_full_bucket_forms_a_match_in_join_order():
+    queues = matchmaker()
+    solo, duo = queues.bucket_key("g", "c1", "solo", "modern"), queues.bucket_key("g", "c2", "duo", "modern")
+    assert queues.join(solo, entry("a", 0)) is None
+    assert queues.join(duo, entry("x", 0)) is None
+    assert queues.join(solo, entry("b", 1)) is None
+
+    match = queues.join(solo, entry("c", 2))
+    assert [queued.discord_id for queued in match] == ["a", "b", "c"]
+    assert queues.queue_size(solo) == 0 and queues.queued_bucket("a") is None
+    assert queues.queue_size(duo) == 1
+
+
+def test_buckets_split_by_channel_and_rating_band():
+    pooled, per_channel = matchmaker(), matchmaker(cross_channel=False)
+    assert pooled.bucket_key("g", "c1", "solo", "modern") == pooled.bucket_key("g", "c2", "solo", "modern")
+    assert per_channel.bucket_key("g", "c1", "solo", "modern") != per_channel.bucket_key("g", "c2", "solo", "modern")
+    assert pooled.bucket_key("g", "c1", "solo", "modern", 10) != pooled.bucket_key("g", "c1", "solo", "modern", 11)
+
+
+def test_players_queue_once_and_can_leave():
+    queues = matchmaker()
+    key = queues.bucket_key("g", "c", "solo", "modern")
+    queues.join(key, entry("a", 0))
+    with pytest.raises(ValueError):
+        queues.join(key, entry("a", 1))
+
+    assert queues.leave("a")
+    assert not queues.leave("a")
+    assert queues.queue_size(key) == 0 and key not in queues.buckets
+
+
+def test_past_the_deadline_a_short_match_forms():
+    queues = matchmaker(capacity=10)
+    key = queues.bucket_key("g", "c", "solo", "modern")
+    queues.join(key, entry("a", 0))
+    queues.join(key, entry("b", 5))
+    assert queues.due_matches(now=9) == []
+
+    [(formed, match)] = queues.due_matches(now=10)
+    assert formed == key and [queued.discord_id for queued in match] == ["a", "b"]
+
+
+def test_a_lone_player_keeps_waiting_past_the_deadline():
+    queues = matchmaker(capacity=10)
+    key = queues.bucket_key("g", "c", "solo", "modern")
+    queues.join(key, entry("a", 0))
+    assert queues.due_matches(now=10) == []
+    assert queues.queue_size(key) == 1
+    assert queues._deadlines == [(20, key)]
+
+
+def test_a_join_after_the_deadline_forms_the_match_at_once():
+    queues = matchmaker(capacity=10)
+    key = queues.bucket_key("g", "c", "solo", "modern")
+    queues.join(key, entry("a", 0))
+    match = queues.join(key, entry("b", 15))
+    assert [queued.discord_id for queued in match] == ["a", "b"]
+
+
+def test_the_deadline_moves_with_the_oldest_player_left():
+    queues = matchmaker(capacity=10)
+    key = queues.bucket_key("g", "c", "solo", "modern")
+    queues.join(key, entry("a", 0))
+    queues.join(key, entry("b", 5))
+    queues.join(key, entry("c", 6))
+    queues.leave("a")
+
+    # a's deadline is stale now; b's applies
+    assert queues.due_matches(now=10) == []
+    [(_, match)] = queues.due_matches(now=15)
+    assert [queued.discord_id for queued in match] == ["b", "c"]
+
+
+def test_the_sweeper_holds_due_matches_while_the_arena_is_full():
+    launched = []
+
+    async def on_match(key, entries):
+        launched.append([queued.discord_id for queued in entries])
+
+    async def sweep(full: bool):
+        queues = Matchmaker(capacity_for=lambda mode: 10, on_match=on_match, max_wait_seconds=10)
+        key = queues.bucket_key("g", "c", "solo", "modern")
+        # Both joined long ago, so their deadline has passed
+        queues.join(key, entry("a", -100))
+        queues.join(key, entry("b", -100))
+        task = asyncio.ensure_future(queues.run(interval=0.01, can_match=lambda: not full))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        return queues.queue_size(key)
+
+    assert asyncio.run(sweep(full=True)) == 2 and launched == []
+    assert asyncio.run(sweep(full=False)) == 0 and launched == [["a", "b"]]
+
+
+def test_players_in_a_game_cannot_queue():
+    async def scenario():
+        interaction = FakeInteraction(FakeChannel(FakeGuild()), FakeUser())
+        await server.db.players.insert_one({
+            "id": "busy-player", "discord_id": str(interaction.user.id), "current_game_id": "game-1"
+        })
+        await server.queue.callback(interaction, mode="solo", era="modern")
+        return server.matchmaker.queued_bucket(str(interaction.user.id))
+
+    assert asyncio.run(scenario()) is None
@@ -0,0 +1,66 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("mongomock_motor")
+
+from tests.fakes import load_server  # noqa: E402
+
+server = load_server()
+
+from metrics import Registry  # noqa: E402
+
+
+def test_histogram_buckets_are_cumulative_with_inf_sum_and_count():
+    registry = Registry()
+    latency = registry.histogram("db_seconds", "Mongo latency", ["site"], buckets=(0.1, 0.5, 1))
+    for value in (0.05, 0.1, 0.3, 2):
+        latency.observe(value, site="find")
+
+    assert registry.render().splitlines() == [
+        "# HELP db_seconds Mongo latency",
+        "# TYPE db_seconds histogram",
+        'db_seconds_bucket{site="find",le="0.1"} 2',
+        'db_seconds_bucket{site="find",le="0.5"} 3',
+        'db_seconds_bucket{site="find",le="1"} 3',
+        'db_seconds_bucket{site="find",le="+Inf"} 4',
+        'db_seconds_sum{site="find"} 2.45',
+        'db_seconds_count{site="find"} 4',
+    ]
+    assert latency.count(site="find") == 4 and latency.count(site="insert") == 0
+
+
+def test_histogram_timers_observe_blocks_and_coroutines():
+    latency = Registry().histogram("tick_seconds", "Tick latency", buckets=(60,))
+
+    with latency.time():
+        pass
+
+    @latency.time()
+    async def tick():
+        return "done"
+
+    assert asyncio.run(tick()) == "done"
+    assert latency.count() == 2
+
+
+def test_counters_and_gauges_render_per_label_set():
+    registry = Registry()
+    commands = registry.counter("commands_total", "Commands", ["command"])
+    commands.inc(command="queue")
+    commands.inc(2, command="queue")
+    registry.gauge("games_running", "Running games", callback=lambda: 7)
+    with pytest.raises(ValueError):
+        commands.inc(shard="0")
+    with pytest.raises(ValueError):
+        registry.counter("commands_total", "Again")
+
+    lines = registry.render().splitlines()
+    assert 'commands_total{command="queue"} 3' in lines
+    assert "games_running 7" in lines
+
+
+def test_label_values_are_escaped():
+    errors = Registry().counter("errors_total", "Errors", ["message"])
+    errors.inc(message='bad "quote"\nnext')
+    assert errors.render()[-1] == 'errors_total{message="bad \\"quote\\"\\nnext"} 1'
@@ -0,0 +1,140 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("mongomock_motor")
+
+from tests.fakes import FakeChannel, FakeGuild, FakeInteraction, FakeUser, load_server  # noqa: E402
+
+server = load_server()
+
+import ratelimit  # noqa: E402
+from ratelimit import RateLimiter, TokenBucket  # noqa: E402
+
+
+def test_bucket_allows_a_burst_then_waits_for_refill():
+    bucket = TokenBucket(rate=2, burst=3)
+
+    assert [bucket.take("user", now=100.0) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.take("user", now=100.0) == pytest.approx(0.5)
+    # Other keys have their own bucket
+    assert bucket.take("other", now=100.0) == 0.0
+
+
+def test_bucket_refills_at_its_rate_up_to_the_burst():
+    bucket = TokenBucket(rate=2, burst=3)
+    for _ in range(3):
+        bucket.take("user", now=100.0)
+
+    assert bucket.take("user", now=100.5) == 0.0
+    assert bucket.take("user", now=100.5) == pytest.approx(0.5)
+    # A long pause refills only up to the burst
+    assert [bucket.take("user", now=200.0) for _ in range(4)][-1] == pytest.approx(0.5)
+
+
+def test_bucket_forgets_refilled_keys_past_max_keys():
+    bucket = TokenBucket(rate=1, burst=1, max_keys=10)
+    for index in range(10):
+        bucket.take(f"idle-{index}", now=0.0)
+    bucket.take("active", now=100.0)
+
+    assert len(bucket._buckets) == 1
+
+
+def test_shared_limit_counts_hits_from_every_process(monkeypatch):
+    monkeypatch.setattr(ratelimit.time, "time", lambda: 1_000_000.0)
+    collection = server.db.rate_limits_test
+    # Two processes, each with its own local buckets, sharing one window of 3
+    here, there = (RateLimiter("queue", rate=0.001, burst=3, shared=collection) for _ in range(2))
+
+    async def hits():
+        return [await here.hit("user-1") for _ in range(2)] + [await there.hit("user-1") for _ in range(2)]
+
+    results = asyncio.run(hits())
+
+    assert results[:3] == [0.0, 0.0, 0.0]
+    assert results[3] == pytest.approx(3000 - 1_000_000 % 3000)
+    window = asyncio.run(collection.find_one({}))
+    assert window["_id"] == "queue:user-1:999000" and window["count"] == 4
+    assert window["expires_at"] == server.datetime.utcfromtimestamp(999_000 + 6000)
+
+
+def test_a_refunded_hit_is_uncounted_everywhere(monkeypatch):
+    monkeypatch.setattr(ratelimit.time, "time", lambda: 1_000_000.0)
+    collection = server.db.rate_limits_refund_test
+    limiter = RateLimiter("queue", rate=0.001, burst=1, shared=collection)
+
+    async def hits():
+        allowed = await limiter.hit("user-1")
+        await limiter.refund("user-1")
+        return allowed, await limiter.hit("user-1"), await collection.find_one({})
+
+    first, second, window = asyncio.run(hits())
+
+    assert first == second == 0.0
+    assert window["count"] == 1
+
+
+def test_start_game_spends_neither_limit_on_a_command_the_other_turns_away(monkeypatch):
+    monkeypatch.setattr(server, "RATE_LIMITING", True)
+    monkeypatch.setitem(server.RATE_LIMITS, "start_game", RateLimiter("start_game", rate=0.001, burst=1))
+    monkeypatch.setitem(server.RATE_LIMITS, "start_game_guild", RateLimiter("start_game_guild", rate=0.001, burst=2))
+    channel = FakeChannel(FakeGuild())
+    spammer, friend, late = FakeUser(), FakeUser(), FakeUser()
+
+    async def start(user) -> bool:
+        try:
+            return all([await check(FakeInteraction(channel, user)) for check in server.start_game.checks])
+        except server.app_commands.CommandOnCooldown:
+            return False
+
+    async def commands():
+        return [await start(user) for user in (spammer, spammer, spammer, friend, late)]
+
+    results = asyncio.run(commands())
+
+    # The spammer's rejected retries leave the guild's second game for their friend
+    assert results == [True, False, False, True, False]
+    # Turned away by the full guild, the late player still has their own start
+    assert server.RATE_LIMITS["start_game"].local.take(f"start_game:user:{late.id}") == 0.0
+
+
+def test_rendered_banners_are_exempt_from_the_ip_limit(monkeypatch):
+    import httpx
+
+    monkeypatch.setattr(server, "RATE_LIMITING", True)
+    monkeypatch.setitem(server.RATE_LIMITS, "api", RateLimiter("api", rate=0.001, burst=2))
+
+    async def fetch():
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://proxy") as api:
+            images = [(await api.get("/api/images/missing.png")).status_code for _ in range(5)]
+            api_calls = [(await api.get("/api/")).status_code for _ in range(3)]
+        return images, api_calls
+
+    images, api_calls = asyncio.run(fetch())
+
+    assert images == [404] * 5
+    assert api_calls == [200, 200, 429]
+
+
+def test_live_game_polls_are_only_limited_locally(monkeypatch):
+    import httpx
+
+    shared = server.db.rate_limits_live_test
+    monkeypatch.setattr(server, "RATE_LIMITING", True)
+    monkeypatch.setitem(server.RATE_LIMITS, "api", RateLimiter("api", rate=0.001, burst=50, shared=shared))
+    monkeypatch.setitem(server.RATE_LIMITS, "live", RateLimiter("live", rate=0.001, burst=3))
+
+    async def fetch():
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://viewer") as api:
+            polls = [(await api.get("/api/games/not-running/live")).status_code for _ in range(4)]
+            windows = await shared.count_documents({})
+            await api.get("/api/")
+        return polls, windows, await shared.count_documents({})
+
+    polls, windows_after_polls, windows_after_api_call = asyncio.run(fetch())
+
+    assert polls == [404, 404, 404, 429]
+    assert windows_after_polls == 0 and windows_after_api_call == 1
@@ -0,0 +1,67 @@
+import time
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+pytest.importorskip("mongomock_motor")
+
+from tests.fakes import load_server  # noqa: E402
+
+load_server()
+
+from ratings import K_FACTOR, PAIRWISE_LIMIT, expected_scores, rating_changes, rating_deltas, rating_update  # noqa: E402
+
+
+def test_rating_history_uses_utc_whatever_the_host_timezone(monkeypatch):
+    monkeypatch.setenv("TZ", "America/New_York")
+    time.tzset()
+    try:
+        update = rating_update(1012.4, datetime(2024, 1, 1))
+    finally:
+        monkeypatch.undo()
+        time.tzset()
+
+    assert update["$set"] == {"rating": 1012.4}
+    assert update["$push"]["rating_history"]["$each"] == [[1704067200, 1012]]
+
+
+def test_the_winner_gains_and_last_place_loses():
+    changes = rating_changes(
+        [{"id": "a", "rating": 1000.0}, {"id": "b"}, {"id": "c", "rating": 1100.0}, {"id": "absent"}],
+        {"a": 1, "b": 2, "c": 3}
+    )
+
+    assert set(changes) == {"a", "b", "c"}
+    assert changes["a"][0] == 1000.0 and changes["a"][1] > 1000.0
+    assert changes["b"][0] == 1000.0  # Unrated players start at the default
+    assert changes["c"][1] < 1100.0
+    assert rating_changes([{"id": "a"}], {"a": 1}) == {}
+
+
+def test_equal_ratings_trade_points_without_creating_any():
+    deltas = rating_deltas([1000.0] * 6, [1, 2, 3, 4, 5, 6])
+
+    assert abs(deltas.sum()) < 1e-9
+    assert list(deltas) == sorted(deltas, reverse=True)
+    assert deltas[0] == pytest.approx(16.0)  # k * (5 - 2.5) / 5
+
+
+def test_tied_placements_move_equal_ratings_equally():
+    deltas = rating_deltas([1000.0] * 4, [1, 2, 2, 4])
+
+    assert deltas[1] == pytest.approx(deltas[2])
+    assert deltas[0] > deltas[1] > deltas[3]
+
+
+def test_big_lobbies_score_close_to_the_pairwise_result():
+    n = PAIRWISE_LIMIT * 2
+    ratings = np.random.default_rng(7).normal(1000.0, 150.0, n)
+    placements = np.arange(1, n + 1)
+    pairwise = (1.0 / (1.0 + np.power(10.0, (ratings[None, :] - ratings[:, None]) / 400.0))).sum(axis=1) - 0.5
+
+    deltas = rating_deltas(ratings, placements)
+
+    exact = K_FACTOR * ((n - placements) - pairwise) / (n - 1)
+    assert np.max(np.abs(expected_scores(ratings) - pairwise)) / n < 1e-3
+    assert np.max(np.abs(deltas - exact)) < 0.05
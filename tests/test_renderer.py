@@ -0,0 +1,103 @@
+import asyncio
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+pytest.importorskip("mongomock_motor")
+
+from tests.fakes import load_server  # noqa: E402
+
+server = load_server()
+
+import renderer  # noqa: E402
+from renderer import ImageRenderer, scene_hash  # noqa: E402
+
+SCENE = {"era": "zombie", "title": "BATTLE ROYALE STARTED", "subtitle": "10 players", "zone": 1.0}
+
+
+@pytest.fixture
+def renders(monkeypatch):
+    """Render in a thread instead of a process, counting and slowing down every render"""
+    calls = []
+    lock = threading.Lock()
+
+    def fake_render(scene):
+        with lock:
+            calls.append(scene_hash(scene))
+        time.sleep(0.05)
+        if scene.get("title") == "broken":
+            raise RuntimeError("render failed")
+        return b"png:" + scene["title"].encode()
+
+    monkeypatch.setattr(renderer, "render_png", fake_render)
+    return calls
+
+
+def image_renderer(cache_size: int = 256) -> ImageRenderer:
+    images = ImageRenderer(server.db[f"rendered_images_{uuid.uuid4().hex}"], cache_size=cache_size)
+    images._pool = ThreadPoolExecutor(2)
+    return images
+
+
+def test_concurrent_requests_for_one_scene_share_a_render(renders):
+    images = image_renderer()
+
+    async def scenario():
+        return await asyncio.gather(*(images.render(dict(SCENE)) for _ in range(5)))
+
+    keys = asyncio.run(scenario())
+    assert set(keys) == {scene_hash(SCENE)} and renders == [scene_hash(SCENE)]
+    assert images._pending == {}
+
+
+def test_rendered_scenes_are_served_from_the_cache(renders):
+    images = image_renderer()
+    elsewhere = ImageRenderer(images.collection)
+
+    async def scenario():
+        key = await images.render(SCENE)
+        assert await images.render(SCENE) == key
+        # Another process finds it in Mongo, then keeps it in memory
+        png = await elsewhere.get(key)
+        assert key in elsewhere.cache
+        return key, png, await images.get("missing")
+
+    key, png, missing = asyncio.run(scenario())
+    assert renders == [key] and png == b"png:BATTLE ROYALE STARTED" and missing is None
+
+
+def test_the_memory_cache_is_bounded(renders):
+    images = image_renderer(cache_size=2)
+
+    async def scenario():
+        keys = [await images.render({**SCENE, "title": title}) for title in ("a", "b", "a", "c")]
+        return keys
+
+    a, b, _, c = asyncio.run(scenario())
+    # "a" was used again after "b", so "b" is the one evicted
+    assert list(images.cache) == [a, c]
+
+
+def test_a_failed_render_fails_every_waiter_and_can_be_retried(renders):
+    images = image_renderer()
+    broken = {**SCENE, "title": "broken"}
+
+    async def scenario():
+        results = await asyncio.gather(*(images.render(broken) for _ in range(3)), return_exceptions=True)
+        assert images._pending == {}
+        with pytest.raises(RuntimeError):
+            await images.render(broken)
+        return results
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert len(renders) == 2
+
+
+def test_banners_render_as_png():
+    pytest.importorskip("PIL")
+    png = renderer.render_png({**SCENE, "lines": ["player1 - 3 kills"], "era_name": "Zombie Apocalypse"})
+    assert png.startswith(b"\x89PNG\r\n\x1a\n")
@@ -0,0 +1,176 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("mongomock_motor")
+
+from tests.fakes import FakeChannel, FakeGuild, load_server  # noqa: E402
+
+server = load_server()
+
+from lobbies import LobbyMembers  # noqa: E402
+from retention import Archiver  # noqa: E402
+
+
+def archiver(db) -> Archiver:
+    return Archiver(db, server.guild_settings, LobbyMembers(db.game_players), archive_after=timedelta(0), batch_size=10,
+                    record_results=server.retry_match_results)
+
+
+@pytest.fixture
+def db(monkeypatch):
+    """A fresh database the server's own kill path writes to"""
+    database = server.client[f"retention_{uuid.uuid4().hex}"]
+    monkeypatch.setattr(server, "db", database)
+    return database
+
+
+async def finished_game(db, locked_until=None) -> str:
+    game_id = str(uuid.uuid4())
+    started = datetime.utcnow() - timedelta(minutes=6)
+    await db.games.insert_one({
+        "id": game_id, "guild_id": "guild-1", "channel_id": "1", "era": "modern", "status": "active",
+        "start_time": started, "alive_players": 2, "current_players": 2,
+        "lease": {"owner": server.lease_manager.owner_id}, "lease_epoch": 1
+    })
+    server.lease_manager.epochs[game_id] = 1
+    await db.game_players.insert_many([{"game_id": game_id, "player_id": player_id} for player_id in "ab"])
+    await server.handle_kill(game_id, {"id": "a", "username": "A"}, {"id": "b", "username": "B"}, FakeChannel(FakeGuild()))
+    server.lease_manager.lost(game_id)
+    await db.games.update_one({"id": game_id}, {"$set": {
+        "status": "finished", "archived_at": None, "end_time": datetime.utcnow() - timedelta(minutes=1),
+        "winner": "a", "archive_locked_until": locked_until
+    }})
+    return game_id
+
+
+def test_raw_rows_are_only_released_after_the_archive_is_written(monkeypatch, db):
+    writes = []
+    for collection, method in (("match_results", "update_one"), ("game_players", "delete_many"),
+                               ("game_actions", "update_many"), ("games", "update_one")):
+        original = getattr(db[collection], method)
+
+        def recorded(*args, _original=original, _name=f"{collection}.{method}", **kwargs):
+            writes.append(_name)
+            return _original(*args, **kwargs)
+
+        monkeypatch.setattr(db[collection], method, recorded)
+
+    async def scenario():
+        game_id = await finished_game(db)
+        # Nothing the game wrote expires before it is archived
+        assert await db.game_actions.count_documents({"game_id": game_id, "expires_at": {"$ne": None}}) == 0
+        writes.clear()
+        assert await archiver(db).archive_due() == 1
+        return await db.games.find_one({"id": game_id}), await db.match_results.find_one({"game_id": game_id})
+
+    game, results = asyncio.run(scenario())
+    assert writes == ["match_results.update_one", "game_players.delete_many", "game_actions.update_many", "games.update_one"]
+    assert [row[1:] for row in results["timeline"]] == [["kill", "a", "b"]]
+    assert game["archived_at"] is not None and game["expires_at"] is not None
+
+
+def test_a_failed_archive_keeps_the_raw_rows(monkeypatch, db):
+
+    async def unavailable(*args, **kwargs):
+        raise RuntimeError("match_results unavailable")
+
+    monkeypatch.setattr(db.match_results, "update_one", unavailable)
+
+    async def scenario():
+        game_id = await finished_game(db)
+        assert await archiver(db).archive_due() == 0
+        game = await db.games.find_one({"id": game_id})
+        actions = await db.game_actions.find({"game_id": game_id}).to_list(None)
+        return game, actions, await db.game_players.count_documents({"game_id": game_id})
+
+    game, actions, roster = asyncio.run(scenario())
+    assert game["archived_at"] is None and "expires_at" not in game
+    assert len(actions) == 1 and actions[0]["expires_at"] is None and roster == 2
+    # Retried once its lock runs out rather than by every pass
+    assert game["archive_locked_until"] > datetime.utcnow()
+
+
+def test_each_game_is_archived_by_one_process(db):
+    here, there = archiver(db), archiver(db)
+    archived = []
+    for process in (here, there):
+        original = process.archive_game
+
+        async def counted(game, _original=original):
+            archived.append(game["id"])
+            await asyncio.sleep(0)
+            await _original(game)
+
+        process.archive_game = counted
+
+    async def scenario():
+        game_ids = [await finished_game(db) for _ in range(4)]
+        # Another process holds this one, and this one's holder died
+        held = await finished_game(db, locked_until=datetime.utcnow() + timedelta(minutes=5))
+        expired = await finished_game(db, locked_until=datetime.utcnow() - timedelta(seconds=1))
+        counts = await asyncio.gather(here.archive_due(), there.archive_due())
+        return game_ids + [expired], held, counts
+
+    due, held, counts = asyncio.run(scenario())
+    assert sum(counts) == 5
+    assert sorted(archived) == sorted(due) and held not in archived
+
+
+def test_archived_games_stay_viewable_after_their_document_expires(db):
+    async def scenario():
+        game_id = await finished_game(db)
+        await archiver(db).archive_due()
+        # What the TTL index does once game_retention_days have passed
+        await db.games.delete_one({"id": game_id})
+        return game_id, await server.get_game(game_id)
+
+    game_id, archived = asyncio.run(scenario())
+    assert archived["game"]["id"] == game_id and archived["game"]["archived"]
+    assert archived["game"]["status"] == "finished" and archived["game"]["winner"] == "a"
+    assert [row[1:] for row in archived["results"]["timeline"]] == [["kill", "a", "b"]]
+    with pytest.raises(server.HTTPException):
+        asyncio.run(server.get_game("never-existed"))
+
+
+def test_results_the_ending_process_failed_to_write_are_recorded_once_by_the_archiver(monkeypatch, db):
+    original = db.player_matches.insert_many
+    failures = [RuntimeError("connection reset")]
+
+    async def acknowledgement_lost(*args, **kwargs):
+        result = await original(*args, **kwargs)
+        if failures:
+            raise failures.pop()
+        return result
+
+    monkeypatch.setattr(db.player_matches, "insert_many", acknowledgement_lost)
+    monkeypatch.setattr(server, "lobby_members", LobbyMembers(db.game_players))
+
+    async def scenario():
+        game_id = str(uuid.uuid4())
+        await db.players.insert_many([{"id": player_id, "username": player_id.upper(), "rating": 1000.0} for player_id in "abc"])
+        await db.games.insert_one({
+            "id": game_id, "guild_id": "guild-1", "channel_id": "1", "era": "modern", "status": "active",
+            "start_time": datetime.utcnow() - timedelta(minutes=6), "alive_players": 3, "current_players": 3,
+            "lease": {"owner": server.lease_manager.owner_id}, "lease_epoch": 1
+        })
+        server.lease_manager.epochs[game_id] = 1
+        await db.game_players.insert_many([{"game_id": game_id, "player_id": player_id, "in_match": True} for player_id in "abc"])
+        await server.handle_kill(game_id, {"id": "a", "username": "A"}, {"id": "b", "username": "B"}, FakeChannel(FakeGuild()))
+        await server.end_game(game_id)
+        pending = await db.games.find_one({"id": game_id})
+        assert await archiver(db).archive_due() == 1
+        return (
+            pending, await db.games.find_one({"id": game_id}), await db.match_results.find_one({"game_id": game_id}),
+            await db.players.find({}, {"_id": 0, "id": 1, "stats": 1}).to_list(None),
+            await db.player_matches.count_documents({"game_id": game_id})
+        )
+
+    pending, game, results, players, history = asyncio.run(scenario())
+    assert pending["status"] == "finished" and pending["results_pending"]
+    assert "results_pending" not in game and game["archived_at"] is not None
+    assert [player["placement"] for player in results["players"]] == [1, 1, 3]
+    assert {player["id"]: player["stats"]["games_played"] for player in players} == {"a": 1, "b": 1, "c": 1}
+    assert history == 3
@@ -0,0 +1,116 @@
+import asyncio
+import uuid
+from datetime import timedelta
+
+import pytest
+
+pytest.importorskip("mongomock_motor")
+
+from tests.fakes import load_server  # noqa: E402
+
+server = load_server()
+
+from bson import ObjectId  # noqa: E402
+from fastapi import HTTPException  # noqa: E402
+
+from seasons import SeasonError, SeasonManager  # noqa: E402
+
+
+def season_db():
+    return server.client[f"seasons_{uuid.uuid4().hex}"]
+
+
+def test_season_rollover_resumes_and_keeps_live_stats():
+    db = season_db()
+
+    async def roll_over():
+        await db.players.insert_many([
+            {"id": f"player-{index}", "username": f"player{index}",
+             "stats": {"kills": index % 7, "deaths": 1, "wins": index % 2, "games_played": 3, "damage_dealt": 50}}
+            for index in range(250)
+        ])
+        crashed = SeasonManager(db, owner_id="crashed", batch_size=100, pause_seconds=0)
+        await crashed.ensure_indexes()
+        season = await crashed.start_rollover()
+        assert await crashed.start_rollover() is None
+        assert await crashed.rollover_chunk(season)
+
+        # Live games keep scoring while the rollover is stopped halfway
+        await db.players.update_one({"id": "player-6"}, {"$inc": {"stats.kills": 1}})
+        await db.players.update_one({"id": "player-206"}, {"$inc": {"stats.kills": 1}})
+
+        survivor = SeasonManager(db, owner_id="survivor", batch_size=100, pause_seconds=0, stale_after=timedelta(0))
+        resumed = await survivor.resume()
+        following = await survivor.run_rollover(resumed)
+        # The crashed process lost the rollover and can't finish it twice
+        assert not await crashed.rollover_chunk(season)
+        return following, await survivor.history(), await survivor.leaderboard(1, 3)
+
+    following, seasons, leaders = asyncio.run(roll_over())
+
+    assert following["number"] == 2
+    assert [(season["number"], season["status"]) for season in seasons] == [(2, "active"), (1, "archived")]
+    assert seasons[1]["rollover"]["processed"] == 250
+
+    archived = {row["player_id"]: row["stats"] for row in asyncio.run(db.season_stats.find({"season": 1}).to_list(None))}
+    assert len(archived) == 250
+    assert archived["player-6"]["kills"] == 6 and archived["player-206"]["kills"] == 4
+    live = {player["id"]: player for player in asyncio.run(db.players.find({}).to_list(None))}
+    # Kills after a player was archived count for the new season; kills before it for the old one
+    assert live["player-6"]["stats"]["kills"] == 1 and live["player-206"]["stats"]["kills"] == 0
+    assert all(player["stats"]["games_played"] == 0 and player["season"] == 2 for player in live.values())
+    assert len(leaders) == 3 and all(leader["stats"]["wins"] == 1 for leader in leaders)
+
+
+def test_players_who_sign_up_during_a_rollover_start_in_the_new_season():
+    db = season_db()
+
+    async def roll_over():
+        await db.players.insert_many([
+            {"_id": ObjectId(), "id": f"player-{index}", "stats": {"kills": 2, "games_played": 1}} for index in range(3)
+        ])
+        seasons = SeasonManager(db, owner_id="worker-1", batch_size=2, pause_seconds=0)
+        season = await seasons.start_rollover()
+        assert await seasons.rollover_chunk(season)
+        # Signs up, and scores, between two chunks
+        await db.players.insert_one({"_id": ObjectId(), "id": "newcomer", "stats": {"kills": 1, "games_played": 1}})
+        await seasons.run_rollover(season)
+        newcomer = await db.players.find_one({"id": "newcomer"})
+        return newcomer, await db.season_stats.find({"season": 1}).to_list(None)
+
+    newcomer, archived = asyncio.run(roll_over())
+
+    assert newcomer["stats"] == {"kills": 1, "games_played": 1}
+    assert sorted(row["player_id"] for row in archived) == ["player-0", "player-1", "player-2"]
+
+
+def test_a_rollover_without_players_opens_the_next_season():
+    seasons = SeasonManager(season_db(), owner_id="worker-1", pause_seconds=0)
+
+    async def roll_over():
+        return await seasons.run_rollover(await seasons.start_rollover())
+
+    assert asyncio.run(roll_over())["number"] == 2
+
+
+def test_a_missing_active_season_is_reported_as_such(monkeypatch):
+    db = season_db()
+    seasons = SeasonManager(db, owner_id="worker-1", pause_seconds=0)
+    monkeypatch.setattr(server, "season_manager", seasons)
+
+    async def scenario():
+        season = await seasons.start_rollover()
+        with pytest.raises(HTTPException) as underway:
+            await server.start_season_rollover()
+        # The last rollover archived its season and died before opening the next one
+        await db.seasons.update_one({"number": season["number"]}, {"$set": {"status": "archived"}})
+        with pytest.raises(SeasonError):
+            await seasons.start_rollover()
+        with pytest.raises(HTTPException) as missing:
+            await server.start_season_rollover()
+        return underway.value, missing.value
+
+    underway, missing = asyncio.run(scenario())
+
+    assert underway.status_code == 409 and "underway" in underway.detail
+    assert missing.status_code == 409 and "no active season" in missing.detail
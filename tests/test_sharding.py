@@ -0,0 +1,30 @@
+import pytest
+
+pytest.importorskip("mongomock_motor")
+
+from tests.fakes import load_server  # noqa: E402
+
+server = load_server()
+
+from sharding import parse_shard_count, parse_shard_ids, shard_for_guild  # noqa: E402
+
+
+def test_shard_config_parsing():
+    assert parse_shard_ids("0-3, 8,2") == [0, 1, 2, 3, 8]
+    assert parse_shard_ids(" ") is None
+    with pytest.raises(ValueError):
+        parse_shard_ids("3-1")
+    assert parse_shard_count("auto") is None and parse_shard_count("16") == 16
+
+
+def test_guilds_map_to_shards_by_discords_rule():
+    guild_id = str((123456 << 22) | 4194303)
+    assert shard_for_guild(guild_id, 16) == 123456 % 16
+    assert shard_for_guild(guild_id, None) == 0
+
+
+def test_games_for_uncached_guilds_get_the_owning_shard(monkeypatch):
+    guild_id = str(7 << 22)
+    monkeypatch.setattr(server, "SHARD_COUNT", 4)
+    assert server.bot.get_guild(int(guild_id)) is None
+    assert server.guild_shard(guild_id) == 3
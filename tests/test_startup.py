@@ -0,0 +1,63 @@
+"""Startup cost: import time of the server module and slash-command sync on connect.
+
+Compare import time against a saved baseline the same way as the hot paths:
+
+    pytest tests/test_startup.py --benchmark-only --benchmark-save=startup
+    pytest tests/test_startup.py --benchmark-only --benchmark-compare --benchmark-compare-fail=mean:25%
+"""
+import asyncio
+import os
+import subprocess
+import sys
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+pytest.importorskip("mongomock_motor")
+
+from tests.fakes import BACKEND_DIR, load_server  # noqa: E402
+
+server = load_server()
+
+# Imported in a fresh interpreter; motor doesn't connect until the first query
+IMPORT_SERVER = "import sys; import server; print(' '.join(sorted(sys.modules)))"
+
+
+def import_server() -> set:
+    env = dict(os.environ, MONGO_URL="mongodb://localhost:27017", DB_NAME="cut_royale_startup")
+    result = subprocess.run(
+        [sys.executable, "-W", "ignore", "-c", IMPORT_SERVER],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True
+    )
+    return set(result.stdout.split())
+
+
+def test_import_time(benchmark):
+    modules = benchmark.pedantic(import_server, rounds=3, iterations=1)
+    assert "server" in modules
+
+
+def test_heavy_clients_load_lazily():
+    modules = import_server()
+    assert "fal_client" not in modules
+    assert "numpy" not in modules
+    assert "PIL" not in modules
+
+
+def test_command_sync_skips_unchanged_tree(monkeypatch):
+    synced = []
+
+    async def sync(guild=None):
+        synced.append(guild)
+        return server.bot.tree.get_commands(guild=guild)
+
+    monkeypatch.setattr(server.bot.tree, "sync", sync)
+    collection = server.db.bot_meta_startup_test
+
+    async def connect_twice():
+        first = await server.sync_command_tree(server.bot.tree, collection, application_id=1)
+        second = await server.sync_command_tree(server.bot.tree, collection, application_id=1)
+        return first, second
+
+    assert asyncio.run(connect_twice()) == (True, False)
+    assert synced == [None]
@@ -0,0 +1,72 @@
+import asyncio
+import time
+
+import pytest
+
+pytest.importorskip("mongomock_motor")
+
+from tests.fakes import load_server  # noqa: E402
+
+server = load_server()
+
+from tracing import NOOP_SPAN, SamplingProfiler, Tracer  # noqa: E402
+
+
+def test_nested_spans_attach_to_the_enclosing_tick():
+    tracer = Tracer(enabled=True)
+    with tracer.tick("game-1") as trace:
+        with tracer.span("encounters"):
+            with tracer.span("encounter"):
+                time.sleep(0.002)
+            with tracer.span("encounter"):
+                pass
+        with tracer.span("broadcast"):
+            pass
+
+    # Spans are recorded as they close, inner ones first
+    names = [name for name, _, _ in trace.spans]
+    assert names == ["encounter", "encounter", "encounters", "broadcast"]
+    (_, inner_offset, inner), _, (_, outer_offset, outer), (_, after_offset, _) = trace.spans
+    assert outer_offset <= inner_offset and inner <= outer
+    assert after_offset >= outer_offset + outer
+    assert trace.duration >= outer
+    assert list(tracer.recent) == [trace]
+
+
+def test_concurrent_games_keep_their_own_traces():
+    tracer = Tracer(enabled=True)
+
+    async def tick(game_id: str, stages: int):
+        with tracer.tick(game_id):
+            for _ in range(stages):
+                with tracer.span(game_id):
+                    await asyncio.sleep(0)
+
+    async def scenario():
+        await asyncio.gather(tick("game-1", 2), tick("game-2", 3))
+
+    asyncio.run(scenario())
+    spans = {trace.game_id: [name for name, _, _ in trace.spans] for trace in tracer.recent}
+    assert spans == {"game-1": ["game-1"] * 2, "game-2": ["game-2"] * 3}
+    assert [trace["game_id"] for trace in tracer.slowest(game_id="game-2")] == ["game-2"]
+
+
+def test_disabled_or_outside_a_tick_nothing_is_recorded():
+    tracer = Tracer(enabled=False)
+    assert tracer.tick("game-1") is NOOP_SPAN and tracer.span("encounters") is NOOP_SPAN
+    tracer.enabled = True
+    assert tracer.span("encounters") is NOOP_SPAN
+    assert tracer.slowest() == []
+
+
+def test_profiler_samples_the_calling_thread():
+    profiler = SamplingProfiler(interval=0.001)
+    profiler.start()
+    deadline = time.perf_counter() + 0.1
+    while time.perf_counter() < deadline:
+        pass
+    profiler.stop()
+
+    report = profiler.report()
+    assert not report["running"] and report["samples"] > 0
+    assert any("test_profiler_samples_the_calling_thread" in stack["stack"] for stack in report["stacks"])